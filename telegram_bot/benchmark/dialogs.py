@@ -0,0 +1,92 @@
+'''
+Represents a generator of synthetic dialogs of users with the bot.
+'''
+import random
+
+
+# Localities asked for the weather; earlier ones are asked more often, like popular cities are
+LOCALITIES = [
+    'London', 'Paris', 'New York', 'Moscow', 'Berlin', 'Tokyo', 'Madrid', 'Rome', 'Istanbul',
+    'Dubai', 'Singapore', 'Sydney', 'Toronto', 'Almaty', 'Prague', 'Vienna', 'Warsaw', 'Lisbon',
+    'Nowhere Land',
+]
+
+# Currency pairs converted by users
+CURRENCY_PAIRS = [
+    ('USD', 'EUR'), ('EUR', 'USD'), ('USD', 'RUB'), ('EUR', 'GBP'), ('GBP', 'USD'),
+    ('USD', 'JPY'), ('USD', 'KZT'), ('CHF', 'EUR'), ('XXX', 'USD'),
+]
+
+# Default shares of dialogs by kinds
+DEFAULT_MIX = {
+    'weather': 35,
+    'currencies': 30,
+    'funny': 15,
+    'start': 10,
+    'poll': 5,
+    'help': 5,
+}
+
+StepType = tuple[str, str]
+
+class Dialog:
+    '''
+    Represents a dialog of kind 'kind' as a list of steps: pairs of a step label used in reports
+    and a text the user sends.
+    '''
+    def __init__(self, kind: str, steps: list[StepType]):
+        self.kind = kind
+        self.steps = steps
+
+    def __repr__(self) -> str:
+        return f'Dialog({self.kind!r}, {self.steps!r})'
+
+def _choose_popular(rng: random.Random, items: list):
+    '''
+    Returns a random item preferring the first ones (a Zipf-like distribution).
+    '''
+    weights = [1 / rank for rank in range(1, len(items) + 1)]
+    return rng.choices(items, weights)[0]
+
+def make_dialog(kind: str, rng: random.Random) -> Dialog:
+    '''
+    Returns a dialog of 'kind' with random localities, currencies and amounts.
+    '''
+    if kind == 'weather':
+        steps = [('weather', '/weather')]
+        for _ in range(rng.randint(1, 3)):
+            steps.append(('weather:locality', _choose_popular(rng, LOCALITIES)))
+        steps.append(('cancel', '/cancel'))
+    elif kind == 'currencies':
+        from_cur_code, to_cur_code = _choose_popular(rng, CURRENCY_PAIRS)
+        steps = [
+            ('currencies', '/currencies'),
+            ('currencies:from', from_cur_code),
+            ('currencies:to', to_cur_code),
+            ('currencies:amount', str(rng.choice((1, 10, 100, 250.5, 1000)))),
+        ]
+    elif kind == 'funny':
+        steps = [('funny', '/funny')]
+    elif kind == 'start':
+        steps = [('start', '/start')]
+    elif kind == 'poll':
+        steps = [('poll', '/poll'), ('cancel', '/cancel')]
+    elif kind == 'help':
+        steps = [('help', '/help')]
+    else:
+        raise ValueError(f'Unknown dialog kind "{kind}".')
+    return Dialog(kind, steps)
+
+def generate_dialogs(
+        number: int,
+        mix: dict[str, int|float] | None = None,
+        seed: int | None = None
+    ) -> list[Dialog]:
+    '''
+    Returns 'number' random dialogs whose kinds are distributed by weights 'mix'. The same 'seed'
+    gives the same dialogs.
+    '''
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = rng.choices(list(mix), list(mix.values()), k=number)
+    return [make_dialog(kind, rng) for kind in kinds]
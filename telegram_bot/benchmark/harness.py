@@ -0,0 +1,284 @@
+'''
+Represents an offline benchmark of the bot. Synthetic dialogs of concurrent users are replayed
+through the dispatcher while the upstream services and the Telegram Bot API are emulated by a
+local stub server, so no network is used, e.g.:
+
+    python -m benchmark.harness --users 50 --dialogs 500 --latency 0.05 --error-rate 0.01
+
+The bot keeps its FSM states, caches and group chats in Redis as usual, so the benchmark has to
+run against a disposable Redis instance set by the environment variables DATA_STORAGE_HOST and
+DATA_STORAGE_BOT_DB.
+'''
+import argparse
+import asyncio
+import collections
+import importlib
+import json
+import logging
+import math
+import os
+import resource
+import time
+import tracemalloc
+
+from aiogram import (
+    Bot,
+    Dispatcher,
+    types,
+)
+from aiogram.bot.api import TelegramAPIServer
+
+from webhook import sender
+from . import (
+    dialogs,
+    stubs,
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    '''
+    Returns the 'q'-th percentile (0-100) of 'values' by the nearest-rank method.
+    '''
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+class Report:
+    '''
+    Represents results of a benchmark run: latencies of processed updates by step labels and
+    errors by exception names.
+    '''
+    def __init__(self):
+        self.latencies: collections.defaultdict[str, list[float]] = collections.defaultdict(list)
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.extra: dict = {}
+
+    def add(self, label: str, latency: float, error: Exception | None = None):
+        self.latencies[label].append(latency)
+        if error is not None:
+            self.errors[type(error).__name__] += 1
+
+    def summary(self) -> dict:
+        '''
+        Returns the throughput and latency percentiles overall and by step labels.
+        '''
+        duration = self.finished_at - self.started_at
+        all_latencies = [latency for values in self.latencies.values() for latency in values]
+
+        def describe(values: list[float]) -> dict[str, float]:
+            return {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'max_ms': round(max(values, default=0) * 1000, 2),
+            }
+
+        return {
+            'duration_s': round(duration, 3),
+            'updates': len(all_latencies),
+            'throughput_ups': round(len(all_latencies) / duration, 2) if duration else 0.0,
+            'latency': describe(all_latencies),
+            'steps': {label: describe(values) for label, values in sorted(self.latencies.items())},
+            'errors': dict(self.errors),
+            **self.extra,
+        }
+
+def format_summary(summary: dict) -> str:
+    '''
+    Returns 'summary' as a human-readable text.
+    '''
+    lines = [
+        f'Updates: {summary["updates"]} in {summary["duration_s"]} s '
+        f'({summary["throughput_ups"]} updates/s)',
+        'Latency: p50 {p50_ms} ms, p99 {p99_ms} ms, max {max_ms} ms'.format(**summary['latency']),
+        '',
+        f'{"Step":<24}{"Count":>8}{"p50, ms":>12}{"p99, ms":>12}{"max, ms":>12}',
+    ]
+    for label, stats in summary['steps'].items():
+        lines.append(
+            f'{label:<24}{stats["count"]:>8}{stats["p50_ms"]:>12}{stats["p99_ms"]:>12}'
+            f'{stats["max_ms"]:>12}'
+        )
+    lines.append('')
+    lines.append(f'Errors: {summary["errors"] or "none"}')
+    lines.append(f'Memory: peak RSS {summary["memory"]["peak_rss_mb"]} MB' + (
+        f', peak traced {summary["memory"]["peak_traced_mb"]} MB'
+        if 'peak_traced_mb' in summary['memory'] else ''
+    ))
+    lines.append(f'Upstream calls: {summary["upstream_calls"]}')
+    lines.append(f'Upstream errors: {summary["upstream_errors"] or "none"}')
+    lines.append(f'Telegram methods: {summary["telegram_methods"]}')
+    lines.append(f'Redis round-trips: {summary["redis_round_trips"]}')
+    return '\n'.join(lines)
+
+def point_services_to(url: str):
+    '''
+    Points the service modules to the stub server by 'url'.
+    '''
+    from weather import openweather
+    from exchangerates import exchangerates
+    from images import giphy
+
+    openweather.URL = url + stubs.OPENWEATHER_PATH
+    openweather.GROUP_URL = url + stubs.OPENWEATHER_GROUP_PATH
+    exchangerates.URL = url + stubs.EXCHANGE_RATES_CONVERT_PATH
+    exchangerates.LATEST_URL = url + stubs.EXCHANGE_RATES_LATEST_PATH
+    giphy.URL = url + stubs.GIPHY_PATH
+
+def lift_limits(app):
+    '''
+    Lifts the rate limits of the upstream services and the flood limits of Telegram in the bot
+    module 'app' to measure the bot itself.
+    '''
+    for limiter in (app.weather_limiter, app.currency_limiter, app.image_limiter):
+        limiter.rate = limiter.burst = 1e9
+        limiter.monthly_budget = 0
+    send_scheduler = app.bot.scheduler
+    for bucket_name in ('rate', 'chat_rate', 'group_chat_rate'):
+        setattr(send_scheduler, bucket_name, 1e9)
+    send_scheduler.chat_burst = send_scheduler.group_chat_burst = 1e9
+    send_scheduler.bucket.rate = send_scheduler.bucket.burst = send_scheduler.bucket.tokens = 1e9
+
+async def replay_user(
+        dp: Dispatcher,
+        user_id: int,
+        user_dialogs: list[dialogs.Dialog],
+        report: Report,
+        think_time: float
+    ):
+    '''
+    Replays dialogs of a user with ID 'user_id' waiting for each update to be processed and then
+    for 'think_time' seconds.
+    '''
+    for dialog in user_dialogs:
+        for label, text in dialog.steps:
+            update = types.Update.to_object(sender.make_message_update(user_id, text))
+            started_at = time.perf_counter()
+            error = None
+            try:
+                # Each update is processed in a task of its own like the executor does: aiogram
+                # keeps the state of the current update in context variables
+                await asyncio.create_task(dp.process_update(update))
+            except Exception as exception:
+                error = exception
+            report.add(label, time.perf_counter() - started_at, error)
+            if think_time:
+                await asyncio.sleep(think_time)
+
+async def run(args: argparse.Namespace) -> dict:
+    '''
+    Runs the benchmark. Returns its summary.
+    '''
+    options = stubs.ServiceOptions(args.latency, args.jitter, args.error_rate)
+    stub_server = stubs.StubServer(
+        {
+            stubs.SERVICE_OPENWEATHER: options,
+            stubs.SERVICE_EXCHANGE_RATES: options,
+            stubs.SERVICE_GIPHY: options,
+            stubs.SERVICE_GIPHY_MEDIA: options,
+            stubs.SERVICE_TELEGRAM: stubs.ServiceOptions(
+                args.telegram_latency,
+                error_rate=args.telegram_error_rate
+            ),
+        },
+        image_size=args.image_size,
+        seed=args.seed
+    )
+    await stub_server.start()
+    point_services_to(stub_server.url)
+
+    # The bot module is configured by the environment on import
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    app = importlib.import_module('telegram_bot')
+    logging.getLogger().setLevel(args.log_level)
+    app.bot.server = TelegramAPIServer.from_base(stub_server.url)
+    Bot.set_current(app.bot)
+    Dispatcher.set_current(app.dp)
+    if args.unlimited:
+        lift_limits(app)
+
+    if args.flush_db:
+        await app.data_storage.redis.flushdb()
+    await app.on_startup(app.dp)
+    if args.tracemalloc:
+        tracemalloc.start()
+    round_trips = app.data_storage.pool.round_trips
+
+    # Spread dialogs among users
+    all_dialogs = dialogs.generate_dialogs(args.dialogs, seed=args.seed)
+    user_dialogs = [all_dialogs[index::args.users] for index in range(args.users)]
+    report = Report()
+    report.started_at = time.perf_counter()
+    try:
+        await asyncio.gather(*[
+            replay_user(app.dp, args.first_user_id + index, user_dialogs[index], report,
+                        args.think_time)
+            for index in range(args.users)
+        ])
+        report.finished_at = time.perf_counter()
+    finally:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory = {'peak_rss_mb': round(peak_rss / 1024, 1)}
+        if args.tracemalloc:
+            memory['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1048576, 1)
+            tracemalloc.stop()
+        report.extra = {
+            'memory': memory,
+            'upstream_calls': dict(stub_server.calls),
+            'upstream_errors': dict(stub_server.errors),
+            'telegram_methods': dict(stub_server.telegram_methods),
+            'redis_round_trips': app.data_storage.pool.round_trips - round_trips,
+        }
+        await app.on_shutdown(app.dp)
+        await (await app.bot.get_session()).close()
+        await stub_server.close()
+    return report.summary()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the bot against stub services.')
+    parser.add_argument('--users', type=int, default=20, help='number of concurrent users')
+    parser.add_argument('--dialogs', type=int, default=200, help='number of dialogs in total')
+    parser.add_argument(
+        '--think-time',
+        type=float,
+        default=0,
+        help='seconds a user waits between messages'
+    )
+    parser.add_argument('--latency', type=float, default=0.05, help='upstream latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='upstream jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of upstream errors')
+    parser.add_argument(
+        '--telegram-latency',
+        type=float,
+        default=0.02,
+        help='Bot API latency in seconds'
+    )
+    parser.add_argument(
+        '--telegram-error-rate',
+        type=float,
+        default=0,
+        help='share of Bot API requests answered with "Too Many Requests"'
+    )
+    parser.add_argument('--image-size', type=int, default=262144, help='image size in bytes')
+    parser.add_argument('--seed', type=int, default=1, help='seed of dialogs, jitter and errors')
+    parser.add_argument('--first-user-id', type=int, default=100000, help='ID of the first user')
+    parser.add_argument(
+        '--unlimited',
+        action='store_true',
+        help='lift the upstream rate limits and the Telegram flood limits'
+    )
+    parser.add_argument(
+        '--flush-db',
+        action='store_true',
+        help='flush the Redis database before the run (use a disposable database only)'
+    )
+    parser.add_argument('--log-level', default='WARNING', help='logging level of the bot')
+    parser.add_argument('--tracemalloc', action='store_true', help='trace Python allocations')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
@@ -0,0 +1,243 @@
+'''
+Represents a local HTTP server emulating the OpenWeather, ExchangeRates (apilayer), Giphy and
+Telegram Bot API services for offline benchmarks and tests.
+'''
+import asyncio
+import collections
+import itertools
+import random
+import time
+
+from aiohttp import web
+
+
+# Services emulated by the stub server
+SERVICE_OPENWEATHER = 'openweather'
+SERVICE_EXCHANGE_RATES = 'exchangerates'
+SERVICE_GIPHY = 'giphy'
+SERVICE_GIPHY_MEDIA = 'giphy_media'
+SERVICE_TELEGRAM = 'telegram'
+
+# Paths of the emulated endpoints
+OPENWEATHER_PATH = '/data/2.5/weather'
+OPENWEATHER_GROUP_PATH = '/data/2.5/group'
+EXCHANGE_RATES_CONVERT_PATH = '/exchangerates_data/convert'
+EXCHANGE_RATES_LATEST_PATH = '/exchangerates_data/latest'
+GIPHY_PATH = '/v1/gifs/random'
+GIPHY_MEDIA_PATH = '/media'
+
+# Localities with names starting with this prefix are unknown to the stub OpenWeather
+UNKNOWN_LOCALITY_PREFIX = 'nowhere'
+
+# Rates of currencies against USD returned by the stub ExchangeRates
+RATES = {
+    'USD': 1.0,
+    'EUR': 0.92,
+    'GBP': 0.79,
+    'JPY': 149.5,
+    'CHF': 0.9,
+    'CNY': 7.3,
+    'RUB': 92.0,
+    'KZT': 470.0,
+}
+
+class ServiceOptions:
+    '''
+    Represents the behaviour of an emulated service: each request takes 'latency' seconds plus
+    a random jitter of up to 'jitter' seconds and fails with probability 'error_rate'.
+    '''
+    def __init__(self, latency: int|float = 0, jitter: int|float = 0, error_rate: float = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+class StubServer:
+    '''
+    Represents a server emulating the upstream services and the Telegram Bot API by 'host' and
+    'port' (0 means a random free port). Behaviour of each service is set by 'options' (a service
+    name to 'ServiceOptions' mapping); Giphy images are 'image_size' bytes long. The server counts
+    requests and emulated errors by services. 'seed' makes errors and jitter reproducible.
+    '''
+    def __init__(
+            self,
+            options: dict[str, ServiceOptions] | None = None,
+            image_size: int = 262144,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            seed: int | None = None
+        ):
+        self.options = collections.defaultdict(ServiceOptions, options or {})
+        self.image = b'GIF89a' + b'\x00' * max(image_size - 6, 0)
+        self.host = host
+        self.port = port
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.telegram_methods: collections.Counter[str] = collections.Counter()
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def _emulate(self, service: str) -> bool:
+        '''
+        Counts a request to 'service' and waits for its latency. Returns True if the request has
+        to fail.
+        '''
+        self.calls[service] += 1
+        options = self.options[service]
+        delay = options.latency + self._random.uniform(0, options.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if options.error_rate and self._random.random() < options.error_rate:
+            self.errors[service] += 1
+            return True
+        return False
+
+    async def openweather(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_OPENWEATHER):
+            return web.json_response({'cod': 500, 'message': 'Internal error'}, status=500)
+        # Cities requested by ID are always known
+        locality_name = request.query.get('q') or request.query.get('id', '')
+        if locality_name.casefold().startswith(UNKNOWN_LOCALITY_PREFIX):
+            return web.json_response({'cod': '404', 'message': 'city not found'}, status=404)
+        return web.json_response(self._make_weather(locality_name))
+
+    async def openweather_group(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_OPENWEATHER):
+            return web.json_response({'cod': 500, 'message': 'Internal error'}, status=500)
+        city_ids = [city_id for city_id in request.query.get('id', '').split(',') if city_id]
+        return web.json_response({
+            'cnt': len(city_ids),
+            'list': [
+                # Items of the group endpoint keep the time zone in 'sys'
+                {'id': int(city_id), 'sys': {'timezone': 0}, **self._make_weather(city_id)}
+                for city_id in city_ids
+            ],
+        })
+
+    def _make_weather(self, locality_name: str) -> dict:
+        seed = sum(map(ord, locality_name))
+        return {
+            'name': locality_name,
+            'main': {
+                'temp': 260 + seed % 50 + 0.15,
+                'pressure': 990 + seed % 40,
+                'humidity': seed % 100,
+            },
+        }
+
+    async def exchange_rates_convert(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_EXCHANGE_RATES):
+            return web.json_response({'message': 'Internal error'}, status=500)
+        from_cur_code = request.query.get('from', '').upper()
+        to_cur_code = request.query.get('to', '').upper()
+        if from_cur_code not in RATES or to_cur_code not in RATES:
+            return web.json_response(
+                {'success': False, 'error': {'code': 402, 'message': 'Invalid currency code.'}},
+                status=400
+            )
+        amount = float(request.query.get('amount', 1))
+        return web.json_response({
+            'success': True,
+            'query': {'from': from_cur_code, 'to': to_cur_code, 'amount': amount},
+            'result': amount * RATES[to_cur_code] / RATES[from_cur_code],
+        })
+
+    async def exchange_rates_latest(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_EXCHANGE_RATES):
+            return web.json_response({'message': 'Internal error'}, status=500)
+        base = request.query.get('base', 'USD').upper()
+        if base not in RATES:
+            return web.json_response(
+                {'success': False, 'error': {'code': 201, 'message': 'Invalid base currency.'}},
+                status=400
+            )
+        return web.json_response({
+            'success': True,
+            'base': base,
+            'timestamp': int(time.time()),
+            'rates': {code: rate / RATES[base] for code, rate in RATES.items()},
+        })
+
+    async def giphy(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_GIPHY):
+            return web.json_response({'meta': {'status': 500, 'msg': 'Internal error'}}, status=500)
+        image_id = f'stub{next(self._ids)}'
+        return web.json_response({
+            'data': {
+                'id': image_id,
+                'images': {
+                    'downsized_large': {'url': f'{self.url}{GIPHY_MEDIA_PATH}/{image_id}.gif'},
+                },
+            },
+            'meta': {'status': 200, 'msg': 'OK'},
+        })
+
+    async def giphy_media(self, request: web.Request) -> web.Response:
+        if await self._emulate(SERVICE_GIPHY_MEDIA):
+            return web.Response(status=500)
+        return web.Response(body=self.image, content_type='image/gif')
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.telegram_methods[method] += 1
+        data = await request.post()
+        if await self._emulate(SERVICE_TELEGRAM):
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }, status=429)
+        return web.json_response({'ok': True, 'result': self._make_telegram_result(method, data)})
+
+    def _make_telegram_result(self, method: str, data: dict) -> dict | bool:
+        '''
+        Returns a plausible result of Bot API method 'method' called with parameters 'data'.
+        '''
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}
+        if not method.startswith(('send', 'edit', 'copy', 'forward')):
+            return True
+        chat_id = int(data.get('chat_id', 0))
+        message = {
+            'message_id': next(self._ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'group'},
+        }
+        if 'text' in data:
+            message['text'] = data['text']
+        if method == 'sendPhoto':
+            file_id = f'photo{next(self._ids)}'
+            message['photo'] = [
+                {'file_id': file_id, 'file_unique_id': file_id, 'width': 480, 'height': 270},
+            ]
+        return message
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1048576)
+        app.router.add_get(OPENWEATHER_PATH, self.openweather)
+        app.router.add_get(OPENWEATHER_GROUP_PATH, self.openweather_group)
+        app.router.add_get(EXCHANGE_RATES_CONVERT_PATH, self.exchange_rates_convert)
+        app.router.add_get(EXCHANGE_RATES_LATEST_PATH, self.exchange_rates_latest)
+        app.router.add_get(GIPHY_PATH, self.giphy)
+        app.router.add_get(GIPHY_MEDIA_PATH + '/{image_id}', self.giphy_media)
+        app.router.add_post('/bot{token}/{method}', self.telegram)
+        return app
+
+    async def start(self):
+        '''
+        Starts listening. The actual port is known after the start.
+        '''
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,91 @@
+'''
+Tests 'stubs' module together with the service modules it emulates.
+'''
+import asyncio
+import pytest
+
+from . import stubs
+from ..exchangerates import exchangerates
+from ..images import giphy
+from ..weather import openweather
+
+
+def run_with_stub_server(monkeypatch, test, options: dict | None = None):
+    '''
+    Runs coroutine function 'test' with a started stub server the service modules point to.
+    '''
+    async def run():
+        stub_server = stubs.StubServer(options, image_size=1000, seed=1)
+        await stub_server.start()
+        monkeypatch.setattr(openweather, 'URL', stub_server.url + stubs.OPENWEATHER_PATH)
+        monkeypatch.setattr(
+            openweather,
+            'GROUP_URL',
+            stub_server.url + stubs.OPENWEATHER_GROUP_PATH
+        )
+        monkeypatch.setattr(
+            exchangerates,
+            'URL',
+            stub_server.url + stubs.EXCHANGE_RATES_CONVERT_PATH
+        )
+        monkeypatch.setattr(
+            exchangerates,
+            'LATEST_URL',
+            stub_server.url + stubs.EXCHANGE_RATES_LATEST_PATH
+        )
+        monkeypatch.setattr(giphy, 'URL', stub_server.url + stubs.GIPHY_PATH)
+        try:
+            await test(stub_server)
+        finally:
+            await stub_server.close()
+
+    asyncio.run(run())
+
+def test_stub_services(monkeypatch):
+    '''
+    Tests that the service modules work with the emulated services.
+    '''
+    async def test(stub_server: stubs.StubServer):
+        weather = await openweather.get_locality_weather('London', 'key')
+        assert set(weather) == {'temp', 'pressure', 'humidity', 'timezone'}
+        with pytest.raises(openweather.UnknownLocality):
+            await openweather.get_locality_weather('Nowhere', 'key')
+        assert set(await openweather.get_cities_weather([1, 2], 'key')) == {1, 2}
+
+        assert await exchangerates.convert_currency('EUR', 'EUR', 10, 'key') == 10
+        with pytest.raises(exchangerates.ConversionError):
+            await exchangerates.convert_currency('XXX', 'EUR', 10, 'key')
+        rates_data = await exchangerates.get_latest_rates('USD', 'key')
+        assert rates_data['rates']['EUR'] == stubs.RATES['EUR']
+
+        image_data = await giphy.get_random_image_data('cats', 'key')
+        image = await giphy.download_image(image_data['url'])
+        assert len(image) == 1000
+
+        assert stub_server.calls == {
+            stubs.SERVICE_OPENWEATHER: 3,
+            stubs.SERVICE_EXCHANGE_RATES: 3,
+            stubs.SERVICE_GIPHY: 1,
+            stubs.SERVICE_GIPHY_MEDIA: 1,
+        }
+
+    run_with_stub_server(monkeypatch, test)
+
+def test_stub_errors_and_latency(monkeypatch):
+    '''
+    Tests emulated errors and latency.
+    '''
+    async def test(stub_server: stubs.StubServer):
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        with pytest.raises(openweather.ServiceUnavailable):
+            await openweather.get_locality_weather('London', 'key')
+        assert loop.time() - started_at >= 0.05
+        with pytest.raises(giphy.ServiceUnavailable):
+            await giphy.get_random_image_data('cats', 'key')
+        assert stub_server.errors == {stubs.SERVICE_OPENWEATHER: 1, stubs.SERVICE_GIPHY: 1}
+
+    run_with_stub_server(monkeypatch, test, {
+        stubs.SERVICE_OPENWEATHER: stubs.ServiceOptions(latency=0.05, error_rate=1),
+        stubs.SERVICE_GIPHY: stubs.ServiceOptions(error_rate=1),
+    })
@@ -0,0 +1,233 @@
+'''
+Represents a registry of group chats where the bot is present.
+'''
+import redis.asyncio as redis
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+# Separates parts of entries of the member index
+ENTRY_SEPARATOR = '\x00'
+
+def _make_entry(chat_id: int|str, title: str) -> str:
+    '''
+    Returns an entry of the member index. Entries are ordered (and searched by prefix) by case
+    insensitive titles and keep the original title and the chat ID.
+    '''
+    title = title.replace(ENTRY_SEPARATOR, '')
+    return ENTRY_SEPARATOR.join((title.casefold(), title, str(chat_id)))
+
+# Every change of the registry reads the index entry of a chat and rewrites the entries of its
+# members in one script, so concurrent changes of titles and members never leave stale entries.
+# Keys of members' sorted sets are made of a prefix passed in the last argument and user IDs.
+
+# Sets the index entry ARGV[2] of chat ARGV[1] and replaces the previous entry of every member
+# of the chat. The chat is added to the unindexed chats scored by its ID unless ARGV[3] is 1.
+ADD_CHAT_SCRIPT = '''
+local old_entry = redis.call('HGET', KEYS[1], ARGV[1])
+if ARGV[3] == '1' then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[2], ARGV[1], ARGV[1])
+end
+if old_entry == ARGV[2] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+for _, user_id in ipairs(redis.call('SMEMBERS', KEYS[3])) do
+    local user_key = ARGV[4] .. user_id
+    if old_entry then
+        redis.call('ZREM', user_key, old_entry)
+    end
+    redis.call('ZADD', user_key, 0, ARGV[2])
+end
+return 1
+'''
+
+# Removes chat ARGV[1] along with its members and their index entries
+REMOVE_CHAT_SCRIPT = '''
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if entry then
+    for _, user_id in ipairs(redis.call('SMEMBERS', KEYS[3])) do
+        redis.call('ZREM', ARGV[2] .. user_id, entry)
+    end
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[3])
+return 0
+'''
+
+# Adds user ARGV[2] to members of chat ARGV[1] if the chat is registered
+ADD_MEMBER_SCRIPT = '''
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if not entry then
+    return 0
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('ZADD', KEYS[3], 0, entry)
+return 1
+'''
+
+# Removes user ARGV[2] from members of chat ARGV[1]
+REMOVE_MEMBER_SCRIPT = '''
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+if entry then
+    redis.call('ZREM', KEYS[3], entry)
+end
+return 0
+'''
+
+class ChatRegistry:
+    '''
+    Represents group chats kept in a single Redis hash 'prefix:titles' mapping chat IDs to entries
+    made by '_make_entry' from chat titles. Chats are indexed by members: a sorted set
+    'prefix:user:<user ID>' keeps the entries of every chat of a user, and a set
+    'prefix:members:<chat ID>' keeps user IDs of known chat members. The index is updated
+    incrementally and atomically on every membership or title change and allows to read a page of
+    user's chats, optionally filtered by a title prefix, in one round-trip.
+    Members of a chat are reported to the bot only if it's an administrator there, so chats where
+    it isn't (and chats imported from the previous versions of the bot) are kept in a sorted set
+    'prefix:unindexed' scored by chat IDs. Their membership is checked by users on demand a few
+    chats at a time, and a string 'prefix:checked:<user ID>' keeps the ID of the last chat checked
+    for a user. Legacy chats are scanned in pages of 'page_size' keys.
+    '''
+    def __init__(self, ds: redis.Redis, prefix: str = 'group_chats', page_size: int = 1000):
+        self.ds = ds
+        self.prefix = prefix
+        self.page_size = page_size
+        self._add_chat = ds.register_script(ADD_CHAT_SCRIPT)
+        self._remove_chat = ds.register_script(REMOVE_CHAT_SCRIPT)
+        self._add_member = ds.register_script(ADD_MEMBER_SCRIPT)
+        self._remove_member = ds.register_script(REMOVE_MEMBER_SCRIPT)
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(map(str, parts)))
+
+    async def add_chat(self, chat_id: int|str, title: str, indexed: bool = True):
+        '''
+        Adds a chat or updates its title. If the chat isn't 'indexed', its members aren't reported
+        to the bot and have to be checked by 'get_unchecked_chats'.
+        '''
+        await self._add_chat(
+            keys=[
+                self.generate_key('titles'),
+                self.generate_key('unindexed'),
+                self.generate_key('members', chat_id),
+            ],
+            args=[chat_id, _make_entry(chat_id, title), int(indexed), self.generate_key('user', '')]
+        )
+
+    async def remove_chat(self, chat_id: int|str):
+        '''
+        Removes a chat and its members if it's present.
+        '''
+        await self._remove_chat(
+            keys=[
+                self.generate_key('titles'),
+                self.generate_key('unindexed'),
+                self.generate_key('members', chat_id),
+            ],
+            args=[chat_id, self.generate_key('user', '')]
+        )
+
+    async def add_member(self, chat_id: int|str, user_id: int|str):
+        '''
+        Adds a user to members of a registered chat.
+        '''
+        await self._add_member(
+            keys=[
+                self.generate_key('titles'),
+                self.generate_key('members', chat_id),
+                self.generate_key('user', user_id),
+            ],
+            args=[chat_id, user_id]
+        )
+
+    async def remove_member(self, chat_id: int|str, user_id: int|str):
+        '''
+        Removes a user from members of a chat.
+        '''
+        await self._remove_member(
+            keys=[
+                self.generate_key('titles'),
+                self.generate_key('members', chat_id),
+                self.generate_key('user', user_id),
+            ],
+            args=[chat_id, user_id]
+        )
+
+    async def is_member(self, chat_id: int|str, user_id: int|str) -> bool:
+        '''
+        Checks if a user is a known member of a chat.
+        '''
+        return bool(await self.ds.sismember(self.generate_key('members', chat_id), str(user_id)))
+
+    async def get_user_chats(
+            self,
+            user_id: int|str,
+            query: str = '',
+            offset: int = 0,
+            limit: int = 10
+        ) -> tuple[list[tuple[str, str]], bool]:
+        '''
+        Returns a page of pairs of a chat title and a chat ID for chats of a user ordered by
+        titles and a flag showing that there are more chats after the page. Only chats with
+        titles starting with 'query' (case insensitive) are returned if it's given.
+        '''
+        prefix = query.casefold().replace(ENTRY_SEPARATOR, '')
+        entries = await self.ds.zrangebylex(
+            self.generate_key('user', user_id),
+            f'[{prefix}' if prefix else '-',
+            f'[{prefix}\U0010ffff' if prefix else '+',
+            start=offset,
+            num=limit + 1
+        )
+        chats = []
+        for entry in entries[:limit]:
+            _, title, chat_id = _decode(entry).split(ENTRY_SEPARATOR)
+            chats.append((title, chat_id))
+        return chats, len(entries) > limit
+
+    async def get_unchecked_chats(self, user_id: int|str, limit: int = 10) -> list[str]:
+        '''
+        Returns IDs of up to 'limit' unindexed chats following the last chat checked for a user in
+        order of chat IDs.
+        '''
+        checked = await self.ds.get(self.generate_key('checked', user_id))
+        chat_ids = await self.ds.zrangebyscore(
+            self.generate_key('unindexed'),
+            f'({_decode(checked)}' if checked is not None else '-inf',
+            '+inf',
+            start=0,
+            num=limit
+        )
+        return list(map(_decode, chat_ids))
+
+    async def set_checked_chat(self, user_id: int|str, chat_id: int|str, ttl: int = 86400):
+        '''
+        Marks unindexed chats up to 'chat_id' as checked for a user. The checks start over from the
+        first chat 'ttl' seconds after the last one.
+        '''
+        await self.ds.set(self.generate_key('checked', user_id), str(chat_id), ex=ttl)
+
+    async def import_legacy_chats(self, legacy_ds: redis.Redis) -> int:
+        '''
+        Moves chats kept by the previous versions of the bot in data storage 'legacy_ds' as
+        separate string keys (a chat ID as a key and a chat title as a value) into the registry.
+        Their members are unknown, so they're added as unindexed chats. Returns the number of
+        moved chats.
+        '''
+        number = 0
+        async for key in legacy_ds.scan_iter(count=self.page_size, _type='string'):
+            chat_id = _decode(key)
+            if not chat_id.lstrip('-').isdigit():
+                continue
+            title = await legacy_ds.get(key)
+            if title is not None:
+                await self.add_chat(chat_id, _decode(title), indexed=False)
+                await legacy_ds.delete(key)
+                number += 1
+        return number
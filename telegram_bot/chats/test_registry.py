@@ -0,0 +1,224 @@
+'''
+Tests 'registry' module.
+'''
+import asyncio
+
+from . import registry
+
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the registry.
+    '''
+    def __init__(self, strings: dict[str, str] | None = None):
+        self.data = dict(strings or {})
+        self.ttls = {}
+
+    def register_script(self, script: str):
+        '''
+        Returns a function running the registry script 'script' in memory.
+        '''
+        function = {
+            registry.ADD_CHAT_SCRIPT: self._add_chat,
+            registry.REMOVE_CHAT_SCRIPT: self._remove_chat,
+            registry.ADD_MEMBER_SCRIPT: self._add_member,
+            registry.REMOVE_MEMBER_SCRIPT: self._remove_member,
+        }[script]
+
+        async def run_script(keys: list[str], args: list):
+            return await function(*keys, *map(str, args))
+        return run_script
+
+    async def _add_chat(
+            self,
+            titles_key: str,
+            unindexed_key: str,
+            members_key: str,
+            chat_id: str,
+            entry: str,
+            indexed: str,
+            user_key_prefix: str
+        ):
+        old_entry = await self.hget(titles_key, chat_id)
+        if indexed == '1':
+            await self.zrem(unindexed_key, chat_id)
+        else:
+            await self.zadd(unindexed_key, {chat_id: int(chat_id)})
+        if old_entry == entry:
+            return
+        await self.hset(titles_key, chat_id, entry)
+        for user_id in await self.smembers(members_key):
+            if old_entry is not None:
+                await self.zrem(user_key_prefix + user_id, old_entry)
+            await self.zadd(user_key_prefix + user_id, {entry: 0})
+
+    async def _remove_chat(
+            self,
+            titles_key: str,
+            unindexed_key: str,
+            members_key: str,
+            chat_id: str,
+            user_key_prefix: str
+        ):
+        entry = await self.hget(titles_key, chat_id)
+        if entry is not None:
+            for user_id in await self.smembers(members_key):
+                await self.zrem(user_key_prefix + user_id, entry)
+        await self.hdel(titles_key, chat_id)
+        await self.zrem(unindexed_key, chat_id)
+        await self.delete(members_key)
+
+    async def _add_member(
+            self,
+            titles_key: str,
+            members_key: str,
+            user_key: str,
+            chat_id: str,
+            user_id: str
+        ):
+        entry = await self.hget(titles_key, chat_id)
+        if entry is not None:
+            await self.sadd(members_key, user_id)
+            await self.zadd(user_key, {entry: 0})
+
+    async def _remove_member(
+            self,
+            titles_key: str,
+            members_key: str,
+            user_key: str,
+            chat_id: str,
+            user_id: str
+        ):
+        entry = await self.hget(titles_key, chat_id)
+        await self.srem(members_key, user_id)
+        if entry is not None:
+            await self.zrem(user_key, entry)
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, count: int = 10, _type: str | None = None):
+        for key, value in list(self.data.items()):
+            if _type is None or isinstance(value, str):
+                yield key
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.data.get(key, {}).get(field)
+
+    async def hset(self, key: str, field: str, value: str):
+        self.data.setdefault(key, {})[field] = value
+
+    async def hdel(self, key: str, field: str):
+        self.data.get(key, {}).pop(field, None)
+
+    async def smembers(self, key: str) -> set[str]:
+        return set(self.data.get(key, set()))
+
+    async def sadd(self, key: str, *members: str):
+        self.data.setdefault(key, set()).update(members)
+
+    async def srem(self, key: str, *members: str):
+        self.data.get(key, set()).difference_update(members)
+
+    async def sismember(self, key: str, member: str) -> bool:
+        return member in self.data.get(key, set())
+
+    async def zadd(self, key: str, mapping: dict[str, float]):
+        self.data.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key: str, *members: str):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+    async def zrangebyscore(
+            self,
+            key: str,
+            min: str,
+            max: str,
+            start: int,
+            num: int
+        ) -> list[str]:
+        assert max == '+inf'
+        scores = self.data.get(key, {})
+        members = sorted(
+            (member for member in scores if min == '-inf' or scores[member] > float(min[1:])),
+            key=scores.get
+        )
+        return members[start:start + num]
+
+    async def zrangebylex(self, key: str, min: str, max: str, start: int, num: int) -> list[str]:
+        entries = sorted(
+            entry for entry in self.data.get(key, {})
+            if (min == '-' or entry >= min[1:]) and (max == '+' or entry <= max[1:])
+        )
+        return entries[start:start + num]
+
+    # Defined after the annotations using the built-in 'set'
+    async def set(self, key: str, value: str, ex: int | None = None):
+        self.data[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
+
+def test_user_chats():
+    '''
+    Tests the index of chats by members.
+    '''
+    async def test():
+        chat_registry = registry.ChatRegistry(MemoryRedis())
+        await chat_registry.add_chat(-1, 'Family')
+        await chat_registry.add_chat(-2, 'football club')
+        await chat_registry.add_chat(-3, 'Friends')
+        for chat_id in (-1, -2, -3):
+            await chat_registry.add_member(chat_id, 10)
+        await chat_registry.add_member(-1, 20)
+        await chat_registry.add_member(-4, 20) # Unknown chats are ignored
+
+        assert await chat_registry.get_user_chats(10, limit=2) == (
+            [('Family', '-1'), ('football club', '-2')], True
+        )
+        assert await chat_registry.get_user_chats(10, query='FR') == ([('Friends', '-3')], False)
+        assert await chat_registry.get_user_chats(20) == ([('Family', '-1')], False)
+
+        # A new title is indexed for all members
+        await chat_registry.add_chat(-1, 'Relatives')
+        assert await chat_registry.get_user_chats(20) == ([('Relatives', '-1')], False)
+
+        await chat_registry.remove_member(-3, 10)
+        await chat_registry.remove_chat(-2)
+        assert await chat_registry.get_user_chats(10) == ([('Relatives', '-1')], False)
+        assert await chat_registry.is_member(-1, 20)
+        assert not await chat_registry.is_member(-2, 10)
+
+    asyncio.run(test())
+
+def test_unindexed_chats():
+    '''
+    Tests that legacy chats and chats without reported members are checked by users a few at a
+    time until all of them are checked.
+    '''
+    async def test():
+        legacy_ds = MemoryRedis({'-1': 'Family', '-2': 'Friends', 'other': 'value'})
+        ds = MemoryRedis()
+        chat_registry = registry.ChatRegistry(ds)
+        assert await chat_registry.import_legacy_chats(legacy_ds) == 2
+        assert legacy_ds.data == {'other': 'value'}
+        await chat_registry.add_chat(-3, 'Colleagues')
+        await chat_registry.add_chat(-4, 'Neighbours', indexed=False)
+
+        assert await chat_registry.get_unchecked_chats(10, limit=2) == ['-4', '-2']
+        await chat_registry.set_checked_chat(10, '-4', ttl=60)
+        assert ds.ttls[chat_registry.generate_key('checked', 10)] == 60
+        assert await chat_registry.get_unchecked_chats(10, limit=2) == ['-2', '-1']
+        await chat_registry.set_checked_chat(10, '-1')
+        assert await chat_registry.get_unchecked_chats(10) == []
+
+        # Chats that have become indexed or have been removed aren't checked anymore
+        await chat_registry.add_chat(-1, 'Family')
+        await chat_registry.remove_chat(-2)
+        assert await chat_registry.get_unchecked_chats(20) == ['-4']
+
+    asyncio.run(test())
@@ -0,0 +1,9 @@
+'''
+Makes the top-level packages of the bot importable in tests the same way as when the bot runs from
+this directory.
+'''
+import pathlib
+import sys
+
+
+sys.path.append(str(pathlib.Path(__file__).parent))
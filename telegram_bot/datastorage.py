@@ -0,0 +1,69 @@
+'''
+Represents the application-wide pool of connections to the Redis data storage.
+'''
+import time
+
+import redis.asyncio as redis
+
+
+class ConnectionPool(redis.BlockingConnectionPool):
+    '''
+    Represents a blocking connection pool counting round-trips to the data storage (a command or a
+    pipeline takes a connection once) and the time spent getting connections from the pool.
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+        self.wait_time = 0.0
+
+    async def get_connection(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            self.round_trips += 1
+            self.wait_time += time.perf_counter() - started_at
+
+class DataStorage:
+    '''
+    Represents a pool of connections to the Redis data storage shared by the FSM storage, the
+    group chat registry, the caches and the other stores. They all use one database, so they're
+    separated by key prefixes only, and nothing may flush the database. Connections are created
+    on demand up to 'max_connections'; when all of them are busy a command waits for a free one
+    up to 'pool_timeout' seconds. Idle connections are checked every 'health_check_interval'
+    seconds before use. Responses are decoded to strings.
+    '''
+    def __init__(
+            self,
+            host: str = 'localhost',
+            port: int = 6379,
+            db: int = 0,
+            max_connections: int = 20,
+            pool_timeout: int|float = 5,
+            health_check_interval: int|float = 30,
+            socket_timeout: int|float|None = 5
+        ):
+        self.pool = ConnectionPool(
+            host=host,
+            port=port,
+            db=db,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            health_check_interval=health_check_interval,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            decode_responses=True
+        )
+        self.redis = redis.Redis(connection_pool=self.pool)
+
+    async def start(self):
+        '''
+        Checks that the data storage is reachable.
+        '''
+        await self.redis.ping()
+
+    async def close(self):
+        '''
+        Closes all connections of the pool.
+        '''
+        await self.pool.disconnect()
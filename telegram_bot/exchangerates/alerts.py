@@ -0,0 +1,401 @@
+'''
+Represents alerts on exchange rates crossing thresholds, e.g. "EUR/USD < 1.05", evaluated against
+snapshots of the rate table.
+'''
+import asyncio
+import json
+import logging
+import re
+import time
+import typing
+
+import redis.asyncio as redis
+
+from . import exchangerates
+from . import ratetable
+
+
+logger = logging.getLogger(__name__)
+
+# Directions of alerts: the rate falls below or rises above the threshold
+DIRECTION_BELOW = '<'
+DIRECTION_ABOVE = '>'
+
+# Moves alerts of a pair crossed by rate ARGV[1] from the indexes KEYS[1] (alerts on falling
+# below, by thresholds) and KEYS[2] (alerts on rising above, by thresholds) to the outbox KEYS[3]
+# scored by time ARGV[2] and their data from hash KEYS[5] to hash KEYS[6] atomically, so an alert
+# is triggered once however many replicas evaluate the snapshot. Forgets pair ARGV[3] in the set
+# KEYS[4] when it has no alerts left. Returns the number of triggered alerts.
+TRIGGER_SCRIPT = '''
+local below = redis.call('ZRANGEBYSCORE', KEYS[1], '(' .. ARGV[1], '+inf')
+local above = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+if #below > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '(' .. ARGV[1], '+inf')
+end
+if #above > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+end
+local triggered = 0
+for _, alert_ids in ipairs({below, above}) do
+    for _, alert_id in ipairs(alert_ids) do
+        local data = redis.call('HGET', KEYS[5], alert_id)
+        if data then
+            redis.call('HDEL', KEYS[5], alert_id)
+            redis.call('HSET', KEYS[6], alert_id, data)
+            redis.call('ZADD', KEYS[3], ARGV[2], alert_id)
+            triggered = triggered + 1
+        end
+    end
+end
+if redis.call('ZCARD', KEYS[1]) == 0 and redis.call('ZCARD', KEYS[2]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[3])
+end
+return triggered
+'''
+
+# Takes up to ARGV[2] alerts due by ARGV[1] from the outbox KEYS[1] and leases them for ARGV[3]
+# seconds atomically, so every triggered alert is taken by one bot replica only and is taken
+# again if its delivery isn't completed in time. Returns data of the taken alerts from hash
+# KEYS[2].
+TAKE_TRIGGERED_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local alert_ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, ARGV[2])
+local result = {}
+for _, alert_id in ipairs(alert_ids) do
+    local data = redis.call('HGET', KEYS[2], alert_id)
+    if data then
+        redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), alert_id)
+        table.insert(result, data)
+    else
+        redis.call('ZREM', KEYS[1], alert_id)
+    end
+end
+return result
+'''
+
+_ALERT_RE = re.compile(
+    r'\s*(?P<from_currency>[a-zA-Z]{3})\s*[/\s]\s*(?P<to_currency>[a-zA-Z]{3})\s*'
+    r'(?P<direction>[<>])\s*(?P<threshold>\d+(?:\.\d+)?)\s*'
+)
+
+class Alert:
+    '''
+    Represents an alert of chat 'chat_id' on the rate of currency 'from_currency' in currency
+    'to_currency' falling below or rising above 'threshold' by 'direction'.
+    '''
+    def __init__(
+            self,
+            chat_id: int,
+            from_currency: str,
+            to_currency: str,
+            direction: str,
+            threshold: float,
+            alert_id: int | None = None
+        ):
+        self.chat_id = chat_id
+        self.from_currency = from_currency
+        self.to_currency = to_currency
+        self.direction = direction
+        self.threshold = threshold
+        self.alert_id = alert_id
+
+    @property
+    def pair(self) -> str:
+        return f'{self.from_currency}/{self.to_currency}'
+
+    def is_crossed(self, rate: float) -> bool:
+        '''
+        Checks if 'rate' has crossed the threshold.
+        '''
+        if self.direction == DIRECTION_BELOW:
+            return rate < self.threshold
+        return rate > self.threshold
+
+    def __str__(self) -> str:
+        return f'{self.pair} {self.direction} {self.threshold:g}'
+
+    def dumps(self) -> str:
+        return json.dumps({
+            'chat_id': self.chat_id,
+            'from_currency': self.from_currency,
+            'to_currency': self.to_currency,
+            'direction': self.direction,
+            'threshold': self.threshold,
+            'alert_id': self.alert_id,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> 'Alert':
+        return cls(**json.loads(raw))
+
+def parse_alert(chat_id: int, text: str) -> Alert | None:
+    '''
+    Parses an alert like "EUR/USD < 1.05" or "eur usd > 1.1" in 'text'. Returns None if 'text'
+    isn't an alert. Currency codes are returned in upper case but aren't checked.
+    '''
+    match = _ALERT_RE.fullmatch(text)
+    if match is None:
+        return None
+    return Alert(
+        chat_id,
+        match['from_currency'].upper(),
+        match['to_currency'].upper(),
+        match['direction'],
+        float(match['threshold'])
+    )
+
+class AlertStore:
+    '''
+    Represents alerts kept in Redis: a hash 'prefix:data' keeps alerts by IDs, sorted sets
+    'prefix:below:<pair>' and 'prefix:above:<pair>' index alerts of a currency pair by thresholds,
+    a set 'prefix:pairs' keeps pairs with alerts and a set 'prefix:chat:<chat ID>' keeps alerts of
+    a chat. Crossed alerts are found by a range query over the indexes of a pair, so the cost of
+    a rate change depends on the number of crossed alerts only. Triggered alerts are moved to
+    a hash 'prefix:triggered' and wait for delivery in a sorted set 'prefix:outbox' until their
+    deliveries are completed.
+    '''
+    def __init__(self, ds: redis.Redis, prefix: str = 'rate_alerts'):
+        self.ds = ds
+        self.prefix = prefix
+        self._trigger = ds.register_script(TRIGGER_SCRIPT)
+        self._take_triggered = ds.register_script(TAKE_TRIGGERED_SCRIPT)
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(map(str, parts)))
+
+    def _generate_index_key(self, direction: str, pair: str) -> str:
+        return self.generate_key('below' if direction == DIRECTION_BELOW else 'above', pair)
+
+    async def add(self, alert: Alert) -> Alert:
+        '''
+        Adds an alert assigning it an ID.
+        '''
+        alert.alert_id = await self.ds.incr(self.generate_key('last_id'))
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.hset(self.generate_key('data'), str(alert.alert_id), alert.dumps())
+            pipe.zadd(
+                self._generate_index_key(alert.direction, alert.pair),
+                {str(alert.alert_id): alert.threshold}
+            )
+            pipe.sadd(self.generate_key('pairs'), alert.pair)
+            pipe.sadd(self.generate_key('chat', alert.chat_id), str(alert.alert_id))
+            await pipe.execute()
+        return alert
+
+    async def get_chat_alerts(self, chat_id: int) -> list[Alert]:
+        '''
+        Returns alerts of a chat which haven't been triggered yet.
+        '''
+        chat_key = self.generate_key('chat', chat_id)
+        alert_ids = await self.ds.smembers(chat_key)
+        if not alert_ids:
+            return []
+        alert_ids = sorted(alert_ids, key=int)
+        raw_alerts = await self.ds.hmget(self.generate_key('data'), *alert_ids)
+        # Forget triggered alerts
+        triggered_ids = [
+            alert_id for alert_id, raw in zip(alert_ids, raw_alerts) if raw is None
+        ]
+        if triggered_ids:
+            await self.ds.srem(chat_key, *triggered_ids)
+        return [Alert.loads(raw) for raw in raw_alerts if raw is not None]
+
+    async def remove_chat(self, chat_id: int) -> int:
+        '''
+        Removes all alerts of a chat. Returns their number.
+        '''
+        alerts = await self.get_chat_alerts(chat_id)
+        async with self.ds.pipeline(transaction=True) as pipe:
+            for alert in alerts:
+                pipe.hdel(self.generate_key('data'), str(alert.alert_id))
+                pipe.zrem(
+                    self._generate_index_key(alert.direction, alert.pair),
+                    str(alert.alert_id)
+                )
+            pipe.delete(self.generate_key('chat', chat_id))
+            await pipe.execute()
+        return len(alerts)
+
+    async def get_pairs(self) -> list[str]:
+        return list(await self.ds.smembers(self.generate_key('pairs')))
+
+    async def trigger(self, pair: str, rate: float, now: float | None = None) -> int:
+        '''
+        Triggers alerts of currency pair 'pair' crossed by 'rate'. Returns their number.
+        '''
+        return await self._trigger(
+            keys=[
+                self._generate_index_key(DIRECTION_BELOW, pair),
+                self._generate_index_key(DIRECTION_ABOVE, pair),
+                self.generate_key('outbox'),
+                self.generate_key('pairs'),
+                self.generate_key('data'),
+                self.generate_key('triggered'),
+            ],
+            args=[repr(float(rate)), time.time() if now is None else now, pair]
+        )
+
+    async def take_triggered(
+            self,
+            limit: int,
+            now: float | None = None,
+            lease: int = 300
+        ) -> list[Alert]:
+        '''
+        Takes up to 'limit' triggered alerts for delivery for 'lease' seconds: unless their
+        deliveries are completed by 'complete' in time, they're taken again.
+        '''
+        result = await self._take_triggered(
+            keys=[self.generate_key('outbox'), self.generate_key('triggered')],
+            args=[time.time() if now is None else now, limit, lease]
+        )
+        return [Alert.loads(raw) for raw in result]
+
+    async def complete(self, alert_list: list[Alert]):
+        '''
+        Forgets taken alerts 'alert_list' whose deliveries are completed.
+        '''
+        if not alert_list:
+            return
+        alert_ids = [str(alert.alert_id) for alert in alert_list]
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.generate_key('outbox'), *alert_ids)
+            pipe.hdel(self.generate_key('triggered'), *alert_ids)
+            await pipe.execute()
+
+    async def claim_snapshot(self, timestamp: int, ttl: int) -> bool:
+        '''
+        Checks if no other bot replica has evaluated alerts against the snapshot of rates made at
+        'timestamp' and marks the snapshot as evaluated for 'ttl' seconds.
+        '''
+        return bool(await self.ds.set(self.generate_key('evaluated', timestamp), 1, nx=True,
+                                      ex=ttl))
+
+SendType = typing.Callable[[Alert, float | None], typing.Awaitable[bool]]
+
+class AlertMonitor:
+    '''
+    Represents a background task checking rate table 'rate_table' ('ratetable.RateTable') every
+    'interval' seconds. Every new snapshot of rates is evaluated once by one bot replica: alerts
+    of 'alert_store' ('AlertStore') crossed by the rates of their pairs are triggered. Triggered
+    alerts are delivered in batches of 'batch_size' by awaiting 'send' with an alert and the
+    current rate of its pair; it returns False if all alerts of the chat have to be removed (e.g.
+    the bot is blocked). Deliveries that have failed ('send' has raised an exception) are retried
+    'retry_delay' seconds later.
+    '''
+    def __init__(
+            self,
+            alert_store: AlertStore,
+            rate_table: ratetable.RateTable,
+            send: SendType,
+            interval: int|float = 60,
+            batch_size: int = 100,
+            retry_delay: int = 300
+        ):
+        self.store = alert_store
+        self.rate_table = rate_table
+        self.send = send
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.triggered = 0
+        self.delivered = 0
+        self.failed = 0
+        self._evaluated_timestamp: int | None = None
+        self._task: asyncio.Task | None = None
+
+    def get_rate(self, pair: str) -> float | None:
+        '''
+        Returns the rate of currency pair 'pair' by the current snapshot or None if it's unknown.
+        '''
+        rates_data = self.rate_table.get_rates_data(allow_stale=True)
+        if rates_data is None:
+            return None
+        from_currency, to_currency = pair.split('/')
+        try:
+            return exchangerates.convert_by_rates(from_currency, to_currency, 1, rates_data)
+        except exchangerates.ConversionError:
+            return None
+
+    async def evaluate(self) -> int:
+        '''
+        Triggers alerts crossed by the rates of a new fresh snapshot. Returns the number of
+        triggered alerts.
+        '''
+        rates_data = self.rate_table.get_rates_data()
+        if rates_data is None or rates_data['timestamp'] == self._evaluated_timestamp:
+            return 0
+        is_claimed = await self.store.claim_snapshot(
+            rates_data['timestamp'],
+            int(self.rate_table.max_age)
+        )
+        self._evaluated_timestamp = rates_data['timestamp']
+        if not is_claimed:
+            return 0
+
+        triggered = 0
+        for pair in await self.store.get_pairs():
+            rate = self.get_rate(pair)
+            if rate is not None:
+                triggered += await self.store.trigger(pair, rate)
+        self.triggered += triggered
+        return triggered
+
+    async def deliver(self) -> int:
+        '''
+        Delivers triggered alerts. Returns the number of delivered alerts.
+        '''
+        delivered = 0
+        while True:
+            alerts = await self.store.take_triggered(self.batch_size, lease=self.retry_delay)
+            results = await asyncio.gather(
+                *[self.send(alert, self.get_rate(alert.pair)) for alert in alerts],
+                return_exceptions=True
+            )
+            completed = []
+            for alert, result in zip(alerts, results):
+                if isinstance(result, Exception):
+                    # The alert is left leased to be retried
+                    logger.warning('Alert %s of chat %s has not been delivered: %r',
+                                   alert.alert_id, alert.chat_id, result)
+                    self.failed += 1
+                    continue
+                if result:
+                    delivered += 1
+                else:
+                    await self.store.remove_chat(alert.chat_id)
+                completed.append(alert)
+            await self.store.complete(completed)
+            if len(alerts) < self.batch_size:
+                self.delivered += delivered
+                return delivered
+
+    async def _run(self):
+        while True:
+            try:
+                await self.evaluate()
+                await self.deliver()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Rate alerts have not been processed.')
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        '''
+        Starts the background task processing alerts.
+        '''
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        '''
+        Stops the background task.
+        '''
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
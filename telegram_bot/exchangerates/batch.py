@@ -0,0 +1,61 @@
+'''
+Represents batch conversions of several amounts to several currencies at once, e.g.
+"100 USD -> EUR, GBP, JPY", "10, 20.5 EUR to USD" or "100 USD EUR".
+'''
+import re
+
+from . import exchangerates
+
+
+_AMOUNT = r'\d+(?:\.\d+)?'
+_SEPARATOR = r'(?:\s*[,;]\s*|\s+)'
+_REQUEST_RE = re.compile(
+    rf'\s*(?P<amounts>{_AMOUNT}(?:{_SEPARATOR}{_AMOUNT})*)\s*(?P<from_currency>[a-zA-Z]{{3}})'
+    rf'(?:\s*(?:->|→|=)\s*|\s+(?:(?:to|in)\s+)?)'
+    rf'(?P<to_currencies>[a-zA-Z]{{3}}(?:{_SEPARATOR}[a-zA-Z]{{3}})*)\s*'
+)
+
+class BatchRequest:
+    '''
+    Represents a request to convert 'amounts' from currency 'from_currency' to every currency of
+    'to_currencies'.
+    '''
+    def __init__(self, amounts: list[float], from_currency: str, to_currencies: list[str]):
+        self.amounts = amounts
+        self.from_currency = from_currency
+        self.to_currencies = to_currencies
+
+    @property
+    def size(self) -> int:
+        '''
+        Returns the number of conversions.
+        '''
+        return len(self.amounts) * len(self.to_currencies)
+
+def parse_request(text: str) -> BatchRequest | None:
+    '''
+    Parses a batch request like "100 USD -> EUR, GBP" in 'text'. Returns None if 'text' isn't
+    a batch request. Currency codes are returned in upper case but aren't checked.
+    '''
+    match = _REQUEST_RE.fullmatch(text)
+    if match is None:
+        return None
+    amounts = [float(amount) for amount in re.findall(_AMOUNT, match['amounts'])]
+    # Repeated target currencies are converted once
+    to_currencies = list(dict.fromkeys(
+        code.upper() for code in re.findall(r'[a-zA-Z]{3}', match['to_currencies'])
+    ))
+    return BatchRequest(amounts, match['from_currency'].upper(), to_currencies)
+
+def convert(request: BatchRequest, rates_data: exchangerates.RatesDataType) -> list[list[float]]:
+    '''
+    Converts all amounts of 'request' using rates 'rates_data' returned by
+    'exchangerates.get_latest_rates'. The rate of every pair is computed once and then applied to
+    all amounts. Returns a row of results by target currencies for every amount.
+    Can raise exception 'exchangerates.ConversionError'.
+    '''
+    factors = [
+        exchangerates.convert_by_rates(request.from_currency, to_currency, 1, rates_data)
+        for to_currency in request.to_currencies
+    ]
+    return [[amount * factor for factor in factors] for amount in request.amounts]
@@ -2,10 +2,16 @@
 Represents functions for work with the ExchangeRates service.
 '''
 import aiohttp
-import re
+
+from upstream import client
+
+from . import iso4217
 
 
 URL = 'https://api.apilayer.com/exchangerates_data/convert'
+LATEST_URL = 'https://api.apilayer.com/exchangerates_data/latest'
+
+RatesDataType = dict[str, str|int|dict[str, float]]
 
 class ConversionError(Exception):
     '''
@@ -30,11 +36,13 @@ async def convert_currency(
         from_cur_code: str,
         to_cur_code: str,
         amount: int|float,
-        api_key: str
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
     ) -> float:
     '''
     Converts 'amount' from currency with code 'from_cur_code' to currency with code 'to_cur_code'
-    using the ExchangeRates service and API key 'api_key'.
+    using the ExchangeRates service and API key 'api_key'. A shared 'session' is used if given,
+    otherwise a temporary one is opened.
     Can raise exceptions 'ConversionError', 'AccessDenied', 'ServiceUnavailable' and 
     'aiohttp.ClientError'.
     '''
@@ -49,8 +57,8 @@ async def convert_currency(
     }
 
     # Request and parse data
-    async with aiohttp.ClientSession(headers=headers) as session:
-        async with session.get(URL, params=params) as response:
+    async with client.session_scope(session) as session:
+        async with session.get(URL, params=params, headers=headers) as response:
             # Get response data
             try:
                 data = await response.json()
@@ -79,8 +87,86 @@ async def convert_currency(
                     f'The ExchangeRates service has returned code {response.status}'
                 )
 
+async def get_latest_rates(
+        base_cur_code: str,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> RatesDataType:
+    '''
+    Requests the latest rates of all currencies against currency with code 'base_cur_code' using
+    the ExchangeRates service and API key 'api_key'. Returns a dictionary with keys 'base',
+    'timestamp' (UNIX time of the rates) and 'rates' (rates by currency codes).
+    Can raise exceptions 'ConversionError', 'AccessDenied', 'ServiceUnavailable' and
+    'aiohttp.ClientError'.
+    '''
+    # Set request headers
+    headers = {'apikey': api_key}
+
+    # Set request parameters
+    params = {'base': base_cur_code}
+
+    # Request and parse data
+    async with client.session_scope(session) as session:
+        async with session.get(LATEST_URL, params=params, headers=headers) as response:
+            # Get response data
+            try:
+                data = await response.json()
+            except:
+                raise ServiceUnavailable('Bad or absent JSON data in the response.')
+
+            # Parse the data
+            if response.status == 200:
+                try:
+                    rates_data = {
+                        'base': data['base'],
+                        'timestamp': int(data['timestamp']),
+                        'rates': {code: float(rate) for code, rate in data['rates'].items()},
+                    }
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    raise ServiceUnavailable('Bad data has received from the service.')
+                if not data.get('success', None) or not rates_data['rates']:
+                    raise ServiceUnavailable('Bad data has received from the service.')
+                return rates_data
+            elif response.status == 400:
+                try:
+                    raise ConversionError(data['error']['message'])
+                except KeyError:
+                    raise ServiceUnavailable('The ExchangeRates service has returned code 400.')
+            elif response.status == 401:
+                try:
+                    message = data['message']
+                except KeyError:
+                    message = 'There is no any message in the service response.'
+                raise AccessDenied(message)
+            else:
+                raise ServiceUnavailable(
+                    f'The ExchangeRates service has returned code {response.status}'
+                )
+
+def convert_by_rates(
+        from_cur_code: str,
+        to_cur_code: str,
+        amount: int|float,
+        rates_data: RatesDataType
+    ) -> float:
+    '''
+    Converts 'amount' from currency with code 'from_cur_code' to currency with code 'to_cur_code'
+    using rates 'rates_data' returned by 'get_latest_rates'. Pairs without the base currency are
+    converted through it.
+    Can raise exception 'ConversionError'.
+    '''
+    rates = rates_data['rates']
+    try:
+        from_rate = 1.0 if from_cur_code == rates_data['base'] else rates[from_cur_code]
+        to_rate = 1.0 if to_cur_code == rates_data['base'] else rates[to_cur_code]
+    except KeyError as error:
+        raise ConversionError(f'There is no rate for currency {error.args[0]}.')
+    if not from_rate:
+        raise ConversionError(f'There is no rate for currency {from_cur_code}.')
+    return amount * to_rate / from_rate
+
 def check_currency_code(currency_code: str) -> bool:
     '''
-    Checks the format of given 'currency_code'.
+    Checks if given 'currency_code' (in any case) is an ISO 4217 code.
     '''
-    return bool(re.fullmatch(r'^[a-zA-Z]{3}$', currency_code))
+    return currency_code.upper() in iso4217.CURRENCY_CODES
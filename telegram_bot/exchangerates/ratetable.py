@@ -0,0 +1,188 @@
+'''
+Represents a local table of exchange rates refreshed from the ExchangeRates service on a schedule.
+'''
+import asyncio
+import json
+import logging
+import time
+import typing
+
+import aiohttp
+import redis.asyncio as redis
+
+from . import exchangerates
+
+
+logger = logging.getLogger(__name__)
+
+class RateTable:
+    '''
+    Represents a snapshot of rates against currency 'base' kept in memory and in a Redis data
+    storage shared by all bot replicas. A background task reloads the snapshot every
+    'reload_interval' seconds. Only one replica per 'refresh_interval' requests fresh rates from
+    the service (guarded by a lock in the data storage), the others pick them up from the data
+    storage. A snapshot older than 'max_age' seconds isn't used for conversions. Requests go
+    through 'breaker' if it's given (an object with coroutine method 'call(fetch, acquire)' like
+    'upstream.breaker.CircuitBreaker'), and every attempt is throttled by 'limiter' if it's given
+    (an object with coroutine method 'acquire()' like 'upstream.ratelimit.RateLimiter').
+    '''
+    def __init__(
+            self,
+            ds: redis.Redis | None,
+            prefix: str,
+            base: str,
+            api_key: str,
+            refresh_interval: int|float = 3600,
+            reload_interval: int|float = 60,
+            max_age: int|float = 10800,
+            breaker: typing.Any = None,
+            limiter: typing.Any = None
+        ):
+        self.ds = ds
+        self.prefix = prefix
+        self.base = base
+        self.api_key = api_key
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.max_age = max_age
+        self.breaker = breaker
+        self.limiter = limiter
+        self.rates_data: exchangerates.RatesDataType | None = None
+        self._task: asyncio.Task | None = None
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix, self.base) + parts)
+
+    def is_fresh(self) -> bool:
+        '''
+        Checks if the table has a snapshot that isn't older than 'max_age'.
+        '''
+        return (
+            self.rates_data is not None
+            and time.time() - self.rates_data['timestamp'] <= self.max_age
+        )
+
+    def get_rates_data(self, allow_stale: bool = False) -> exchangerates.RatesDataType | None:
+        '''
+        Returns the local snapshot or None if there is no fresh snapshot (or no snapshot at all if
+        'allow_stale' is set).
+        '''
+        if self.rates_data is None or not (allow_stale or self.is_fresh()):
+            return None
+        return self.rates_data
+
+    def convert(
+            self,
+            from_cur_code: str,
+            to_cur_code: str,
+            amount: int|float,
+            allow_stale: bool = False
+        ) -> float | None:
+        '''
+        Converts 'amount' from currency with code 'from_cur_code' to currency with code
+        'to_cur_code' using the local snapshot. Returns None if there is no fresh snapshot (or no
+        snapshot at all if 'allow_stale' is set).
+        Can raise exception 'exchangerates.ConversionError'.
+        '''
+        rates_data = self.get_rates_data(allow_stale)
+        if rates_data is None:
+            return None
+        return exchangerates.convert_by_rates(from_cur_code, to_cur_code, amount, rates_data)
+
+    def _set_rates_data(self, rates_data: exchangerates.RatesDataType):
+        if self.rates_data is None or rates_data['timestamp'] >= self.rates_data['timestamp']:
+            self.rates_data = rates_data
+
+    async def load(self) -> bool:
+        '''
+        Loads a snapshot from the data storage. Returns True if there was one.
+        '''
+        if self.ds is None:
+            return False
+        raw_rates_data = await self.ds.get(self.generate_key('rates'))
+        if raw_rates_data is None:
+            return False
+        self._set_rates_data(json.loads(raw_rates_data))
+        return True
+
+    async def refresh(self, session: aiohttp.ClientSession | None = None):
+        '''
+        Requests fresh rates from the service and stores them in the data storage.
+        Can raise the exceptions of 'exchangerates.get_latest_rates', the breaker and the limiter.
+        '''
+        fetch = lambda: exchangerates.get_latest_rates(self.base, self.api_key, session=session)
+        acquire = self.limiter.acquire if self.limiter is not None else None
+        if self.breaker is not None:
+            rates_data = await self.breaker.call(fetch, acquire=acquire)
+        else:
+            if acquire is not None:
+                await acquire()
+            rates_data = await fetch()
+        self._set_rates_data(rates_data)
+        if self.ds is not None:
+            await self.ds.set(self.generate_key('rates'), json.dumps(rates_data))
+
+    async def update(self, session: aiohttp.ClientSession | None = None):
+        '''
+        Refreshes rates if no other replica has done it within 'refresh_interval', otherwise
+        loads the snapshot stored by that replica.
+        '''
+        if self.ds is None:
+            if not self.is_fresh() or (
+                    time.time() - self.rates_data['timestamp'] >= self.refresh_interval):
+                await self.refresh(session)
+            return
+
+        try:
+            locked = await self.ds.set(
+                self.generate_key('lock'),
+                1,
+                nx=True,
+                ex=max(int(self.refresh_interval), 1)
+            )
+        except redis.RedisError as error:
+            logger.warning('Rate table data storage is unavailable: %s', error)
+            if not self.is_fresh():
+                await self.refresh(session)
+            return
+        if not locked:
+            await self.load()
+            return
+        try:
+            await self.refresh(session)
+        except Exception:
+            # Let the next update (of any replica) retry instead of waiting for the interval
+            try:
+                await self.ds.delete(self.generate_key('lock'))
+            except redis.RedisError as error:
+                logger.warning('Rate table lock has not been released: %s', error)
+            raise
+
+    async def _run(self, session: aiohttp.ClientSession | None):
+        while True:
+            try:
+                await self.update(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Exchange rates have not been updated.')
+            await asyncio.sleep(self.reload_interval)
+
+    async def start(self, session: aiohttp.ClientSession | None = None):
+        '''
+        Starts the background task updating the table using a shared 'session'.
+        '''
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(session))
+
+    async def close(self):
+        '''
+        Stops the background task.
+        '''
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
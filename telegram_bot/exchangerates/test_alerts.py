@@ -0,0 +1,151 @@
+'''
+Tests 'alerts' module.
+'''
+import asyncio
+import time
+
+from . import alerts
+from . import ratetable
+
+
+def test_parse_alert():
+    '''
+    Tests parsing of alerts.
+    '''
+    alert = alerts.parse_alert(1, 'eur/usd < 1.05')
+    assert (alert.chat_id, alert.pair, alert.direction, alert.threshold) == (
+        1, 'EUR/USD', alerts.DIRECTION_BELOW, 1.05
+    )
+    assert str(alerts.parse_alert(1, 'GBP JPY>190')) == 'GBP/JPY > 190'
+    for text in ('EUR/USD', 'EUR/USD = 1', 'EURO/USD < 1', 'EUR/USD < x'):
+        assert alerts.parse_alert(1, text) is None
+
+    assert alert.is_crossed(1.04)
+    assert not alert.is_crossed(1.05)
+    assert alerts.Alert(1, 'EUR', 'USD', alerts.DIRECTION_ABOVE, 1.1).is_crossed(1.2)
+
+class MemoryAlertStore:
+    '''
+    Represents an alert store kept in memory.
+    '''
+    def __init__(self, alert_list: list[alerts.Alert]):
+        self.alerts = alert_list
+        self.outbox: dict[int, tuple[float, alerts.Alert]] = {}
+        self.now = 0
+        self.claimed_timestamps = set()
+        self.removed_chat_ids = []
+
+    async def claim_snapshot(self, timestamp: int, ttl: int) -> bool:
+        if timestamp in self.claimed_timestamps:
+            return False
+        self.claimed_timestamps.add(timestamp)
+        return True
+
+    async def get_pairs(self) -> list[str]:
+        return sorted({alert.pair for alert in self.alerts})
+
+    async def trigger(self, pair: str, rate: float) -> int:
+        triggered = [
+            alert for alert in self.alerts if alert.pair == pair and alert.is_crossed(rate)
+        ]
+        self.alerts = [alert for alert in self.alerts if alert not in triggered]
+        self.outbox.update((alert.alert_id, (self.now, alert)) for alert in triggered)
+        return len(triggered)
+
+    async def take_triggered(
+            self,
+            limit: int,
+            now: float | None = None,
+            lease: int = 300
+        ) -> list[alerts.Alert]:
+        due = sorted(
+            (due_at, alert_id) for alert_id, (due_at, _) in self.outbox.items()
+            if due_at <= self.now
+        )[:limit]
+        taken = []
+        for _, alert_id in due:
+            alert = self.outbox[alert_id][1]
+            self.outbox[alert_id] = (self.now + lease, alert)
+            taken.append(alert)
+        return taken
+
+    async def complete(self, alert_list: list[alerts.Alert]):
+        for alert in alert_list:
+            del self.outbox[alert.alert_id]
+
+    async def remove_chat(self, chat_id: int) -> int:
+        self.removed_chat_ids.append(chat_id)
+        return 0
+
+def test_alert_monitor():
+    '''
+    Tests that every snapshot is evaluated once and crossed alerts are delivered once.
+    '''
+    rate_table = ratetable.RateTable(None, 'rates', 'USD', 'key')
+    rate_table.rates_data = {
+        'base': 'USD',
+        'timestamp': int(time.time()),
+        'rates': {'EUR': 0.9, 'GBP': 0.8},
+    }
+    alert_store = MemoryAlertStore([
+        # EUR/USD is 1.11
+        alerts.Alert(1, 'EUR', 'USD', alerts.DIRECTION_ABOVE, 1.1, 1),
+        alerts.Alert(2, 'EUR', 'USD', alerts.DIRECTION_BELOW, 1.05, 2),
+        # USD/GBP is 0.8
+        alerts.Alert(3, 'USD', 'GBP', alerts.DIRECTION_BELOW, 0.81, 3),
+    ])
+    sent = []
+
+    async def send(alert: alerts.Alert, rate: float | None) -> bool:
+        sent.append((alert.alert_id, round(rate, 2)))
+        # The bot is blocked in chat 3
+        return alert.chat_id != 3
+
+    async def test():
+        monitor = alerts.AlertMonitor(alert_store, rate_table, send, batch_size=1)
+        assert await monitor.evaluate() == 2
+        assert await monitor.deliver() == 1
+        # The same snapshot isn't evaluated again
+        assert await monitor.evaluate() == 0
+        assert await monitor.deliver() == 0
+        assert monitor.triggered == 2
+
+    asyncio.run(test())
+    assert sorted(sent) == [(1, 1.11), (3, 0.8)]
+    assert alert_store.removed_chat_ids == [3]
+    assert [alert.alert_id for alert in alert_store.alerts] == [2]
+
+def test_alert_monitor_retries_failures():
+    '''
+    Tests that alerts which haven't been delivered are retried after the retry delay.
+    '''
+    rate_table = ratetable.RateTable(None, 'rates', 'USD', 'key')
+    rate_table.rates_data = {'base': 'USD', 'timestamp': int(time.time()), 'rates': {'EUR': 0.9}}
+    alert_store = MemoryAlertStore([alerts.Alert(1, 'EUR', 'USD', alerts.DIRECTION_ABOVE, 1.1, 1)])
+    errors = [ConnectionError('Network is unreachable')]
+    sent = []
+
+    async def send(alert: alerts.Alert, rate: float | None) -> bool:
+        if errors:
+            raise errors.pop()
+        sent.append(alert.alert_id)
+        return True
+
+    async def test():
+        monitor = alerts.AlertMonitor(alert_store, rate_table, send, retry_delay=60)
+        assert await monitor.evaluate() == 1
+        assert await monitor.deliver() == 0
+        assert monitor.failed == 1
+        assert list(alert_store.outbox) == [1]
+
+        # The leased alert isn't taken again until the retry delay passes
+        alert_store.now = 30
+        assert await monitor.deliver() == 0
+        alert_store.now = 60
+        assert await monitor.deliver() == 1
+        assert alert_store.outbox == {}
+        alert_store.now = 120
+        assert await monitor.deliver() == 0
+
+    asyncio.run(test())
+    assert sent == [1]
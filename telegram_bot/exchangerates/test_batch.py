@@ -0,0 +1,41 @@
+'''
+Tests 'batch' module.
+'''
+import pytest
+
+from . import batch
+from . import exchangerates
+
+
+RATES_DATA = {'base': 'EUR', 'timestamp': 0, 'rates': {'USD': 2.0, 'GBP': 0.5, 'JPY': 100.0}}
+
+def test_parse_request():
+    '''
+    Tests parsing of batch requests.
+    '''
+    request = batch.parse_request('100 usd -> EUR, GBP,JPY')
+    assert request.amounts == [100.0]
+    assert request.from_currency == 'USD'
+    assert request.to_currencies == ['EUR', 'GBP', 'JPY']
+
+    request = batch.parse_request('10, 20.5; 30 EUR to USD usd')
+    assert request.amounts == [10.0, 20.5, 30.0]
+    assert request.to_currencies == ['USD']
+    assert request.size == 3
+
+    request = batch.parse_request('100 usd eur gbp')
+    assert request.from_currency == 'USD'
+    assert request.to_currencies == ['EUR', 'GBP']
+
+    for text in ('USD -> EUR', '100 USD', '100 USD -> EURO', 'London'):
+        assert batch.parse_request(text) is None
+
+def test_convert():
+    '''
+    Tests converting all amounts of a request.
+    '''
+    request = batch.parse_request('10 20 USD -> EUR GBP JPY')
+    assert batch.convert(request, RATES_DATA) == [[5.0, 2.5, 500.0], [10.0, 5.0, 1000.0]]
+
+    with pytest.raises(exchangerates.ConversionError):
+        batch.convert(batch.parse_request('10 USD -> RUB'), RATES_DATA)
@@ -95,3 +95,16 @@ def test_check_currency_code_output():
     '''
     assert exchangerates.check_currency_code('RUB') == True
     assert exchangerates.check_currency_code('Russian Ruble') == False
+    assert exchangerates.check_currency_code('usd') == True
+    assert exchangerates.check_currency_code('ABC') == False
+
+def test_convert_by_rates_output():
+    '''
+    Tests output of 'convert_by_rates' function including pairs without the base currency.
+    '''
+    rates_data = {'base': 'USD', 'timestamp': 0, 'rates': {'USD': 1.0, 'EUR': 0.5, 'RUB': 80.0}}
+    assert exchangerates.convert_by_rates('USD', 'EUR', 2, rates_data) == 1.0
+    assert exchangerates.convert_by_rates('EUR', 'USD', 1, rates_data) == 2.0
+    assert exchangerates.convert_by_rates('EUR', 'RUB', 1, rates_data) == 160.0
+    with pytest.raises(exchangerates.ConversionError):
+        exchangerates.convert_by_rates('USD', '___', 1, rates_data)
@@ -0,0 +1,99 @@
+'''
+Tests 'ratetable' module.
+'''
+import asyncio
+import time
+import pytest
+
+from . import exchangerates
+from . import ratetable
+
+
+def test_rate_table_convert():
+    '''
+    Tests conversion with fresh, stale and missing snapshots.
+    '''
+    rate_table = ratetable.RateTable(None, 'rates', 'USD', '_', max_age=60)
+    assert rate_table.convert('USD', 'EUR', 1) is None
+
+    rate_table.rates_data = {
+        'base': 'USD',
+        'timestamp': int(time.time()),
+        'rates': {'EUR': 0.5, 'GBP': 0.25},
+    }
+    assert rate_table.convert('EUR', 'GBP', 4) == 2.0
+
+    rate_table.rates_data['timestamp'] -= 120
+    assert rate_table.convert('EUR', 'GBP', 4) is None
+
+def test_rate_table_refresh(monkeypatch):
+    '''
+    Tests that refreshing goes through the breaker and the limiter.
+    '''
+    calls = []
+
+    async def get_latest_rates(base_cur_code, api_key, session=None):
+        calls.append('request')
+        return {'base': base_cur_code, 'timestamp': int(time.time()), 'rates': {'EUR': 0.5}}
+
+    class Breaker:
+        async def call(self, fetch, acquire=None):
+            calls.append('breaker')
+            await acquire()
+            return await fetch()
+
+    class Limiter:
+        async def acquire(self):
+            calls.append('limiter')
+
+    monkeypatch.setattr(exchangerates, 'get_latest_rates', get_latest_rates)
+    rate_table = ratetable.RateTable(
+        None, 'rates', 'USD', '_', breaker=Breaker(), limiter=Limiter()
+    )
+    asyncio.run(rate_table.update())
+    assert calls == ['breaker', 'limiter', 'request']
+    assert rate_table.convert('USD', 'EUR', 2) == 1.0
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the rate table.
+    '''
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value, nx: bool = False, ex: int | None = None) -> bool:
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    async def delete(self, key: str):
+        self.data.pop(key, None)
+
+def test_rate_table_refresh_failure(monkeypatch):
+    '''
+    Tests that the refresh lock is released when refreshing fails.
+    '''
+    responses = [exchangerates.ServiceUnavailable('Internal error')]
+
+    async def get_latest_rates(base_cur_code, api_key, session=None):
+        if responses:
+            raise responses.pop()
+        return {'base': base_cur_code, 'timestamp': int(time.time()), 'rates': {'EUR': 0.5}}
+
+    async def test():
+        rate_table = ratetable.RateTable(MemoryRedis(), 'rates', 'USD', '_')
+        with pytest.raises(exchangerates.ServiceUnavailable):
+            await rate_table.update()
+        assert rate_table.generate_key('lock') not in rate_table.ds.data
+
+        # The next update refreshes at once and keeps the lock for the interval
+        await rate_table.update()
+        assert rate_table.convert('USD', 'EUR', 2) == 1.0
+        assert rate_table.generate_key('lock') in rate_table.ds.data
+
+    monkeypatch.setattr(exchangerates, 'get_latest_rates', get_latest_rates)
+    asyncio.run(test())
@@ -0,0 +1,137 @@
+'''
+Represents a compact binary encoding of FSM states and their data based on a schema of known
+states and data fields.
+'''
+import json
+import struct
+
+
+# Types of data fields
+FIELD_STR = 'str'
+FIELD_INT = 'int'
+FIELD_FLOAT = 'float'
+FIELD_STR_LIST = 'str_list'
+
+# Markers of encoded values: a value is either encoded by the schema or kept as is (a state name
+# or JSON data) if the schema doesn't describe it
+RAW_MARKER = 0
+COMPACT_MARKER = 1
+
+_DOUBLE = struct.Struct('<d')
+
+def _encode_varint(value: int, buffer: bytearray):
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _decode_varint(raw: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = raw[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def _encode_str(value: str, buffer: bytearray):
+    encoded = value.encode()
+    _encode_varint(len(encoded), buffer)
+    buffer.extend(encoded)
+
+def _decode_str(raw: bytes, offset: int) -> tuple[str, int]:
+    length, offset = _decode_varint(raw, offset)
+    return raw[offset:offset + length].decode(), offset + length
+
+def _is_valid(field_type: str, value) -> bool:
+    if field_type == FIELD_STR:
+        return isinstance(value, str)
+    if field_type == FIELD_INT:
+        return isinstance(value, int) and not isinstance(value, bool)
+    if field_type == FIELD_FLOAT:
+        return isinstance(value, float)
+    if field_type == FIELD_STR_LIST:
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+    return False
+
+class Schema:
+    '''
+    Represents known FSM states 'states' and data fields 'fields' (pairs of a field name and
+    a field type). States and fields are encoded by their positions in the lists, so new ones may
+    only be appended, otherwise stored dialogs are decoded incorrectly.
+    '''
+    def __init__(self, states: list[str], fields: list[tuple[str, str]]):
+        self.states = list(states)
+        self.fields = list(fields)
+        self._state_codes = {state: code for code, state in enumerate(self.states, 1)}
+        self._field_codes = {name: code for code, (name, _) in enumerate(self.fields, 1)}
+
+    def encode_state(self, state: str) -> bytes:
+        '''
+        Returns state 'state' encoded as its code or, if the state is unknown, as its name.
+        '''
+        buffer = bytearray()
+        code = self._state_codes.get(state)
+        if code is None:
+            buffer.append(RAW_MARKER)
+            buffer.extend(state.encode())
+        else:
+            _encode_varint(code, buffer)
+        return bytes(buffer)
+
+    def decode_state(self, raw: bytes) -> str:
+        if raw[0] == RAW_MARKER:
+            return raw[1:].decode()
+        code, _ = _decode_varint(raw, 0)
+        return self.states[code - 1]
+
+    def encode_data(self, data: dict) -> bytes:
+        '''
+        Returns 'data' encoded field by field or, if some field isn't described by the schema, as
+        JSON.
+        '''
+        buffer = bytearray((COMPACT_MARKER,))
+        for name, value in data.items():
+            code = self._field_codes.get(name)
+            if code is None or not _is_valid(self.fields[code - 1][1], value):
+                return bytes((RAW_MARKER,)) + json.dumps(data).encode()
+            _encode_varint(code, buffer)
+            field_type = self.fields[code - 1][1]
+            if field_type == FIELD_STR:
+                _encode_str(value, buffer)
+            elif field_type == FIELD_INT:
+                # Zigzag encoding keeps small negative numbers (e.g. group chat IDs) short
+                _encode_varint(value << 1 if value >= 0 else (-value << 1) - 1, buffer)
+            elif field_type == FIELD_FLOAT:
+                buffer.extend(_DOUBLE.pack(value))
+            else:
+                _encode_varint(len(value), buffer)
+                for item in value:
+                    _encode_str(item, buffer)
+        return bytes(buffer)
+
+    def decode_data(self, raw: bytes) -> dict:
+        if raw[0] == RAW_MARKER:
+            return json.loads(raw[1:])
+        data = {}
+        offset = 1
+        while offset < len(raw):
+            code, offset = _decode_varint(raw, offset)
+            name, field_type = self.fields[code - 1]
+            if field_type == FIELD_STR:
+                data[name], offset = _decode_str(raw, offset)
+            elif field_type == FIELD_INT:
+                value, offset = _decode_varint(raw, offset)
+                data[name] = value >> 1 if not value & 1 else -((value + 1) >> 1)
+            elif field_type == FIELD_FLOAT:
+                data[name] = _DOUBLE.unpack_from(raw, offset)[0]
+                offset += _DOUBLE.size
+            else:
+                length, offset = _decode_varint(raw, offset)
+                items = []
+                for _ in range(length):
+                    item, offset = _decode_str(raw, offset)
+                    items.append(item)
+                data[name] = items
+        return data
@@ -0,0 +1,159 @@
+'''
+Represents a Redis FSM storage keeping dialogs compactly and only while they're active.
+'''
+import contextvars
+import typing
+
+from aiogram import types
+from aiogram.contrib.fsm_storage.redis import RedisStorage2
+
+from . import codec
+
+
+# Fields of a dialog hash: the encoded state and the encoded data
+STATE_FIELD = 's'
+DATA_FIELD = 'd'
+
+# Keys scanned (and deleted) at once
+SCAN_COUNT = 1000
+
+RecordType = tuple[str | None, dict]
+
+class CompactRedisStorage(RedisStorage2):
+    '''
+    Represents an FSM storage keeping the state and the data of a dialog in one Redis hash encoded
+    by 'schema' ('codec.Schema'). A dialog expires after 'idle_ttl' seconds without changes, so
+    abandoned dialogs don't stay in Redis forever. The state and the data are read together in one
+    round-trip and kept for the rest of the current update, so the state filter and
+    'state.proxy()' don't read them again. Other arguments are passed to 'RedisStorage2'.
+    '''
+    def __init__(self, *args, schema: codec.Schema, idle_ttl: int | None = 86400, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.schema = schema
+        self.idle_ttl = idle_ttl
+        self._records: contextvars.ContextVar[tuple[int, dict[str, RecordType]] | None] = (
+            contextvars.ContextVar('fsm_records', default=None)
+        )
+
+    def _get_update_records(self) -> dict[str, RecordType] | None:
+        '''
+        Returns records read or written while processing the current update, if there is one.
+        '''
+        update = types.Update.get_current(no_error=True)
+        if update is None:
+            return None
+        update_records = self._records.get()
+        if update_records is None or update_records[0] != update.update_id:
+            update_records = (update.update_id, {})
+            self._records.set(update_records)
+        return update_records[1]
+
+    async def _read(self, chat: int|str|None, user: int|str|None) -> RecordType:
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.generate_key(chat, user)
+        records = self._get_update_records()
+        if records is not None and key in records:
+            return records[key]
+
+        raw_state, raw_data = await self._redis.execute_command(
+            'HMGET', key, STATE_FIELD, DATA_FIELD, NEVER_DECODE=True
+        )
+        record = (
+            self.schema.decode_state(raw_state) if raw_state else None,
+            self.schema.decode_data(raw_data) if raw_data else {},
+        )
+        if records is not None:
+            records[key] = record
+        return record
+
+    async def _write(
+            self,
+            chat: int|str|None,
+            user: int|str|None,
+            state: str | None,
+            data: dict
+        ):
+        '''
+        Stores the state and the data of a dialog in one round-trip. A dialog without a state and
+        data is deleted.
+        '''
+        chat, user = self.check_address(chat=chat, user=user)
+        key = self.generate_key(chat, user)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            mapping = {}
+            if state is not None:
+                mapping[STATE_FIELD] = self.schema.encode_state(state)
+            if data:
+                mapping[DATA_FIELD] = self.schema.encode_data(data)
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+                if self.idle_ttl:
+                    pipe.expire(key, self.idle_ttl)
+            await pipe.execute()
+        records = self._get_update_records()
+        if records is not None:
+            records[key] = (state, dict(data))
+
+    async def get_state(self, *, chat: int|str|None = None, user: int|str|None = None,
+                        default: str | None = None) -> str | None:
+        state, _ = await self._read(chat, user)
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat: int|str|None = None, user: int|str|None = None,
+                       default: dict | None = None) -> dict:
+        _, data = await self._read(chat, user)
+        return dict(data) if data else (default or {})
+
+    async def set_state(self, *, chat: int|str|None = None, user: int|str|None = None,
+                        state: typing.Any = None):
+        _, data = await self._read(chat, user)
+        await self._write(chat, user, self.resolve_state(state), data)
+
+    async def set_data(self, *, chat: int|str|None = None, user: int|str|None = None,
+                       data: dict | None = None):
+        state, _ = await self._read(chat, user)
+        await self._write(chat, user, state, data or {})
+
+    async def update_data(self, *, chat: int|str|None = None, user: int|str|None = None,
+                          data: dict | None = None, **kwargs):
+        state, stored_data = await self._read(chat, user)
+        stored_data = dict(stored_data)
+        stored_data.update(data or {}, **kwargs)
+        await self._write(chat, user, state, stored_data)
+
+    async def reset_state(self, *, chat: int|str|None = None, user: int|str|None = None,
+                          with_data: bool = True):
+        if with_data:
+            await self._write(chat, user, None, {})
+        else:
+            await self.set_state(chat=chat, user=user, state=None)
+
+    async def reset_all(self, full: bool = True):
+        '''
+        Deletes all dialogs or, if 'full' is set, all keys of the storage (e.g. buckets too).
+        Only keys under the prefix are deleted: the data storage is shared with other data.
+        '''
+        keys = []
+        prefix = self.generate_key('')
+        async for key in self._redis.scan_iter(match=self.generate_key('*'), count=SCAN_COUNT):
+            # Dialogs are kept by keys with two-part addresses
+            if full or len(key[len(prefix):].split(':')) == 2:
+                keys.append(key)
+            if len(keys) >= SCAN_COUNT:
+                await self._redis.unlink(*keys)
+                keys = []
+        if keys:
+            await self._redis.unlink(*keys)
+
+    async def get_states_list(self) -> list[tuple[str, str]]:
+        result = []
+        prefix = self.generate_key('')
+        async for key in self._redis.scan_iter(
+                match=self.generate_key('*', '*'),
+                count=SCAN_COUNT):
+            # Buckets are kept by keys with more parts
+            address = key[len(prefix):].split(':')
+            if len(address) == 2:
+                result.append(tuple(address))
+        return result
@@ -0,0 +1,43 @@
+'''
+Tests 'codec' module.
+'''
+from . import codec
+
+
+SCHEMA = codec.Schema(
+    states=['Group:first', 'Group:second'],
+    fields=[
+        ('name', codec.FIELD_STR),
+        ('count', codec.FIELD_INT),
+        ('amount', codec.FIELD_FLOAT),
+        ('items', codec.FIELD_STR_LIST),
+    ]
+)
+
+def test_states():
+    '''
+    Tests encoding known and unknown states.
+    '''
+    assert SCHEMA.encode_state('Group:second') == b'\x02'
+    assert SCHEMA.decode_state(SCHEMA.encode_state('Group:second')) == 'Group:second'
+    assert SCHEMA.decode_state(SCHEMA.encode_state('Other:state')) == 'Other:state'
+
+def test_data():
+    '''
+    Tests encoding data described by the schema and falling back to JSON otherwise.
+    '''
+    data = {
+        'name': 'Лондон',
+        'count': -1001234567890,
+        'amount': 10.5,
+        'items': ['a', 'б', ''],
+    }
+    encoded = SCHEMA.encode_data(data)
+    assert encoded[0] == codec.COMPACT_MARKER
+    assert SCHEMA.decode_data(encoded) == data
+    assert SCHEMA.decode_data(SCHEMA.encode_data({})) == {}
+
+    for data in ({'name': 'London', 'unknown': 1}, {'count': 'not a number'}):
+        encoded = SCHEMA.encode_data(data)
+        assert encoded[0] == codec.RAW_MARKER
+        assert SCHEMA.decode_data(encoded) == data
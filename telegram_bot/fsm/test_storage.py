@@ -0,0 +1,156 @@
+'''
+Tests 'storage' module.
+'''
+import asyncio
+import fnmatch
+
+from aiogram import types
+
+from . import codec
+from . import storage
+
+
+SCHEMA = codec.Schema(
+    states=['Group:first', 'Group:second'],
+    fields=[('name', codec.FIELD_STR)]
+)
+
+class MemoryPipeline:
+    '''
+    Represents a pipeline of a data storage kept in memory: commands are run on 'execute()'.
+    '''
+    def __init__(self, ds: 'MemoryRedis'):
+        self.ds = ds
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self) -> list:
+        self.ds.round_trips += 1
+        return [
+            await getattr(self.ds, name)(*args, **kwargs) for name, args, kwargs in self.commands
+        ]
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the FSM storage.
+    '''
+    def __init__(self):
+        self.hashes: dict[str, dict[str, bytes]] = {}
+        self.ttls: dict[str, int] = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    async def execute_command(self, command: str, key: str, *fields: str, **options) -> list:
+        assert command == 'HMGET' and options == {'NEVER_DECODE': True}
+        self.round_trips += 1
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    async def hset(self, key: str, mapping: dict[str, bytes]):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def expire(self, key: str, ttl: int):
+        self.ttls[key] = ttl
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.hashes.pop(key, None)
+            self.ttls.pop(key, None)
+
+    async def unlink(self, *keys: str):
+        self.round_trips += 1
+        await self.delete(*keys)
+
+    async def scan_iter(self, match: str, count: int = 10):
+        for key in list(self.hashes):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+def create_storage(idle_ttl: int = 60) -> tuple[storage.CompactRedisStorage, MemoryRedis]:
+    fsm_storage = storage.CompactRedisStorage(prefix='fsm', schema=SCHEMA, idle_ttl=idle_ttl)
+    ds = fsm_storage._redis = MemoryRedis()
+    return fsm_storage, ds
+
+def make_update(update_id: int) -> types.Update:
+    return types.Update.to_object({'update_id': update_id})
+
+def test_update_records():
+    '''
+    Tests that a dialog is read once per update in one round-trip and is kept after writes.
+    '''
+    async def test():
+        fsm_storage, ds = create_storage()
+        await fsm_storage.set_state(chat=1, user=1, state='Group:first')
+        await fsm_storage.update_data(chat=1, user=1, name='Paris')
+
+        types.Update.set_current(make_update(1))
+        ds.round_trips = 0
+        assert await fsm_storage.get_state(chat=1, user=1) == 'Group:first'
+        assert await fsm_storage.get_data(chat=1, user=1) == {'name': 'Paris'}
+        assert ds.round_trips == 1
+
+        # A write within the update is seen by the following reads
+        await fsm_storage.update_data(chat=1, user=1, name='London')
+        assert await fsm_storage.get_data(chat=1, user=1) == {'name': 'London'}
+        assert ds.round_trips == 2
+
+        # Another update reads the dialog again
+        types.Update.set_current(make_update(2))
+        assert await fsm_storage.get_state(chat=1, user=1) == 'Group:first'
+        assert ds.round_trips == 3
+
+        # A dialog without a state and data is deleted
+        await fsm_storage.finish(chat=1, user=1)
+        assert ds.hashes == {}
+
+    asyncio.run(test())
+
+def test_idle_ttl():
+    '''
+    Tests that every change of a dialog refreshes its expiration time.
+    '''
+    async def test():
+        fsm_storage, ds = create_storage(idle_ttl=60)
+        await fsm_storage.set_state(chat=1, user=2, state='Group:second')
+        assert ds.ttls == {'fsm:1:2': 60}
+        ds.ttls.clear()
+        await fsm_storage.set_data(chat=1, user=2, data={'name': 'Paris'})
+        assert ds.ttls == {'fsm:1:2': 60}
+        assert ds.hashes['fsm:1:2'] == {
+            storage.STATE_FIELD: SCHEMA.encode_state('Group:second'),
+            storage.DATA_FIELD: SCHEMA.encode_data({'name': 'Paris'}),
+        }
+
+        fsm_storage, ds = create_storage(idle_ttl=None)
+        await fsm_storage.set_state(chat=1, user=2, state='Group:second')
+        assert ds.ttls == {}
+
+    asyncio.run(test())
+
+def test_reset_all():
+    '''
+    Tests that only keys under the prefix are deleted.
+    '''
+    async def test():
+        fsm_storage, ds = create_storage()
+        await fsm_storage.set_state(chat=1, user=1, state='Group:first')
+        await fsm_storage.set_state(chat=2, user=2, state='Group:second')
+        await ds.hset('fsm:1:1:bucket', {'value': b'1'})
+        await ds.hset('group_chats:titles', {'-1': b'Family'})
+        assert sorted(await fsm_storage.get_states_list()) == [('1', '1'), ('2', '2')]
+
+        await fsm_storage.reset_all(full=False)
+        assert sorted(ds.hashes) == ['fsm:1:1:bucket', 'group_chats:titles']
+        await fsm_storage.reset_all()
+        assert sorted(ds.hashes) == ['group_chats:titles']
+
+    asyncio.run(test())
@@ -0,0 +1,54 @@
+'''
+Represents a persistent mapping of Giphy images to Telegram file IDs.
+'''
+import logging
+
+import redis.asyncio as redis
+
+
+logger = logging.getLogger(__name__)
+
+class FileIdCache:
+    '''
+    Represents Telegram file IDs of already uploaded images kept by Giphy image IDs in a Redis
+    hash 'key'. An image with a known file ID can be sent again without uploading its data. Errors
+    of the data storage are logged and treated as absent entries.
+    '''
+    def __init__(self, ds: redis.Redis | None, key: str):
+        self.ds = ds
+        self.key = key
+
+    async def get(self, image_id: str) -> str | None:
+        '''
+        Returns a Telegram file ID of an image with Giphy ID 'image_id' if it's known.
+        '''
+        if self.ds is None:
+            return None
+        try:
+            file_id = await self.ds.hget(self.key, image_id)
+        except redis.RedisError as error:
+            logger.warning('File ID data storage is unavailable: %s', error)
+            return None
+        return file_id.decode() if isinstance(file_id, bytes) else file_id
+
+    async def set(self, image_id: str, file_id: str):
+        '''
+        Remembers Telegram file ID 'file_id' of an image with Giphy ID 'image_id'.
+        '''
+        if self.ds is None:
+            return
+        try:
+            await self.ds.hset(self.key, image_id, file_id)
+        except redis.RedisError as error:
+            logger.warning('File ID data storage is unavailable: %s', error)
+
+    async def delete(self, image_id: str):
+        '''
+        Forgets a file ID of an image with Giphy ID 'image_id', e.g. when Telegram rejects it.
+        '''
+        if self.ds is None:
+            return
+        try:
+            await self.ds.hdel(self.key, image_id)
+        except redis.RedisError as error:
+            logger.warning('File ID data storage is unavailable: %s', error)
@@ -2,10 +2,15 @@
 Represents functions for getting images from the Giphy service.
 '''
 import aiohttp
+import typing
+
+from upstream import client
 
 
 URL = 'https://api.giphy.com/v1/gifs/random'
 
+ImageDataType = dict[str, str|bytes|typing.BinaryIO|None]
+
 class ServiceUnavailable(Exception):
     '''
     Represents an exception that means the Giphy service hasn't answered or returned some
@@ -19,9 +24,14 @@ class AccessDenied(Exception):
     '''
     pass
 
-async def get_random_image_by_tag(tag: str, api_key: str) -> bytes:
+async def get_random_image_data(
+        tag: str,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> ImageDataType:
     '''
-    Retrieves a random image from the Giphy service by tag 'tag' and API key 'api_key'.
+    Retrieves data of a random image from the Giphy service by tag 'tag' and API key 'api_key'.
+    Returns a dictionary with the Giphy image ID 'id' and the image URL 'url'.
     Can raise exceptions 'AccessDenied', 'ServiceUnavailable' and 'aiohttp.ClientError'.
     '''
     # Set request parameters
@@ -30,8 +40,8 @@ async def get_random_image_by_tag(tag: str, api_key: str) -> bytes:
         'api_key': api_key
     }
 
-    # Get an image URL
-    async with aiohttp.ClientSession() as session:
+    # Get the image data
+    async with client.session_scope(session) as session:
         async with session.get(URL, params=params) as response:
             # Get response data
             try:
@@ -39,11 +49,14 @@ async def get_random_image_by_tag(tag: str, api_key: str) -> bytes:
             except:
                 raise ServiceUnavailable('Bad or absent JSON data in the response.')
 
-            # Get the image URL
+            # Get the image ID and URL
             if response.status == 200:
                 try:
-                    image_url = data['data']['images']['downsized_large']['url']
-                except KeyError:
+                    return {
+                        'id': data['data']['id'],
+                        'url': data['data']['images']['downsized_large']['url'],
+                    }
+                except (KeyError, TypeError):
                     raise ServiceUnavailable('Bad data has received from the service.')
             elif response.status == 401:
                 try:
@@ -54,15 +67,80 @@ async def get_random_image_by_tag(tag: str, api_key: str) -> bytes:
             else:
                 raise ServiceUnavailable(f'The Giphy service has returned code {response.status}')
 
-    # Download the image
-    async with aiohttp.ClientSession() as session:
+async def _iter_image_chunks(
+        response: aiohttp.ClientResponse,
+        max_size: int | None,
+        chunk_size: int
+    ) -> typing.AsyncIterator[bytes]:
+    '''
+    Yields chunks of image data from 'response' checking that the image isn't larger than
+    'max_size' bytes.
+    Can raise exceptions 'ServiceUnavailable' and 'aiohttp.ClientError'.
+    '''
+    if response.status != 200:
+        raise ServiceUnavailable(
+            f'During an image downloading next status code has returned {response.status}'
+        )
+    if max_size is not None and (response.content_length or 0) > max_size:
+        raise ServiceUnavailable(f'The image is larger than {max_size} bytes.')
+    size = 0
+    async for chunk in response.content.iter_chunked(chunk_size):
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise ServiceUnavailable(f'The image is larger than {max_size} bytes.')
+        yield chunk
+    if not size:
+        raise ServiceUnavailable('Some bad image data has received.')
+
+async def download_image(
+        image_url: str,
+        session: aiohttp.ClientSession | None = None,
+        max_size: int | None = None,
+        chunk_size: int = 65536
+    ) -> bytes:
+    '''
+    Downloads an image by URL 'image_url' into memory. Images larger than 'max_size' bytes are
+    rejected without reading them completely.
+    Can raise exceptions 'ServiceUnavailable' and 'aiohttp.ClientError'.
+    '''
+    image = bytearray()
+    async with client.session_scope(session) as session:
         async with session.get(image_url) as response:
-            if response.status == 200:
-                try:
-                    return await response.read()
-                except:
-                    raise ServiceUnavailable('Some bad image data has received.')
-            else:
-                raise ServiceUnavailable(
-                    f'During an image downloading next status code has returned {response.status}'
-                )
+            async for chunk in _iter_image_chunks(response, max_size, chunk_size):
+                image.extend(chunk)
+    return bytes(image)
+
+async def download_image_to_file(
+        image_url: str,
+        file: typing.BinaryIO,
+        session: aiohttp.ClientSession | None = None,
+        max_size: int | None = None,
+        chunk_size: int = 65536
+    ) -> int:
+    '''
+    Downloads an image by URL 'image_url' writing it chunk by chunk into 'file' (e.g. a spooled
+    temporary file), so the whole image is never held in memory. Images larger than 'max_size'
+    bytes are rejected. Returns the image size.
+    Can raise exceptions 'ServiceUnavailable' and 'aiohttp.ClientError'.
+    '''
+    size = 0
+    async with client.session_scope(session) as session:
+        async with session.get(image_url) as response:
+            async for chunk in _iter_image_chunks(response, max_size, chunk_size):
+                file.write(chunk)
+                size += len(chunk)
+    return size
+
+async def get_random_image_by_tag(
+        tag: str,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> bytes:
+    '''
+    Retrieves a random image from the Giphy service by tag 'tag' and API key 'api_key'. A shared
+    'session' is used for both requests if given, otherwise a temporary one is opened.
+    Can raise exceptions 'AccessDenied', 'ServiceUnavailable' and 'aiohttp.ClientError'.
+    '''
+    async with client.session_scope(session) as session:
+        image_data = await get_random_image_data(tag, api_key, session=session)
+        return await download_image(image_data['url'], session=session)
@@ -0,0 +1,235 @@
+'''
+Represents a pool of images prefetched from the Giphy service in the background.
+'''
+import asyncio
+import logging
+import tempfile
+import typing
+
+import aiohttp
+
+from . import (
+    fileids,
+    giphy,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Image download modes: the whole image in memory, a spooled temporary file or no download at all
+# (Telegram fetches the image by URL itself)
+DOWNLOAD_MODE_MEMORY = 'memory'
+DOWNLOAD_MODE_SPOOL = 'spool'
+DOWNLOAD_MODE_URL = 'url'
+
+def close_image(image_data: giphy.ImageDataType):
+    '''
+    Closes the spooled temporary file of the image data 'image_data' if it has one.
+    '''
+    image = image_data.get('image')
+    if image is not None and not isinstance(image, bytes):
+        image.close()
+
+class ImagePool:
+    '''
+    Represents bounded pools of ready-to-send images by tags 'tags'. Each pool keeps up to 'size'
+    images and is refilled by 'concurrency' background workers as soon as it's drained. A worker
+    waits 'retry_interval' seconds after a failed request. Images already uploaded to Telegram
+    (known to 'file_ids') aren't downloaded. Other images are downloaded according to
+    'download_mode'; images larger than 'max_size' bytes are rejected, and spooled files keep up
+    to 'spool_size' bytes in memory. Requests go through 'breaker' if it's given (an object with
+    coroutine method 'call(fetch, acquire)' like 'upstream.breaker.CircuitBreaker'). Requests to
+    the API (but not image downloads) are also throttled by 'limiter' if it's given (an object
+    with coroutine method 'acquire()' like 'upstream.ratelimit.RateLimiter').
+    '''
+    def __init__(
+            self,
+            api_key: str,
+            tags: list[str],
+            size: int = 5,
+            concurrency: int = 2,
+            retry_interval: int|float = 5,
+            file_ids: fileids.FileIdCache | None = None,
+            download_mode: str = DOWNLOAD_MODE_MEMORY,
+            max_size: int | None = None,
+            spool_size: int = 1048576,
+            chunk_size: int = 65536,
+            breaker: typing.Any = None,
+            limiter: typing.Any = None
+        ):
+        if download_mode not in (DOWNLOAD_MODE_MEMORY, DOWNLOAD_MODE_SPOOL, DOWNLOAD_MODE_URL):
+            raise ValueError(f'Unknown image download mode "{download_mode}".')
+        self.api_key = api_key
+        self.file_ids = file_ids
+        self.download_mode = download_mode
+        self.max_size = max_size
+        self.spool_size = spool_size
+        self.chunk_size = chunk_size
+        self.breaker = breaker
+        self.limiter = limiter
+        self.tags = list(tags)
+        self.size = size
+        self.concurrency = concurrency
+        self.retry_interval = retry_interval
+        self._pools = {tag: asyncio.Queue(maxsize=size) for tag in self.tags}
+        self._pending = {tag: 0 for tag in self.tags}
+        self._drained = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._session: aiohttp.ClientSession | None = None
+
+    def qsize(self, tag: str) -> int:
+        '''
+        Returns the number of ready images by 'tag'.
+        '''
+        pool = self._pools.get(tag)
+        return pool.qsize() if pool is not None else 0
+
+    async def _call(
+            self,
+            fetch: typing.Callable[[], typing.Awaitable[typing.Any]],
+            acquire: typing.Callable[[], typing.Awaitable[None]] | None = None
+        ) -> typing.Any:
+        if self.breaker is not None:
+            return await self.breaker.call(fetch, acquire=acquire)
+        if acquire is not None:
+            await acquire()
+        return await fetch()
+
+    async def _call_api(
+            self,
+            fetch: typing.Callable[[], typing.Awaitable[typing.Any]]
+        ) -> typing.Any:
+        # Every attempt of the breaker takes a token, so retried requests are counted too
+        return await self._call(
+            fetch,
+            acquire=self.limiter.acquire if self.limiter is not None else None
+        )
+
+    async def download_image(
+            self,
+            image_url: str,
+            download_mode: str | None = None
+        ) -> bytes | typing.BinaryIO | None:
+        '''
+        Downloads an image by URL 'image_url' according to 'download_mode' (the pool mode by
+        default). Returns bytes, a rewound spooled temporary file or None in URL mode.
+        Can raise exceptions 'giphy.ServiceUnavailable' and 'aiohttp.ClientError'.
+        '''
+        download_mode = download_mode or self.download_mode
+        if download_mode == DOWNLOAD_MODE_URL:
+            return None
+        if download_mode == DOWNLOAD_MODE_MEMORY:
+            return await self._call(lambda: giphy.download_image(
+                image_url,
+                session=self._session,
+                max_size=self.max_size,
+                chunk_size=self.chunk_size
+            ))
+        file = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+
+        async def download_image_to_file():
+            # A retried download starts from scratch
+            file.seek(0)
+            file.truncate()
+            await giphy.download_image_to_file(
+                image_url,
+                file,
+                session=self._session,
+                max_size=self.max_size,
+                chunk_size=self.chunk_size
+            )
+
+        try:
+            await self._call(download_image_to_file)
+        except BaseException:
+            file.close()
+            raise
+        file.seek(0)
+        return file
+
+    async def fetch_image(self, tag: str) -> giphy.ImageDataType:
+        '''
+        Requests a random image by 'tag' from the service. Returns the image data with a known
+        Telegram file ID 'file_id' or the image 'image' downloaded according to the pool mode.
+        Can raise the exceptions of 'giphy.get_random_image_data' and 'download_image'.
+        '''
+        image_data = await self._call_api(
+            lambda: giphy.get_random_image_data(tag, self.api_key, session=self._session)
+        )
+        if self.file_ids is not None:
+            image_data['file_id'] = await self.file_ids.get(image_data['id'])
+        if not image_data.get('file_id'):
+            image_data['image'] = await self.download_image(image_data['url'])
+        return image_data
+
+    def get(self, tag: str) -> giphy.ImageDataType | None:
+        '''
+        Returns data of a ready image by 'tag' or None if the pool is empty or the tag isn't
+        prefetched.
+        '''
+        pool = self._pools.get(tag)
+        if pool is None:
+            return None
+        try:
+            image_data = pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+        self._drained.set()
+        return image_data
+
+    def _next_tag(self) -> str | None:
+        '''
+        Returns the tag with the least number of ready and pending images if its pool isn't full.
+        '''
+        tag = min(
+            self.tags,
+            key=lambda tag: self._pools[tag].qsize() + self._pending[tag],
+            default=None
+        )
+        if tag is None or self._pools[tag].qsize() + self._pending[tag] >= self.size:
+            return None
+        return tag
+
+    async def _worker(self):
+        while True:
+            self._drained.clear()
+            tag = self._next_tag()
+            if tag is None:
+                await self._drained.wait()
+                continue
+
+            self._pending[tag] += 1
+            try:
+                image_data = await self.fetch_image(tag)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('An image by tag "%s" has not been prefetched.', tag)
+                await asyncio.sleep(self.retry_interval)
+                continue
+            finally:
+                self._pending[tag] -= 1
+            try:
+                self._pools[tag].put_nowait(image_data)
+            except asyncio.QueueFull:
+                close_image(image_data)
+
+    async def start(self, session: aiohttp.ClientSession | None = None):
+        '''
+        Starts the background workers. A shared 'session' is used for all requests.
+        '''
+        self._session = session
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        '''
+        Stops the background workers and closes the spooled files of the ready images.
+        '''
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for pool in self._pools.values():
+            while not pool.empty():
+                close_image(pool.get_nowait())
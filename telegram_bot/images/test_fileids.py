@@ -0,0 +1,63 @@
+'''
+Tests 'fileids' module.
+'''
+import asyncio
+
+import redis.asyncio as redis
+
+from . import fileids
+
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the file ID cache.
+    '''
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.hashes.get(key, {}).get(field)
+
+    async def hset(self, key: str, field: str, value: str):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hdel(self, key: str, field: str):
+        self.hashes.get(key, {}).pop(field, None)
+
+class UnavailableRedis:
+    '''
+    Represents an unreachable data storage.
+    '''
+    def __getattr__(self, name: str):
+        async def command(*args, **kwargs):
+            raise redis.ConnectionError('Connection refused')
+        return command
+
+def test_file_id_cache():
+    '''
+    Tests remembering and forgetting file IDs.
+    '''
+    async def test():
+        ds = MemoryRedis()
+        file_ids = fileids.FileIdCache(ds, 'file_ids')
+        assert await file_ids.get('cat') is None
+        await file_ids.set('cat', 'AgACAgQ')
+        assert await file_ids.get('cat') == 'AgACAgQ'
+        assert ds.hashes == {'file_ids': {'cat': 'AgACAgQ'}}
+        await file_ids.delete('cat')
+        assert await file_ids.get('cat') is None
+
+    asyncio.run(test())
+
+def test_file_id_cache_unavailable():
+    '''
+    Tests that errors of the data storage are treated as absent entries.
+    '''
+    async def test():
+        for ds in (None, UnavailableRedis()):
+            file_ids = fileids.FileIdCache(ds, 'file_ids')
+            await file_ids.set('cat', 'AgACAgQ')
+            assert await file_ids.get('cat') is None
+            await file_ids.delete('cat')
+
+    asyncio.run(test())
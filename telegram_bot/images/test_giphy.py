@@ -2,7 +2,9 @@
 Tests 'giphy' module.
 '''
 import asyncio
+import io
 import pytest
+from aiohttp import web
 
 from . import giphy
 
@@ -33,3 +35,36 @@ def test_get_random_image_by_tag_bad_url():
     with pytest.raises(giphy.ServiceUnavailable):
         asyncio.run(giphy.get_random_image_by_tag('funny', TEST_API_KEY))
     giphy.URL = url
+
+def test_download_image_size_limit():
+    '''
+    Tests downloading an image into memory and into a file with a size limit.
+    '''
+    async def image_handler(request):
+        return web.Response(body=b'x' * 1000)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/image.gif', image_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        image_url = f'http://127.0.0.1:{port}/image.gif'
+        try:
+            image = await giphy.download_image(image_url, max_size=1000, chunk_size=100)
+            assert image == b'x' * 1000
+
+            file = io.BytesIO()
+            assert await giphy.download_image_to_file(image_url, file, chunk_size=100) == 1000
+            assert file.getvalue() == image
+
+            with pytest.raises(giphy.ServiceUnavailable):
+                await giphy.download_image(image_url, max_size=999)
+            with pytest.raises(giphy.ServiceUnavailable):
+                await giphy.download_image_to_file(image_url, io.BytesIO(), max_size=999)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
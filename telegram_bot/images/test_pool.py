@@ -0,0 +1,111 @@
+'''
+Tests 'pool' module.
+'''
+import asyncio
+
+from . import fileids
+from . import giphy
+from . import pool
+
+
+def test_image_pool_refill(monkeypatch):
+    '''
+    Tests filling the pool up to its size and refilling it after an image is taken.
+    '''
+    calls = []
+
+    async def get_random_image_data(tag, api_key, session=None):
+        calls.append(tag)
+        return {'id': f'{tag}-{len(calls)}', 'url': 'url'}
+
+    async def download_image(image_url, session=None, **kwargs):
+        return b'image'
+
+    monkeypatch.setattr(giphy, 'get_random_image_data', get_random_image_data)
+    monkeypatch.setattr(giphy, 'download_image', download_image)
+
+    async def run():
+        image_pool = pool.ImagePool('_', ['cats', 'dogs'], size=2, concurrency=3)
+        assert image_pool.get('cats') is None
+        await image_pool.start()
+        await asyncio.sleep(0.01)
+        assert image_pool.qsize('cats') == image_pool.qsize('dogs') == 2
+        assert len(calls) == 4
+
+        assert image_pool.get('cats')['image'] == b'image'
+        assert image_pool.get('birds') is None
+        await asyncio.sleep(0.01)
+        assert image_pool.qsize('cats') == 2
+        assert len(calls) == 5
+        await image_pool.close()
+
+    asyncio.run(run())
+
+def test_image_pool_close(monkeypatch):
+    '''
+    Tests that closing the pool closes the spooled files of the ready images.
+    '''
+    async def get_random_image_data(tag, api_key, session=None):
+        return {'id': tag, 'url': 'url'}
+
+    async def download_image_to_file(image_url, file, session=None, **kwargs):
+        file.write(b'image')
+        return 5
+
+    monkeypatch.setattr(giphy, 'get_random_image_data', get_random_image_data)
+    monkeypatch.setattr(giphy, 'download_image_to_file', download_image_to_file)
+
+    async def run():
+        image_pool = pool.ImagePool('_', ['cats'], size=2, download_mode=pool.DOWNLOAD_MODE_SPOOL)
+        await image_pool.start()
+        await asyncio.sleep(0.01)
+        image = image_pool.get('cats')['image']
+        assert image.read() == b'image'
+        await asyncio.sleep(0.01)
+        files = list(image_pool._pools['cats']._queue)
+        assert len(files) == 2
+
+        await image_pool.close()
+        assert image_pool.qsize('cats') == 0
+        assert all(image_data['image'].closed for image_data in files)
+        assert not image.closed
+        image.close()
+
+    asyncio.run(run())
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the file ID cache.
+    '''
+    def __init__(self, hashes: dict[str, dict[str, str]]):
+        self.hashes = hashes
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.hashes.get(key, {}).get(field)
+
+def test_image_pool_file_ids(monkeypatch):
+    '''
+    Tests that images with known file IDs aren't downloaded.
+    '''
+    downloads = []
+
+    async def get_random_image_data(tag, api_key, session=None):
+        return {'id': tag, 'url': f'{tag}-url'}
+
+    async def download_image(image_url, session=None, **kwargs):
+        downloads.append(image_url)
+        return b'image'
+
+    monkeypatch.setattr(giphy, 'get_random_image_data', get_random_image_data)
+    monkeypatch.setattr(giphy, 'download_image', download_image)
+
+    async def run():
+        file_ids = fileids.FileIdCache(MemoryRedis({'file_ids': {'cats': 'known'}}), 'file_ids')
+        image_pool = pool.ImagePool('_', ['cats', 'dogs'], file_ids=file_ids)
+        image_data = await image_pool.fetch_image('cats')
+        assert image_data['file_id'] == 'known' and 'image' not in image_data
+        image_data = await image_pool.fetch_image('dogs')
+        assert image_data['file_id'] is None and image_data['image'] == b'image'
+        assert downloads == ['dogs-url']
+
+    asyncio.run(run())
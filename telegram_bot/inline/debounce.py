@@ -0,0 +1,51 @@
+'''
+Represents debouncing of rapid requests, e.g. inline queries sent on every keystroke.
+'''
+import asyncio
+import typing
+
+
+class Debouncer:
+    '''
+    Represents debouncing of requests by keys (e.g. user IDs): a request waits 'delay' seconds
+    before it's processed, and a newer request with the same key cancels the previous one whether
+    it's still waiting or already being processed.
+    '''
+    def __init__(self, delay: int|float = 0.3):
+        self.delay = delay
+        self.superseded = 0
+        self._tasks: dict[typing.Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def _run(self, function: typing.Callable[[], typing.Awaitable[typing.Any]]):
+        await asyncio.sleep(self.delay)
+        return await function()
+
+    async def run(
+            self,
+            key: typing.Hashable,
+            function: typing.Callable[[], typing.Awaitable[typing.Any]]
+        ) -> tuple[bool, typing.Any]:
+        '''
+        Awaits 'function()' after the delay unless a newer request with the same 'key' comes.
+        Returns a pair of a flag whether the request has been processed and the result.
+        '''
+        previous_task = self._tasks.get(key)
+        if previous_task is not None:
+            previous_task.cancel()
+        task = asyncio.create_task(self._run(function))
+        self._tasks[key] = task
+        try:
+            return True, await task
+        except asyncio.CancelledError:
+            # The caller is cancelled itself
+            if asyncio.current_task().cancelling():
+                task.cancel()
+                raise
+            self.superseded += 1
+            return False, None
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
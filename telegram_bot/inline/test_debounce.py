@@ -0,0 +1,38 @@
+'''
+Tests 'debounce' module.
+'''
+import asyncio
+
+from . import debounce
+
+
+def test_debouncer():
+    '''
+    Tests that a newer request of the same key supersedes waiting and running requests.
+    '''
+    calls = []
+
+    async def lookup(query: str, duration: float = 0) -> str:
+        calls.append(query)
+        await asyncio.sleep(duration)
+        return query.upper()
+
+    async def test():
+        debouncer = debounce.Debouncer(delay=0.05)
+        results = await asyncio.gather(
+            debouncer.run(1, lambda: lookup('p')),
+            debouncer.run(1, lambda: lookup('pa')),
+            debouncer.run(2, lambda: lookup('lo')),
+        )
+        assert results == [(False, None), (True, 'PA'), (True, 'LO')]
+
+        # A running lookup is cancelled too
+        running = asyncio.create_task(debouncer.run(1, lambda: lookup('par', 1)))
+        await asyncio.sleep(0.1)
+        assert await debouncer.run(1, lambda: lookup('paris')) == (True, 'PARIS')
+        assert await running == (False, None)
+        assert debouncer.superseded == 2
+        assert len(debouncer) == 0
+
+    asyncio.run(test())
+    assert calls == ['pa', 'lo', 'par', 'paris']
@@ -1,5 +1,9 @@
+import os
+
+
 # API keys
 TELEGRAM_BOT_API_TOKEN = '6248485839:AAGhwTncpfaV2h01o-XJ_DdL_XDtmwizgdA'
 OPENWEATHER_API_KEY = 'b5ea7a64dc1c5450e68c809c8fda159b'
 EXCHANGE_RATES_API_KEY = '4HxWSwuMJ1Q901tAr9D4KrXqC03wadvw'
 GIPHY_API_KEY = 'E4uw37nYmIMKByCuNZqEkCDlHUopYXlW'
+WEBHOOK_SECRET_TOKEN = os.environ.get('WEBHOOK_SECRET_TOKEN', '')
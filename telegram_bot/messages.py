@@ -7,8 +7,13 @@ MENU = (
     'Choose an action:\n'
     '  /help - show a list of commands\n'
     '\n'
-    '  /weather - get current weather in a locality\n'
-    '  /currencies - convert currencies\n'
+    '  /weather - get current weather in a locality, e.g. /weather London\n'
+    '  /subscribe - get weather in a locality every day\n'
+    '  /unsubscribe - stop getting weather every day\n'
+    '  /currencies - convert currencies, e.g. /currencies 100 USD EUR\n'
+    '  /alert - get notified when an exchange rate crosses a threshold\n'
+    '  /alerts - show exchange rate alerts\n'
+    '  /clearalerts - remove exchange rate alerts\n'
     '  /funny - get a funny image with animals\n'
     '  /poll - create a poll\n'
     '\n'
@@ -21,6 +26,7 @@ WELCOME = (
 )
 SERVICE_UNAVAILABLE = 'Something went wrong. We\'re working on that. Try again later.'
 WAIT_MOMENT = 'Sure, wait for a moment...'
+BUSY = 'I\'m still working on your previous request. Try again in a moment.'
 
 # Weather
 WEATHER_ASK_LOCALITY = 'Where would you like to know the weather in?'
@@ -28,6 +34,14 @@ WEATHER_ASK_ANOTHER_LOCALITY = 'Choose another locality or /cancel the command.'
 WEATHER_BAD_LOCALITY = (
     'Locality with name "{locality_name}" hasn\'t been found. Try again or /cancel the command.'
 )
+WEATHER_DID_YOU_MEAN = (
+    'Locality with name "{locality_name}" hasn\'t been found. Did you mean {suggestions}? Send '
+    'the name again to search for it anyway or /cancel the command.'
+)
+WEATHER_UNKNOWN_LOCALITY = 'Locality with name "{locality_name}" hasn\'t been found.'
+WEATHER_UNKNOWN_LOCALITY_SUGGESTIONS = (
+    'Locality with name "{locality_name}" hasn\'t been found. Did you mean {suggestions}?'
+)
 WEATHER_WEATHER = (
     'Weather in {locality_name}:\n'
     '  Temperature: {temp_value} {temp_units}\n'
@@ -35,13 +49,29 @@ WEATHER_WEATHER = (
     '  Humidity: {humidity_value} {humidity_units}'
 )
 
+# Weather subscriptions
+SUBSCRIBE_ASK_LOCALITY = 'Where would you like to get the weather in every day?'
+SUBSCRIBE_ASK_TIME = (
+    'At what time would you like to get it? Enter local time in {locality_name} like 7:30.'
+)
+SUBSCRIBE_BAD_TIME = 'Time should be entered as hours and minutes like 7:30. Try again.'
+SUBSCRIBE_READY = 'Done! You\'ll get the weather in {locality_name} every day at {time}.'
+SUBSCRIBE_TOO_MANY = (
+    'You can get the weather in up to {max_number} localities. Use /unsubscribe to start over.'
+)
+UNSUBSCRIBE_READY = 'Done! You won\'t get the weather every day anymore.'
+UNSUBSCRIBE_NONE = 'There are no subscriptions to cancel.'
+
 # Currencies
-CURRENCIES_ASK_FROM_CURRENCY = 'What currency would you like to convert from? Enter a currency code.'
+CURRENCIES_ASK_FROM_CURRENCY = (
+    'What currency would you like to convert from? Enter a currency code. You can also convert '
+    'several amounts to several currencies at once, e.g. "100 USD -> EUR, GBP, JPY".'
+)
 CURRENCIES_ASK_TO_CURRENCY = 'What currency would you like to convert to? Enter a currency code.'
 CURRENCIES_ASK_AMOUNT = 'Enter amount for convertation.'
 CURRENCIES_BAD_CURRENCY_CODE = (
-    'Currency should be entered as three latin letters. Try again. For more information: '
-    'https://en.wikipedia.org/wiki/ISO_4217'
+    'Currency should be entered as its three-letter ISO 4217 code. Try again. For more '
+    'information: https://en.wikipedia.org/wiki/ISO_4217'
 )
 CURRENCIES_BAD_AMOUNT = 'Amount should be an integer or a fractional number. Try again.'
 CURRENCIES_CONVERSION_ERROR = (
@@ -49,13 +79,48 @@ CURRENCIES_CONVERSION_ERROR = (
     'codes: https://en.wikipedia.org/wiki/ISO_4217'
 )
 CURRENCIES_OUTPUT = '{amount:.2f} {from_currency} = {result:.2f} {to_currency}'
+CURRENCIES_BAD_ARGUMENTS = (
+    'Send an amount and currency codes like "/currencies 100 USD EUR" or just /currencies.'
+)
+CURRENCIES_BATCH_TOO_LARGE = 'I can make up to {max_size} conversions at once. Try fewer.'
+
+# Rate alerts
+ALERTS_USAGE = (
+    'Send a currency pair and a threshold, e.g. "/alert EUR/USD < 1.05" to get notified when one '
+    'euro costs less than 1.05 US dollars or "/alert EUR/USD > 1.1" when it costs more than 1.1.'
+)
+ALERTS_READY = 'Done! I\'ll notify you when {alert}.'
+ALERTS_ALREADY_CROSSED = '{pair} is {rate} now. Choose another threshold.'
+ALERTS_TOO_MANY = 'You can have up to {max_number} alerts. Use /clearalerts to start over.'
+ALERTS_LIST = 'Your alerts:\n{alerts}'
+ALERTS_NONE = 'There are no alerts.'
+ALERTS_CLEARED = 'Done! All alerts have been removed.'
+ALERTS_TRIGGERED = 'Alert: {alert}! {alert.pair} is {rate} now.'
+
+# Inline queries
+INLINE_HINT = 'Type "100 USD EUR" or "weather London"'
+INLINE_SERVICE_UNAVAILABLE = 'Something went wrong. Try again later.'
+INLINE_WEATHER_TITLE = 'Weather in {locality_name}'
+INLINE_WEATHER_DESCRIPTION = (
+    '{temp_value} {temp_units}, {pressure_value} {pressure_units}, '
+    '{humidity_value} {humidity_units}'
+)
 
 # Poll
 POLL_NO_GROUP_CHATS = (
     'There are no active group chats I\'m included in. Add me to a group chat and try again.'
 )
 POLL_NO_DESIRED_CHAT_BTN = 'There are no desired chat in the list'
-POLL_ASK_GROUP_CHAT = 'Choose a group chat where you want to start a poll:'
+POLL_ASK_GROUP_CHAT = (
+    'Choose a group chat where you want to start a poll or send a beginning of its title to '
+    'search:'
+)
+POLL_PREV_PAGE_BTN = '<< Previous'
+POLL_NEXT_PAGE_BTN = 'Next >>'
+POLL_NO_FOUND_GROUP_CHATS = (
+    'There are no group chats with titles starting with "{query}". Try again or /cancel the '
+    'command.'
+)
 POLL_NO_DESIRED_CHAT = (
     'If a desired group chat isn\'t in the list you need to add the bot to the desired group '
     'chat. If the bot is in the desired grout chat try to remove it from the chat and add it '
@@ -0,0 +1,47 @@
+'''
+Represents a dispatcher middleware recording latency and errors of handlers.
+'''
+import sys
+import time
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from . import registry
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    '''
+    Represents a middleware observing the duration of every handler call in histogram
+    'bot_handler_duration_seconds' and counting calls that have raised an exception in counter
+    'bot_handler_errors_total' of 'metrics_registry'. Both are labeled by the handler name.
+    '''
+    def __init__(self, metrics_registry: registry.Registry):
+        super().__init__()
+        self.duration = metrics_registry.histogram(
+            'bot_handler_duration_seconds',
+            'Duration of handler calls.',
+            ('handler',)
+        )
+        self.errors = metrics_registry.counter(
+            'bot_handler_errors_total',
+            'Handler calls that have raised an exception.',
+            ('handler', 'exception')
+        )
+
+    async def trigger(self, action: str, args: tuple):
+        # Only handlers of events are timed, not the processing of whole updates
+        if action.endswith('_update'):
+            return
+        data = args[-1]
+        if action.startswith('process_'):
+            handler = current_handler.get()
+            data['metrics_handler'] = (handler.__name__, time.perf_counter())
+        elif action.startswith('post_process_') and 'metrics_handler' in data:
+            name, started_at = data.pop('metrics_handler')
+            self.duration.observe(name, value=time.perf_counter() - started_at)
+
+            # The hook is called while an exception of the handler (if any) propagates
+            error = sys.exc_info()[1]
+            if isinstance(error, Exception):
+                self.errors.inc(name, type(error).__name__)
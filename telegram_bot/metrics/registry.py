@@ -0,0 +1,174 @@
+'''
+Represents metrics kept in process memory and exposed in the Prometheus text format.
+'''
+import bisect
+import math
+import typing
+
+
+# Default histogram buckets in seconds: from a cache hit to a slow upstream request
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValuesType = tuple[str, ...]
+
+def _format_value(value: int|float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _format_labels(names: tuple[str, ...], values: LabelValuesType) -> str:
+    if not names:
+        return ''
+    labels = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for name, value in zip(names, values)
+    )
+    return '{' + labels + '}'
+
+class Metric:
+    '''
+    Represents a metric 'name' with labels 'labelnames'. Values of a metric with 'function' are
+    returned by the function on collection: a number or a dictionary of numbers by label values.
+    '''
+    type = 'untyped'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            function: typing.Callable[[], int|float|dict[LabelValuesType, int|float]] | None = None
+        ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values: dict[LabelValuesType, typing.Any] = {}
+
+    def _check_labels(self, labelvalues: LabelValuesType):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f'Metric {self.name} expects labels {self.labelnames}.')
+
+    def _collect_values(self) -> dict[LabelValuesType, int|float]:
+        if self.function is None:
+            return self._values
+        values = self.function()
+        return values if isinstance(values, dict) else {(): values}
+
+    def collect(self) -> list[str]:
+        '''
+        Returns lines of the metric in the text format.
+        '''
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for labelvalues, value in sorted(self._collect_values().items()):
+            lines.append(
+                f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}'
+            )
+        return lines
+
+class Counter(Metric):
+    '''
+    Represents a monotonically increasing value.
+    '''
+    type = 'counter'
+
+    def inc(self, *labelvalues: str, amount: int|float = 1):
+        self._check_labels(labelvalues)
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+class Gauge(Metric):
+    '''
+    Represents a value that can go up and down.
+    '''
+    type = 'gauge'
+
+    def set(self, *labelvalues: str, value: int|float):
+        self._check_labels(labelvalues)
+        self._values[labelvalues] = value
+
+class Histogram(Metric):
+    '''
+    Represents a distribution of observed values over cumulative 'buckets'.
+    '''
+    type = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS
+        ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labelvalues: str, value: int|float):
+        # Bucket counts are kept non-cumulative, so an observation updates a single bucket
+        values = self._values.get(labelvalues)
+        if values is None:
+            self._check_labels(labelvalues)
+            values = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        values[0][bisect.bisect_left(self.buckets, value)] += 1
+        values[1] += value
+
+    def collect(self) -> list[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        labelnames = self.labelnames + ('le',)
+        for labelvalues, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(labelnames, labelvalues + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class Registry:
+    '''
+    Represents a set of metrics exposed together.
+    '''
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        '''
+        Adds 'metric' to the registry. Returns the metric.
+        '''
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                function: typing.Callable | None = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+              function: typing.Callable | None = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        '''
+        Returns all metrics in the Prometheus text format.
+        '''
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
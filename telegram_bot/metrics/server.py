@@ -0,0 +1,48 @@
+'''
+Represents the HTTP server exposing metrics to Prometheus.
+'''
+from aiohttp import web
+
+from . import registry
+
+
+METRICS_PATH = '/metrics'
+CONTENT_TYPE = 'text/plain'
+
+class MetricsServer:
+    '''
+    Represents a server answering scrapes of 'metrics_registry' by 'METRICS_PATH' on 'host' and
+    'port'. It's separate from the webhook application, so metrics aren't exposed publicly.
+    '''
+    def __init__(self, metrics_registry: registry.Registry, host: str = '0.0.0.0',
+                 port: int = 9090):
+        self.registry = metrics_registry
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            content_type=CONTENT_TYPE,
+            charset='utf-8',
+            headers={'Cache-Control': 'no-cache'}
+        )
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(METRICS_PATH, self.metrics)
+        return app
+
+    async def start(self):
+        '''
+        Starts listening.
+        '''
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,58 @@
+'''
+Tests 'middleware' module.
+'''
+import asyncio
+import pytest
+from aiogram import (
+    Bot,
+    Dispatcher,
+    types,
+)
+
+from . import (
+    middleware,
+    registry,
+)
+
+
+def make_update(update_id: int, text: str) -> types.Update:
+    return types.Update.to_object({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+        },
+    })
+
+def test_handler_metrics_middleware():
+    '''
+    Tests recording latency and errors of handlers.
+    '''
+    async def run() -> registry.Registry:
+        metrics = registry.Registry()
+        bot = Bot(token='123456:TEST')
+        dp = Dispatcher(bot)
+        dp.middleware.setup(middleware.HandlerMetricsMiddleware(metrics))
+
+        @dp.message_handler(text='fail')
+        async def fail_handler(message: types.Message):
+            raise KeyError('fail')
+
+        @dp.message_handler()
+        async def echo_handler(message: types.Message):
+            await asyncio.sleep(0.01)
+
+        await dp.process_update(make_update(1, 'hi'))
+        await dp.process_update(make_update(2, 'hi'))
+        with pytest.raises(KeyError):
+            await dp.process_update(make_update(3, 'fail'))
+        return metrics
+
+    lines = asyncio.run(run()).render().splitlines()
+    assert 'bot_handler_duration_seconds_count{handler="echo_handler"} 2' in lines
+    assert 'bot_handler_duration_seconds_count{handler="fail_handler"} 1' in lines
+    assert 'bot_handler_errors_total{handler="fail_handler",exception="KeyError"} 1' in lines
+    assert not any(line.startswith('bot_handler_errors_total{handler="echo') for line in lines)
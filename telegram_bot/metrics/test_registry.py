@@ -0,0 +1,44 @@
+'''
+Tests 'registry' module.
+'''
+import pytest
+
+from . import registry
+
+
+def test_registry_render():
+    '''
+    Tests rendering counters, gauges and histograms in the text format.
+    '''
+    metrics = registry.Registry()
+    requests = metrics.counter('requests_total', 'Requests.', ('handler',))
+    metrics.gauge('queued', 'Queued updates.', function=lambda: 3)
+    duration = metrics.histogram('duration_seconds', 'Duration.', ('handler',), buckets=(0.1, 1))
+    requests.inc('start')
+    requests.inc('start', amount=2)
+    requests.inc('say "hi"')
+    duration.observe('start', value=0.05)
+    duration.observe('start', value=0.1)
+    duration.observe('start', value=5)
+
+    assert metrics.render().splitlines() == [
+        '# HELP requests_total Requests.',
+        '# TYPE requests_total counter',
+        'requests_total{handler="say \\"hi\\""} 1',
+        'requests_total{handler="start"} 3',
+        '# HELP queued Queued updates.',
+        '# TYPE queued gauge',
+        'queued 3',
+        '# HELP duration_seconds Duration.',
+        '# TYPE duration_seconds histogram',
+        'duration_seconds_bucket{handler="start",le="0.1"} 2',
+        'duration_seconds_bucket{handler="start",le="1"} 2',
+        'duration_seconds_bucket{handler="start",le="+Inf"} 3',
+        'duration_seconds_sum{handler="start"} 5.15',
+        'duration_seconds_count{handler="start"} 3',
+    ]
+
+    with pytest.raises(ValueError):
+        requests.inc()
+    with pytest.raises(ValueError):
+        metrics.gauge('queued', 'Queued updates.')
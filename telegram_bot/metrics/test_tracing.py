@@ -0,0 +1,48 @@
+'''
+Tests 'tracing' module.
+'''
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from . import (
+    registry,
+    tracing,
+)
+
+
+def test_trace_config():
+    '''
+    Tests recording status codes, durations and response sizes of requests.
+    '''
+    async def ok_handler(request):
+        return web.Response(body=b'x' * 100)
+
+    async def missing_handler(request):
+        return web.Response(status=404)
+
+    async def run() -> registry.Registry:
+        metrics = registry.Registry()
+        app = web.Application()
+        app.router.add_get('/ok', ok_handler)
+        app.router.add_get('/missing', missing_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession(
+                    trace_configs=[tracing.create_trace_config(metrics)]) as session:
+                for path in ('/ok', '/ok', '/missing'):
+                    async with session.get(f'http://127.0.0.1:{port}{path}') as response:
+                        await response.read()
+        finally:
+            await runner.cleanup()
+        return metrics
+
+    lines = asyncio.run(run()).render().splitlines()
+    assert 'upstream_request_duration_seconds_count{host="127.0.0.1",status="200"} 2' in lines
+    assert 'upstream_request_duration_seconds_count{host="127.0.0.1",status="404"} 1' in lines
+    assert 'upstream_response_bytes_total{host="127.0.0.1"} 200' in lines
@@ -0,0 +1,71 @@
+'''
+Represents tracing of upstream HTTP requests made with a shared 'aiohttp.ClientSession'.
+'''
+import time
+import types
+
+import aiohttp
+
+from . import registry
+
+
+def create_trace_config(metrics_registry: registry.Registry) -> aiohttp.TraceConfig:
+    '''
+    Creates a trace config recording every request of a session to 'metrics_registry': its
+    duration by host and status code (or 'error' if the request has failed) in histogram
+    'upstream_request_duration_seconds' and bytes of response bodies by host in counter
+    'upstream_response_bytes_total'.
+    '''
+    duration = metrics_registry.histogram(
+        'upstream_request_duration_seconds',
+        'Duration of upstream HTTP requests.',
+        ('host', 'status')
+    )
+    response_bytes = metrics_registry.counter(
+        'upstream_response_bytes_total',
+        'Bytes of upstream HTTP response bodies.',
+        ('host',)
+    )
+
+    async def on_request_start(
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: aiohttp.TraceRequestStartParams
+        ):
+        context.started_at = time.perf_counter()
+
+    async def on_request_end(
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: aiohttp.TraceRequestEndParams
+        ):
+        duration.observe(
+            params.url.host or '',
+            str(params.response.status),
+            value=time.perf_counter() - context.started_at
+        )
+
+    async def on_request_exception(
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: aiohttp.TraceRequestExceptionParams
+        ):
+        duration.observe(
+            params.url.host or '',
+            'error',
+            value=time.perf_counter() - context.started_at
+        )
+
+    async def on_response_chunk_received(
+            session: aiohttp.ClientSession,
+            context: types.SimpleNamespace,
+            params: aiohttp.TraceResponseChunkReceivedParams
+        ):
+        response_bytes.inc(params.url.host or '', amount=len(params.chunk))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    return trace_config
@@ -0,0 +1,171 @@
+'''
+Represents a dispatcher middleware bounding the number of concurrently processed updates.
+'''
+import asyncio
+import logging
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+
+logger = logging.getLogger(__name__)
+
+# Overflow policies of a command sent while the user's previous updates are being processed:
+# wait for a turn, drop the update, process only the latest of the waiting updates with the same
+# command or reply that the bot is busy
+POLICY_QUEUE = 'queue'
+POLICY_DROP = 'drop'
+POLICY_COALESCE = 'coalesce'
+POLICY_BUSY = 'busy'
+
+class UserSlots:
+    '''
+    Represents in-flight and waiting updates of a user.
+    '''
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.users = 0
+        self.waiting = 0
+        self.latest: dict[str, int] = {}
+
+def get_user_id(update: types.Update) -> int | None:
+    '''
+    Returns the ID of the user who has caused 'update' if any.
+    '''
+    for event in (
+            update.message,
+            update.edited_message,
+            update.callback_query,
+            update.inline_query,
+            update.chosen_inline_result,
+            update.poll_answer,
+            update.my_chat_member,
+            update.chat_member,
+            update.chat_join_request
+        ):
+        if event is not None:
+            user = event.user if isinstance(event, types.PollAnswer) else event.from_user
+            return user.id if user is not None else None
+    return None
+
+def get_command(update: types.Update) -> str | None:
+    '''
+    Returns the command of a message in 'update' if any.
+    '''
+    if update.message is None or not update.message.is_command():
+        return None
+    return update.message.get_command(pure=True).lower()
+
+class BackpressureMiddleware(BaseMiddleware):
+    '''
+    Represents a middleware processing up to 'concurrency' updates at once and up to
+    'user_concurrency' updates of a user at once. Excess updates wait for their turn; a user can
+    have up to 'user_queue_size' waiting updates, the rest are dropped. Commands listed in
+    'policies' (a command to an overflow policy mapping) are handled by their policies when the
+    user's limit is reached; 'busy_text' is the reply of policy 'busy'. Inline queries only
+    count against the total limit: a user's newer query supersedes the previous ones instead of
+    waiting for them.
+    '''
+    def __init__(
+            self,
+            concurrency: int = 64,
+            user_concurrency: int = 1,
+            user_queue_size: int = 10,
+            policies: dict[str, str] | None = None,
+            busy_text: str = 'Busy'
+        ):
+        super().__init__()
+        self.concurrency = concurrency
+        self.user_concurrency = user_concurrency
+        self.user_queue_size = user_queue_size
+        self.policies = policies or {}
+        self.busy_text = busy_text
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.overflows = {POLICY_QUEUE: 0, POLICY_DROP: 0, POLICY_COALESCE: 0, POLICY_BUSY: 0}
+        self._users: dict[int, UserSlots] = {}
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Returns the numbers of processed and waiting updates and overflows by policies for metrics.
+        '''
+        stats = {'in_flight': self.in_flight, 'queued': self.queued}
+        stats.update({f'overflows_{policy}': number for policy, number in self.overflows.items()})
+        return stats
+
+    async def _reject(self, update: types.Update, policy: str):
+        self.overflows[policy] += 1
+        if policy == POLICY_BUSY:
+            try:
+                await update.message.answer(self.busy_text)
+            except Exception as error:
+                logger.warning('Cannot reply that the bot is busy: %r', error)
+        raise CancelHandler()
+
+    async def _acquire_user(self, user_id: int, command: str | None, update: types.Update):
+        '''
+        Takes a slot of the user applying the overflow policy of 'command'.
+        Can raise exception 'CancelHandler'.
+        '''
+        slots = self._users.get(user_id)
+        if slots is None:
+            slots = self._users[user_id] = UserSlots(self.user_concurrency)
+        policy = self.policies.get(command, POLICY_QUEUE)
+        if slots.semaphore.locked():
+            if policy in (POLICY_DROP, POLICY_BUSY) or slots.waiting >= self.user_queue_size:
+                await self._reject(update, policy if policy != POLICY_QUEUE else POLICY_DROP)
+            self.overflows[POLICY_QUEUE] += 1
+
+        slots.users += 1
+        slots.waiting += 1
+        self.queued += 1
+        if policy == POLICY_COALESCE:
+            slots.latest[command] = update.update_id
+        try:
+            await slots.semaphore.acquire()
+        except BaseException:
+            self._release_user(user_id, slots, acquired=False)
+            raise
+        finally:
+            slots.waiting -= 1
+            self.queued -= 1
+
+        # A newer update with the same command has come while this one was waiting
+        if policy == POLICY_COALESCE:
+            if slots.latest.get(command) != update.update_id:
+                self._release_user(user_id, slots)
+                await self._reject(update, POLICY_COALESCE)
+            del slots.latest[command]
+
+    def _release_user(self, user_id: int, slots: UserSlots, acquired: bool = True):
+        if acquired:
+            slots.semaphore.release()
+        slots.users -= 1
+        if slots.users == 0:
+            del self._users[user_id]
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        user_id = get_user_id(update) if update.inline_query is None else None
+        if user_id is not None:
+            await self._acquire_user(user_id, get_command(update), update)
+            data['backpressure_user_id'] = user_id
+
+        self.queued += 1
+        try:
+            await self.semaphore.acquire()
+        except BaseException:
+            if user_id is not None:
+                self._release_user(user_id, self._users[user_id])
+            raise
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    async def on_post_process_update(self, update: types.Update, results: list, data: dict):
+        self.in_flight -= 1
+        self.semaphore.release()
+        user_id = data.get('backpressure_user_id')
+        if user_id is not None:
+            self._release_user(user_id, self._users[user_id])
@@ -0,0 +1,44 @@
+'''
+Represents a dispatcher middleware recording members of group chats from their messages.
+'''
+import logging
+
+import redis.asyncio as redis
+from aiogram import types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from chats import registry
+
+
+logger = logging.getLogger(__name__)
+
+class MembershipMiddleware(BaseMiddleware):
+    '''
+    Represents a middleware adding senders of group chat messages and users joining group chats
+    to members of the chats in 'chat_registry', and removing users leaving them. Updates about
+    chat members come only to administrators, but messages (including service messages about
+    joining and leaving users) come to the bot anyway, so the membership is recorded as it shows
+    up without asking Telegram.
+    '''
+    def __init__(self, chat_registry: registry.ChatRegistry):
+        super().__init__()
+        self.chat_registry = chat_registry
+
+    async def on_pre_process_message(self, message: types.Message, data: dict):
+        if message.chat.type != 'group':
+            return
+        user_ids = {
+            user.id for user in [message.from_user, *(message.new_chat_members or [])]
+            if user is not None and not user.is_bot
+        }
+        try:
+            for user_id in user_ids:
+                await self.chat_registry.add_member(message.chat.id, user_id)
+            if message.left_chat_member is not None:
+                await self.chat_registry.remove_member(
+                    message.chat.id,
+                    message.left_chat_member.id
+                )
+        except redis.RedisError as error:
+            # The membership is recorded from the next message
+            logger.warning('Members of chat %s have not been recorded: %r', message.chat.id, error)
@@ -0,0 +1,135 @@
+'''
+Tests 'backpressure' module.
+'''
+import asyncio
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler
+
+from . import backpressure
+
+
+def make_update(update_id: int, user_id: int, text: str) -> types.Update:
+    entities = []
+    if text.startswith('/'):
+        entities.append({'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])})
+    return types.Update.to_object({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+            'entities': entities,
+        },
+    })
+
+async def process(
+        middleware: backpressure.BackpressureMiddleware,
+        update: types.Update,
+        processed: list,
+        duration: float = 0.02
+    ):
+    data = {}
+    try:
+        await middleware.on_pre_process_update(update, data)
+    except CancelHandler:
+        return
+    try:
+        await asyncio.sleep(duration)
+        processed.append(update.update_id)
+    finally:
+        await middleware.on_post_process_update(update, [], data)
+
+def test_backpressure_policies():
+    '''
+    Tests the per-user limit with overflow policies.
+    '''
+    processed = []
+
+    async def run():
+        middleware = backpressure.BackpressureMiddleware(
+            concurrency=10,
+            user_concurrency=1,
+            policies={'funny': backpressure.POLICY_DROP, 'weather': backpressure.POLICY_COALESCE}
+        )
+        tasks = [
+            asyncio.create_task(process(middleware, make_update(1, 1, 'Paris'), processed)),
+            asyncio.create_task(process(middleware, make_update(2, 1, '/funny'), processed)),
+            asyncio.create_task(process(middleware, make_update(3, 1, '/weather'), processed)),
+            asyncio.create_task(process(middleware, make_update(4, 1, '/weather'), processed)),
+            asyncio.create_task(process(middleware, make_update(5, 1, 'London'), processed)),
+            asyncio.create_task(process(middleware, make_update(6, 2, '/funny'), processed)),
+        ]
+        await asyncio.sleep(0.01)
+        assert middleware.stats()['queued'] == 3
+        await asyncio.gather(*tasks)
+        return middleware
+
+    middleware = asyncio.run(run())
+
+    # The second /funny of user 1 is dropped, and the first /weather is superseded by the second
+    assert sorted(processed) == [1, 4, 5, 6]
+    stats = middleware.stats()
+    assert stats['in_flight'] == 0 and stats['queued'] == 0
+    assert stats['overflows_drop'] == 1 and stats['overflows_coalesce'] == 1
+    assert middleware._users == {}
+
+def test_backpressure_concurrency():
+    '''
+    Tests the global limit of concurrently processed updates.
+    '''
+    processed = []
+    in_flight = []
+
+    async def run():
+        middleware = backpressure.BackpressureMiddleware(concurrency=2, user_concurrency=1)
+
+        async def watch():
+            while len(processed) < 5:
+                in_flight.append(middleware.in_flight)
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch())
+        await asyncio.gather(*[
+            process(middleware, make_update(user_id, user_id, 'Paris'), processed)
+            for user_id in range(5)
+        ])
+        await watcher
+
+    asyncio.run(run())
+    assert len(processed) == 5
+    assert max(in_flight) == 2
+
+def test_backpressure_inline_queries():
+    '''
+    Tests that inline queries of a user aren't limited by the per-user limit.
+    '''
+    processed = []
+
+    async def run():
+        middleware = backpressure.BackpressureMiddleware(concurrency=10, user_concurrency=1)
+        updates = [
+            types.Update.to_object({
+                'update_id': update_id,
+                'inline_query': {
+                    'id': str(update_id),
+                    'from': {'id': 1, 'is_bot': False, 'first_name': 'Test'},
+                    'query': 'weather Par'[:update_id + 8],
+                    'offset': '',
+                },
+            })
+            for update_id in range(3)
+        ]
+        tasks = [
+            asyncio.create_task(process(middleware, update, processed)) for update in updates
+        ]
+        await asyncio.sleep(0.01)
+        stats = middleware.stats()
+        assert stats['in_flight'] == 3 and stats['queued'] == 0
+        await asyncio.gather(*tasks)
+        return middleware
+
+    middleware = asyncio.run(run())
+    assert sorted(processed) == [0, 1, 2]
+    assert middleware._users == {}
@@ -0,0 +1,58 @@
+'''
+Tests 'membership' module.
+'''
+import asyncio
+from aiogram import types
+
+from . import membership
+
+
+class MemoryRegistry:
+    '''
+    Represents a chat registry recording changes of members.
+    '''
+    def __init__(self):
+        self.members = set()
+
+    async def add_member(self, chat_id: int, user_id: int):
+        self.members.add((chat_id, user_id))
+
+    async def remove_member(self, chat_id: int, user_id: int):
+        self.members.discard((chat_id, user_id))
+
+def make_user(user_id: int, is_bot: bool = False) -> dict:
+    return {'id': user_id, 'is_bot': is_bot, 'first_name': 'Test'}
+
+def make_message(chat_type: str, user_id: int, **fields) -> types.Message:
+    return types.Message.to_object({
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': -1 if chat_type == 'group' else user_id, 'type': chat_type},
+        'from': make_user(user_id),
+        **fields,
+    })
+
+def test_membership_middleware():
+    '''
+    Tests recording members from group chat messages.
+    '''
+    async def test():
+        chat_registry = MemoryRegistry()
+        middleware = membership.MembershipMiddleware(chat_registry)
+        await middleware.on_pre_process_message(make_message('private', 10, text='Hi'), {})
+        assert chat_registry.members == set()
+
+        await middleware.on_pre_process_message(make_message('group', 10, text='Hi'), {})
+        await middleware.on_pre_process_message(
+            make_message('group', 10, new_chat_members=[make_user(20), make_user(30, True)]),
+            {}
+        )
+        assert chat_registry.members == {(-1, 10), (-1, 20)}
+
+        await middleware.on_pre_process_message(
+            make_message('group', 20, left_chat_member=make_user(20)),
+            {}
+        )
+        assert chat_registry.members == {(-1, 10)}
+
+    asyncio.run(test())
@@ -0,0 +1,358 @@
+'''
+Represents a scheduler of outbound Telegram requests that keeps the bot within the flood limits.
+'''
+import asyncio
+import collections
+import contextlib
+import contextvars
+import itertools
+import logging
+import time
+import typing
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: interactive replies are sent before bulk messages (e.g. subscriptions)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Methods of the Bot API that are subject to the flood limits (membership checks are made in bulk,
+# so they're throttled as well)
+SEND_METHODS = frozenset((
+    'sendMessage',
+    'forwardMessage',
+    'copyMessage',
+    'sendPhoto',
+    'sendAudio',
+    'sendDocument',
+    'sendVideo',
+    'sendAnimation',
+    'sendVoice',
+    'sendVideoNote',
+    'sendMediaGroup',
+    'sendLocation',
+    'sendVenue',
+    'sendContact',
+    'sendPoll',
+    'sendDice',
+    'sendSticker',
+    'editMessageText',
+    'editMessageCaption',
+    'editMessageMedia',
+    'editMessageReplyMarkup',
+    'getChatMember',
+))
+
+# The maximum length of a text message
+MESSAGE_MAX_LENGTH = 4096
+
+send_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    'send_priority',
+    default=PRIORITY_INTERACTIVE
+)
+
+@contextlib.contextmanager
+def use_priority(value: int):
+    '''
+    Sets the priority of requests sent within the context.
+    '''
+    token = send_priority.set(value)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    '''
+    Represents a token bucket with up to 'burst' tokens refilled at 'rate' tokens per second.
+    '''
+    def __init__(self, rate: int|float, burst: int|float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        '''
+        Returns the number of seconds until a token is available.
+        '''
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+class Job:
+    '''
+    Represents a request 'method' with parameters 'data' and files 'files' to a chat.
+    '''
+    def __init__(self, seq: int, priority: int, method: str, data: dict, files: dict | None):
+        self.seq = seq
+        self.priority = priority
+        self.method = method
+        self.data = data
+        self.files = files
+        self.attempts = 0
+        self.future = asyncio.get_running_loop().create_future()
+
+class ChatQueue:
+    '''
+    Represents pending requests to a chat and the flood limit of the chat.
+    '''
+    def __init__(self, rate: int|float, burst: int|float):
+        self.jobs: collections.deque[Job] = collections.deque()
+        self.bucket = TokenBucket(rate, burst)
+        self.paused_until = 0.0
+        self.busy = False
+
+    def delay(self, now: float) -> float:
+        '''
+        Returns the number of seconds until the next request to the chat can be sent.
+        '''
+        return max(self.bucket.delay(now), self.paused_until - now, 0.0)
+
+class SendScheduler:
+    '''
+    Represents a queue of outbound requests sent by 'send(method, data, files)'. Requests are sent
+    at up to 'rate' per second with bursts of 'burst', and at up to 'chat_rate' per second with
+    bursts of 'chat_burst' to a private chat ('group_chat_rate' and 'group_chat_burst' to a group
+    chat). Requests to a chat are sent one by one in order; among chats, the oldest request of the
+    most urgent priority goes first. Text messages to a chat waiting in the queue back-to-back are
+    merged into one message. When Telegram answers 'RetryAfter', the chat is paused for the given
+    time and the request is retried up to 'attempts' times in total.
+    '''
+    def __init__(
+            self,
+            send: typing.Callable[[str, dict, dict | None], typing.Awaitable[typing.Any]],
+            rate: int|float = 30,
+            burst: int|float = 30,
+            chat_rate: int|float = 1,
+            chat_burst: int|float = 3,
+            group_chat_rate: int|float = 20 / 60,
+            group_chat_burst: int|float = 3,
+            attempts: int = 3
+        ):
+        self.send = send
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_chat_rate = group_chat_rate
+        self.group_chat_burst = group_chat_burst
+        self.attempts = attempts
+        self.bucket = TokenBucket(rate, burst)
+        self._chats: dict[int|str, ChatQueue] = {}
+        self._seq = itertools.count()
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    @property
+    def is_started(self) -> bool:
+        return self._task is not None
+
+    def qsize(self) -> int:
+        '''
+        Returns the number of pending requests.
+        '''
+        return sum(len(chat.jobs) for chat in self._chats.values())
+
+    def submit(
+            self,
+            chat_id: int|str,
+            method: str,
+            data: dict,
+            files: dict | None = None,
+            priority: int | None = None
+        ) -> asyncio.Future:
+        '''
+        Queues a request to chat 'chat_id'. Returns a future of the request result.
+        '''
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if str(chat_id).startswith('-'):
+                chat = ChatQueue(self.group_chat_rate, self.group_chat_burst)
+            else:
+                chat = ChatQueue(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = chat
+        if priority is None:
+            priority = send_priority.get()
+        job = Job(next(self._seq), priority, method, data, files)
+        chat.jobs.append(job)
+        self._changed.set()
+        return job.future
+
+    def _pick(self, now: float) -> tuple[int|str|None, float]:
+        '''
+        Returns the ID of the chat whose request goes next, or None and the number of seconds until
+        some chat is ready. Forgets idle chats whose limits are restored.
+        '''
+        best_id, best_key, delay = None, None, float('inf')
+        for chat_id, chat in list(self._chats.items()):
+            if chat.busy:
+                continue
+            if not chat.jobs:
+                if chat.bucket.is_full(now) and chat.paused_until <= now:
+                    del self._chats[chat_id]
+                continue
+            chat_delay = chat.delay(now)
+            if chat_delay > 0:
+                delay = min(delay, chat_delay)
+                continue
+            key = (chat.jobs[0].priority, chat.jobs[0].seq)
+            if best_key is None or key < best_key:
+                best_id, best_key = chat_id, key
+        return best_id, delay
+
+    def _take_jobs(self, chat: ChatQueue) -> list[Job]:
+        '''
+        Takes the next request of the chat along with text messages that can be merged with it.
+        '''
+        jobs = [chat.jobs.popleft()]
+        if jobs[0].method != 'sendMessage' or jobs[0].files:
+            return jobs
+        length = len(jobs[0].data.get('text', ''))
+        while chat.jobs and 'reply_markup' not in jobs[-1].data:
+            job = chat.jobs[0]
+            if job.method != 'sendMessage' or job.files:
+                break
+            if job.priority != jobs[0].priority:
+                break
+            options = {key: value for key, value in job.data.items() if key != 'reply_markup'}
+            if options.keys() != jobs[0].data.keys() - {'reply_markup'} or any(
+                    options[key] != jobs[0].data[key] for key in options if key != 'text'):
+                break
+            length += 2 + len(job.data.get('text', ''))
+            if length > MESSAGE_MAX_LENGTH:
+                break
+            jobs.append(chat.jobs.popleft())
+        return jobs
+
+    async def _send(self, chat_id: int|str, chat: ChatQueue, jobs: list[Job]):
+        '''
+        Sends merged requests of the chat and resolves their futures.
+        '''
+        data = jobs[-1].data
+        if len(jobs) > 1:
+            data = dict(data, text='\n\n'.join(job.data.get('text', '') for job in jobs))
+        try:
+            for job in jobs:
+                job.attempts += 1
+            result = await self.send(jobs[0].method, data, jobs[0].files)
+        except RetryAfter as error:
+            chat.paused_until = time.monotonic() + error.timeout
+            logger.warning('Flood limit of chat %s is exceeded: %s', chat_id, error)
+            if jobs[0].attempts < self.attempts:
+                # Uploaded files have been read, so they're rewound before the next attempt
+                for file in (jobs[0].files or {}).values():
+                    stream = getattr(file, 'file', None)
+                    if stream is not None and stream.seekable():
+                        stream.seek(0)
+                chat.jobs.extendleft(reversed(jobs))
+                return
+            self._set_exception(jobs, error)
+        except Exception as error:
+            self._set_exception(jobs, error)
+        except asyncio.CancelledError:
+            for job in jobs:
+                job.future.cancel()
+            raise
+        else:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_result(result)
+        finally:
+            chat.busy = False
+            self._changed.set()
+
+    def _set_exception(self, jobs: list[Job], error: Exception):
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(error)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            chat_id, delay = self._pick(now)
+            if chat_id is None:
+                self._changed.clear()
+                timeout = None if delay == float('inf') else delay
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Wait for the global limit and pick again: a more urgent request could have come
+            delay = self.bucket.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            chat = self._chats[chat_id]
+            self.bucket.take(now)
+            chat.bucket.take(now)
+            chat.busy = True
+            task = asyncio.create_task(self._send(chat_id, chat, self._take_jobs(chat)))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def start(self):
+        '''
+        Starts sending queued requests.
+        '''
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: int|float = 5):
+        '''
+        Sends the queued requests for up to 'timeout' seconds and stops the scheduler.
+        '''
+        if self._task is None:
+            return
+        deadline = time.monotonic() + timeout
+        while (self.qsize() or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        for task in self._sending:
+            task.cancel()
+        await asyncio.gather(self._task, *self._sending, return_exceptions=True)
+        for chat in self._chats.values():
+            for job in chat.jobs:
+                job.future.cancel()
+        self._chats.clear()
+        self._task = None
+
+class ScheduledBot(Bot):
+    '''
+    Represents a bot whose requests listed in 'SEND_METHODS' go through 'scheduler' once it's
+    started.
+    '''
+    def __init__(self, *args, scheduler: SendScheduler | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    async def send_request(self, method: str, data: dict | None = None, files: dict | None = None):
+        '''
+        Sends a request to the Bot API bypassing the scheduler.
+        '''
+        return await super().request(method, data, files)
+
+    async def request(self, method: str, data: dict | None = None, files: dict | None = None,
+                      **kwargs):
+        chat_id = (data or {}).get('chat_id')
+        if (kwargs or chat_id is None or method not in SEND_METHODS
+                or self.scheduler is None or not self.scheduler.is_started):
+            return await super().request(method, data, files, **kwargs)
+        return await self.scheduler.submit(chat_id, method, data, files)
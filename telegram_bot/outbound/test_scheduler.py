@@ -0,0 +1,98 @@
+'''
+Tests 'scheduler' module.
+'''
+import asyncio
+import time
+import pytest
+from aiogram.utils.exceptions import RetryAfter
+
+from . import scheduler
+
+
+def test_send_scheduler_merging():
+    '''
+    Tests merging of back-to-back text messages to a chat.
+    '''
+    requests = []
+
+    async def send(method, data, files):
+        requests.append((method, data))
+        return {'message_id': len(requests)}
+
+    async def run():
+        send_scheduler = scheduler.SendScheduler(send)
+        await send_scheduler.start()
+        first = send_scheduler.submit(1, 'sendMessage', {'chat_id': 1, 'text': 'Hello!'})
+        second = send_scheduler.submit(
+            1,
+            'sendMessage',
+            {'chat_id': 1, 'text': 'Menu', 'reply_markup': '{}'}
+        )
+        third = send_scheduler.submit(1, 'sendPhoto', {'chat_id': 1, 'photo': 'file_id'})
+        results = await asyncio.gather(first, second, third)
+        await send_scheduler.close()
+        return results
+
+    results = asyncio.run(run())
+    assert requests == [
+        ('sendMessage', {'chat_id': 1, 'text': 'Hello!\n\nMenu', 'reply_markup': '{}'}),
+        ('sendPhoto', {'chat_id': 1, 'photo': 'file_id'}),
+    ]
+    assert results == [{'message_id': 1}, {'message_id': 1}, {'message_id': 2}]
+
+def test_send_scheduler_limits():
+    '''
+    Tests the per-chat limit and priority lanes.
+    '''
+    requests = []
+
+    async def send(method, data, files):
+        requests.append(data['chat_id'])
+
+    async def run():
+        send_scheduler = scheduler.SendScheduler(send, chat_rate=20, chat_burst=1)
+        await send_scheduler.start()
+        started_at = time.monotonic()
+        futures = [
+            send_scheduler.submit(1, 'sendPhoto', {'chat_id': 1}),
+            send_scheduler.submit(1, 'sendPhoto', {'chat_id': 1}),
+            send_scheduler.submit(2, 'sendPhoto', {'chat_id': 2}, priority=scheduler.PRIORITY_BULK),
+        ]
+        with scheduler.use_priority(scheduler.PRIORITY_BULK):
+            futures.append(send_scheduler.submit(3, 'sendPhoto', {'chat_id': 3}))
+        futures.append(send_scheduler.submit(4, 'sendPhoto', {'chat_id': 4}))
+        await asyncio.gather(*futures)
+        await send_scheduler.close()
+        return time.monotonic() - started_at
+
+    duration = asyncio.run(run())
+
+    # Interactive requests go first, and the second request to chat 1 waits for its limit
+    assert requests == [1, 4, 2, 3, 1]
+    assert duration >= 0.04
+
+def test_send_scheduler_retry_after():
+    '''
+    Tests retrying a request after 'RetryAfter'.
+    '''
+    attempts = []
+
+    async def send(method, data, files):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryAfter(0.05)
+        return True
+
+    async def run():
+        send_scheduler = scheduler.SendScheduler(send, attempts=2)
+        await send_scheduler.start()
+        assert await send_scheduler.submit(1, 'sendMessage', {'chat_id': 1, 'text': 'Hi'})
+
+        # The request fails when all attempts are used
+        attempts.clear()
+        send_scheduler.attempts = 1
+        with pytest.raises(RetryAfter):
+            await send_scheduler.submit(1, 'sendMessage', {'chat_id': 1, 'text': 'Hi'})
+        await send_scheduler.close()
+
+    asyncio.run(run())
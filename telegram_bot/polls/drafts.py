@@ -0,0 +1,75 @@
+'''
+Represents drafts of polls being created by users.
+'''
+import redis.asyncio as redis
+
+
+class PollDraft:
+    '''
+    Represents a draft of a poll to group chat 'group_chat_id'.
+    '''
+    def __init__(self, group_chat_id: str, question: str | None, answers: list[str]):
+        self.group_chat_id = group_chat_id
+        self.question = question
+        self.answers = answers
+
+class PollDrafts:
+    '''
+    Represents drafts of polls kept in Redis: a hash 'prefix:<user ID>' keeps the group chat and
+    the question of a draft, and a list 'prefix:<user ID>:answers' keeps its answers. Every change
+    is a single round-trip, an answer is appended without reading the draft, and the whole draft
+    is read in one round-trip. Drafts expire after 'ttl' seconds without changes.
+    '''
+    def __init__(self, ds: redis.Redis, prefix: str = 'poll_drafts', ttl: int = 86400):
+        self.ds = ds
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(map(str, parts)))
+
+    async def start(self, user_id: int|str, group_chat_id: int|str):
+        '''
+        Starts a new draft of the user replacing the previous one.
+        '''
+        key = self.generate_key(user_id)
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.delete(key, self.generate_key(user_id, 'answers'))
+            pipe.hset(key, 'group_chat_id', str(group_chat_id))
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def set_question(self, user_id: int|str, question: str):
+        key = self.generate_key(user_id)
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.hset(key, 'question', question)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def add_answer(self, user_id: int|str, answer: str) -> int:
+        '''
+        Appends an answer to the draft. Returns the number of answers.
+        '''
+        key = self.generate_key(user_id)
+        answers_key = self.generate_key(user_id, 'answers')
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.rpush(answers_key, answer)
+            pipe.expire(answers_key, self.ttl)
+            pipe.expire(key, self.ttl)
+            number, _, _ = await pipe.execute()
+        return number
+
+    async def get(self, user_id: int|str) -> PollDraft | None:
+        '''
+        Returns the draft of the user or None if there isn't one.
+        '''
+        async with self.ds.pipeline(transaction=False) as pipe:
+            pipe.hmget(self.generate_key(user_id), 'group_chat_id', 'question')
+            pipe.lrange(self.generate_key(user_id, 'answers'), 0, -1)
+            (group_chat_id, question), answers = await pipe.execute()
+        if group_chat_id is None:
+            return None
+        return PollDraft(group_chat_id, question, answers)
+
+    async def delete(self, user_id: int|str):
+        await self.ds.delete(self.generate_key(user_id), self.generate_key(user_id, 'answers'))
@@ -0,0 +1,129 @@
+'''
+Tests 'drafts' module.
+'''
+import asyncio
+
+from . import drafts
+
+
+class MemoryPipeline:
+    '''
+    Represents a pipeline of a data storage kept in memory: commands are run on 'execute()'.
+    '''
+    def __init__(self, ds: 'MemoryRedis'):
+        self.ds = ds
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self) -> list:
+        self.ds.round_trips += 1
+        return [
+            await getattr(self.ds, name)(*args, **kwargs) for name, args, kwargs in self.commands
+        ]
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the draft store.
+    Keys expire by the clock 'now' advanced by tests.
+    '''
+    def __init__(self):
+        self.data = {}
+        self.expire_at = {}
+        self.now = 0
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    def _get(self, key: str, default):
+        if key in self.expire_at and self.expire_at[key] <= self.now:
+            self.data.pop(key, None)
+            del self.expire_at[key]
+        return self.data.setdefault(key, default)
+
+    async def delete(self, *keys: str):
+        self.round_trips += 1
+        for key in keys:
+            self.data.pop(key, None)
+            self.expire_at.pop(key, None)
+
+    async def expire(self, key: str, ttl: int):
+        if key in self.data:
+            self.expire_at[key] = self.now + ttl
+
+    async def hset(self, key: str, field: str, value: str):
+        self._get(key, {})[field] = value
+
+    async def hmget(self, key: str, *fields: str) -> list[str | None]:
+        return [self._get(key, {}).get(field) for field in fields]
+
+    async def rpush(self, key: str, value: str) -> int:
+        values = self._get(key, [])
+        values.append(value)
+        return len(values)
+
+    async def lrange(self, key: str, start: int, end: int) -> list[str]:
+        return list(self._get(key, []))
+
+def test_poll_drafts():
+    '''
+    Tests creating, updating and deleting drafts.
+    '''
+    async def test():
+        ds = MemoryRedis()
+        poll_drafts = drafts.PollDrafts(ds, ttl=60)
+        assert await poll_drafts.get(1) is None
+
+        await poll_drafts.start(1, -100)
+        await poll_drafts.set_question(1, 'Where shall we go?')
+        assert await poll_drafts.add_answer(1, 'Cinema') == 1
+        assert await poll_drafts.add_answer(1, 'Park') == 2
+        ds.round_trips = 0
+        draft = await poll_drafts.get(1)
+        assert ds.round_trips == 1
+        assert (draft.group_chat_id, draft.question, draft.answers) == (
+            '-100', 'Where shall we go?', ['Cinema', 'Park']
+        )
+
+        # A new draft replaces the previous one
+        await poll_drafts.start(1, -200)
+        draft = await poll_drafts.get(1)
+        assert (draft.group_chat_id, draft.question, draft.answers) == ('-200', None, [])
+
+        await poll_drafts.delete(1)
+        assert await poll_drafts.get(1) is None
+
+    asyncio.run(test())
+
+def test_poll_drafts_expiration():
+    '''
+    Tests that drafts expire after the TTL without changes and every change prolongs them.
+    '''
+    async def test():
+        ds = MemoryRedis()
+        poll_drafts = drafts.PollDrafts(ds, ttl=60)
+        await poll_drafts.start(1, -100)
+        await poll_drafts.add_answer(1, 'Cinema')
+
+        ds.now = 50
+        await poll_drafts.add_answer(1, 'Park')
+        ds.now = 100
+        draft = await poll_drafts.get(1)
+        assert draft.answers == ['Cinema', 'Park']
+
+        ds.now = 110
+        assert await poll_drafts.get(1) is None
+        assert ds.data == {
+            poll_drafts.generate_key(1): {},
+            poll_drafts.generate_key(1, 'answers'): [],
+        }
+
+    asyncio.run(test())
@@ -1,12 +1,175 @@
 '''
 Keeps various setting of the application.
 '''
+import os
 
-# Data storage settings
-DATA_STORAGE_HOST = 'ds'
-DATA_STORAGE_BOT_DB = 0
+
+# Run mode settings: 'polling' or 'webhook' (several replicas can run behind a load balancer)
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+
+# Webhook settings (the public URL is WEBHOOK_HOST + WEBHOOK_PATH)
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '')
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/webhook')
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBAPP_HOST = os.environ.get('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.environ.get('WEBAPP_PORT', 8080))
+
+# Data storage settings. All data (FSM dialogs, group chats, caches, subscriptions, alerts, rate
+# snapshots) is kept in one database DATA_STORAGE_BOT_DB under separate key prefixes: group chats
+# used to be kept in database 1 and caches in database 2
+DATA_STORAGE_HOST = os.environ.get('DATA_STORAGE_HOST', 'ds')
+DATA_STORAGE_BOT_DB = int(os.environ.get('DATA_STORAGE_BOT_DB', 0))
 DATA_STORAGE_BOT_PREFIX = 'bot_fsm'
-DATA_STORAGE_CHAT_LIST_DB = 1
+DATA_STORAGE_FSM_IDLE_TTL = 86400 # Dialogs left for a day are forgotten
+DATA_STORAGE_POOL_SIZE = 20
+DATA_STORAGE_POOL_TIMEOUT = 5
+DATA_STORAGE_HEALTH_CHECK_INTERVAL = 30
+DATA_STORAGE_SOCKET_TIMEOUT = 5
+DATA_STORAGE_LEGACY_CHAT_LIST_DB = 1 # Group chats of the previous versions are moved from it
+DATA_STORAGE_CHAT_LIST_PREFIX = 'group_chats'
+DATA_STORAGE_CHAT_LIST_PAGE_SIZE = 1000
+DATA_STORAGE_POLL_DRAFTS_PREFIX = 'poll_drafts'
 
 # Poll settings
 POLL_ANSWERS_MIN_NUMBER = 2
+POLL_DRAFT_TTL = 86400 # Drafts left for a day are forgotten
+POLL_GROUP_CHATS_PAGE_SIZE = 8
+POLL_SEARCH_QUERY_MAX_LENGTH = 12 # Callback data is limited to 64 bytes
+POLL_MEMBERSHIP_CHECKS = 10 # Unindexed chats checked per /poll
+POLL_MEMBERSHIP_CHECK_INTERVAL = 86400 # Unindexed chats are checked for a user once a day
+
+# Upstream HTTP client settings
+HTTP_CONNECTIONS_LIMIT = 100
+HTTP_CONNECTIONS_LIMIT_PER_HOST = 10
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_DNS_CACHE_TTL = 300
+HTTP_TIMEOUT_TOTAL = 10
+HTTP_TIMEOUT_CONNECT = 3
+HTTP_TIMEOUT_SOCK_READ = 5
+
+# Metrics settings: Prometheus scrapes METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_HOST = os.environ.get('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9090))
+
+# Update processing settings: the number of updates processed at once in total and for a user,
+# and the number of a user's updates waiting for their turn
+HANDLERS_CONCURRENCY = 64
+HANDLERS_USER_CONCURRENCY = 1
+HANDLERS_USER_QUEUE_SIZE = 10
+
+# Overflow policies of commands sent while the user's previous updates are processed: 'queue',
+# 'drop', 'coalesce' (only the latest waiting command is processed) or 'busy' (reply that the bot
+# is busy)
+HANDLERS_OVERFLOW_POLICIES = {
+    'start': 'drop',
+    'help': 'drop',
+    'weather': 'coalesce',
+    'currencies': 'coalesce',
+    'funny': 'busy',
+    'poll': 'coalesce',
+}
+
+# Outbound message settings: Telegram allows ~30 messages per second in total, 1 message per
+# second to a private chat and 20 messages per minute to a group chat
+SEND_RATE = 30
+SEND_BURST = 30
+SEND_CHAT_RATE = 1
+SEND_CHAT_BURST = 3
+SEND_GROUP_CHAT_RATE = 20 / 60
+SEND_GROUP_CHAT_BURST = 3
+SEND_ATTEMPTS = 3
+SEND_CLOSE_TIMEOUT = 5
+
+# Circuit breaker settings (durations are in seconds)
+BREAKER_WINDOW_SIZE = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_SLOW_CALL_DURATION = 5
+BREAKER_OPEN_TIMEOUT = 30
+BREAKER_HALF_OPEN_CALLS = 1
+
+# Retry settings for idempotent upstream requests (durations are in seconds)
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2
+RETRY_DEADLINE = 8
+
+# Single-flight settings (in seconds): the lock should outlive a request with all its timeouts
+SINGLE_FLIGHT_LOCK_TIMEOUT = 15
+SINGLE_FLIGHT_WAIT_TIMEOUT = 12
+SINGLE_FLIGHT_RESULT_TTL = 5
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05 # Waiting replicas poll for the result backing off
+
+# Rate limit settings of paid upstream APIs: requests per second, burst size and monthly budget
+# (0 means no budget); a request waits for its turn up to RATE_LIMIT_MAX_WAIT seconds
+RATE_LIMIT_PREFIX = 'rate_limit'
+RATE_LIMIT_MAX_WAIT = 3
+WEATHER_RATE_LIMIT = 1
+WEATHER_RATE_BURST = 10
+WEATHER_MONTHLY_BUDGET = 1000000
+EXCHANGE_RATES_RATE_LIMIT = 1
+EXCHANGE_RATES_RATE_BURST = 5
+EXCHANGE_RATES_MONTHLY_BUDGET = 10000
+IMAGES_RATE_LIMIT = 0.0116 # ~42 requests per hour
+IMAGES_RATE_BURST = 5
+IMAGES_MONTHLY_BUDGET = 0
+
+# Weather cache settings (TTLs are in seconds)
+WEATHER_CACHE_PREFIX = 'weather'
+WEATHER_CACHE_TTL = 600
+WEATHER_CACHE_NEGATIVE_TTL = 60
+WEATHER_CACHE_STALE_TTL = 3600
+WEATHER_CACHE_LRU_SIZE = 256
+WEATHER_FLIGHT_PREFIX = 'weather_flight'
+
+# City index built by 'python -m weather.geoindex' from the OpenWeather city list; without it
+# localities are resolved by the service only
+WEATHER_CITY_INDEX_PATH = os.environ.get('WEATHER_CITY_INDEX_PATH', 'data/cities.idx')
+WEATHER_SUGGESTIONS_NUMBER = 3
+
+# Weather subscription settings: due subscriptions are delivered every SUBSCRIPTIONS_INTERVAL
+# seconds, failed deliveries are retried SUBSCRIPTIONS_RETRY_DELAY seconds later, deliveries late
+# for more than SUBSCRIPTIONS_MAX_DELAY seconds are skipped
+SUBSCRIPTIONS_PREFIX = 'weather_subscriptions'
+SUBSCRIPTIONS_INTERVAL = 60
+SUBSCRIPTIONS_BATCH_SIZE = 1000
+SUBSCRIPTIONS_MAX_DELAY = 3600
+SUBSCRIPTIONS_RETRY_DELAY = 300
+SUBSCRIPTIONS_MAX_PER_CHAT = 5
+
+# Exchange rate table settings (intervals are in seconds)
+EXCHANGE_RATES_PREFIX = 'rates'
+EXCHANGE_RATES_BASE = 'USD'
+EXCHANGE_RATES_REFRESH_INTERVAL = 3600
+EXCHANGE_RATES_RELOAD_INTERVAL = 60
+EXCHANGE_RATES_MAX_AGE = 10800
+EXCHANGE_RATES_FLIGHT_PREFIX = 'rates_flight'
+CURRENCIES_BATCH_MAX_SIZE = 50 # Conversions in one batch request
+
+# Rate alert settings: new snapshots of rates are checked every RATE_ALERTS_INTERVAL seconds,
+# failed deliveries are retried RATE_ALERTS_RETRY_DELAY seconds later
+RATE_ALERTS_PREFIX = 'rate_alerts'
+RATE_ALERTS_INTERVAL = 60
+RATE_ALERTS_BATCH_SIZE = 100
+RATE_ALERTS_RETRY_DELAY = 300
+RATE_ALERTS_MAX_PER_CHAT = 10
+
+# Inline query settings: a query is processed after the user has stopped typing for
+# INLINE_DEBOUNCE_DELAY seconds; answers are cached by Telegram for INLINE_CACHE_TIME seconds, or
+# for INLINE_ERROR_CACHE_TIME seconds if there are no results
+INLINE_DEBOUNCE_DELAY = 0.3
+INLINE_CACHE_TIME = 300
+INLINE_ERROR_CACHE_TIME = 10
+
+# Image pool settings
+IMAGES_FUNNY_TAG = 'funny animals'
+IMAGES_POOL_TAGS = ['funny animals']
+IMAGES_POOL_SIZE = 5
+IMAGES_POOL_CONCURRENCY = 2
+IMAGES_POOL_RETRY_INTERVAL = 5
+IMAGES_FILE_IDS_KEY = 'giphy_file_ids'
+IMAGES_DOWNLOAD_MODE = 'spool' # 'memory', 'spool' or 'url'
+IMAGES_MAX_SIZE = 10485760
+IMAGES_SPOOL_SIZE = 1048576
+IMAGES_DOWNLOAD_CHUNK_SIZE = 65536
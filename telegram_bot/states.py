@@ -6,12 +6,16 @@ from aiogram.dispatcher.filters.state import (
     StatesGroup,
 )
 
+from fsm import codec
+
 
 class WeatherStates(StatesGroup):
     '''
     Represents a group of states for requesting weather.
     '''
     locality = State()
+    subscription_locality = State()
+    subscription_time = State()
 
 class CurrenciesStates(StatesGroup):
     '''
@@ -28,3 +32,30 @@ class PollStates(StatesGroup):
     group_chat = State()
     question = State()
     answer = State()
+
+# States and data fields of the dialogs are encoded by their positions, so new ones may only be
+# appended to the lists
+SCHEMA = codec.Schema(
+    states=[
+        WeatherStates.locality.state,
+        CurrenciesStates.from_currency.state,
+        CurrenciesStates.to_currency.state,
+        CurrenciesStates.amount.state,
+        PollStates.group_chat.state,
+        PollStates.question.state,
+        PollStates.answer.state,
+        WeatherStates.subscription_locality.state,
+        WeatherStates.subscription_time.state,
+    ],
+    fields=[
+        ('locality', codec.FIELD_STR),
+        ('from_currency', codec.FIELD_STR),
+        ('to_currency', codec.FIELD_STR),
+        ('amount', codec.FIELD_FLOAT),
+        ('group_chat_id', codec.FIELD_STR),
+        ('question', codec.FIELD_STR),
+        ('answers', codec.FIELD_STR_LIST),
+        ('city_id', codec.FIELD_INT),
+        ('timezone', codec.FIELD_INT),
+    ]
+)
@@ -0,0 +1,155 @@
+'''
+Represents scheduled delivery of subscriptions grouped by localities.
+'''
+import asyncio
+import collections
+import logging
+import time
+import typing
+
+from . import store
+
+
+logger = logging.getLogger(__name__)
+
+FetchType = typing.Callable[[list[store.Subscription]], typing.Awaitable[dict[str, typing.Any]]]
+SendType = typing.Callable[[store.Subscription, typing.Any], typing.Awaitable[bool]]
+
+def group_by_key(
+        subscriptions: list[store.Subscription]
+    ) -> dict[str, list[store.Subscription]]:
+    '''
+    Returns subscriptions grouped by their locality keys.
+    '''
+    groups = collections.defaultdict(list)
+    for subscription in subscriptions:
+        groups[subscription.key].append(subscription)
+    return dict(groups)
+
+class Delivery:
+    '''
+    Represents a background task delivering subscriptions of 'subscription_store'
+    ('store.SubscriptionStore') every 'interval' seconds. All subscriptions due since the previous
+    run (up to 'batch_size' at once) are grouped by localities, and 'fetch' is awaited once with
+    one subscription of every locality; it returns the data to deliver by locality keys (absent
+    keys aren't delivered). Then 'send' is awaited for every subscription with the data of its
+    locality; it returns False if the subscription has to be removed (e.g. the bot is blocked).
+    Deliveries that have failed (no data has been fetched or 'send' has raised an exception) are
+    retried 'retry_delay' seconds later. Deliveries late for more than 'max_delay' seconds (e.g.
+    the bot has been stopped) are skipped.
+    '''
+    def __init__(
+            self,
+            subscription_store: store.SubscriptionStore,
+            fetch: FetchType,
+            send: SendType,
+            interval: int|float = 60,
+            batch_size: int = 1000,
+            max_delay: int|float = 3600,
+            retry_delay: int = 300
+        ):
+        self.store = subscription_store
+        self.fetch = fetch
+        self.send = send
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.delivered = 0
+        self.localities_fetched = 0
+        self.failed = 0
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self, now: float | None = None) -> int:
+        '''
+        Delivers all subscriptions due by 'now'. Returns the number of delivered subscriptions.
+        '''
+        now = time.time() if now is None else now
+        delivered = 0
+        while True:
+            due = await self.store.take_due(self.batch_size, now, lease=self.retry_delay)
+            late = [(subscription, due_at) for subscription, due_at in due
+                    if now - due_at > self.max_delay]
+            if late:
+                await self.store.complete(late, now)
+            subscriptions = {
+                subscription.member: (subscription, due_at)
+                for subscription, due_at in due if now - due_at <= self.max_delay
+            }
+            if subscriptions:
+                delivered += await self._deliver(subscriptions, now)
+            if len(due) < self.batch_size:
+                return delivered
+
+    async def _deliver(
+            self,
+            subscriptions: dict[str, tuple[store.Subscription, int]],
+            now: float
+        ) -> int:
+        '''
+        Delivers subscriptions (pairs of a subscription and its scheduled time by members) and
+        completes the successful deliveries; the others are left to be retried.
+        '''
+        groups = group_by_key([subscription for subscription, _ in subscriptions.values()])
+        try:
+            data_by_keys = await self.fetch([group[0] for group in groups.values()])
+        except Exception as error:
+            logger.warning('Data of subscriptions has not been fetched: %r', error)
+            data_by_keys = {}
+        self.localities_fetched += len(groups)
+
+        deliveries = [
+            (subscription, data_by_keys[key])
+            for key, group in groups.items() if key in data_by_keys
+            for subscription in group
+        ]
+        results = await asyncio.gather(
+            *[self.send(subscription, data) for subscription, data in deliveries],
+            return_exceptions=True
+        )
+        delivered = removed = 0
+        completed = []
+        for (subscription, _), result in zip(deliveries, results):
+            if isinstance(result, Exception):
+                logger.warning('Subscription of chat %s has not been delivered: %r',
+                               subscription.chat_id, result)
+                continue
+            if result:
+                delivered += 1
+                completed.append(subscriptions[subscription.member])
+            else:
+                await self.store.remove_chat(subscription.chat_id)
+                removed += 1
+        await self.store.complete(completed, now)
+        self.delivered += delivered
+        self.failed += len(subscriptions) - delivered - removed
+        return delivered
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Subscriptions have not been delivered.')
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        '''
+        Starts the background task delivering subscriptions.
+        '''
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        '''
+        Stops the background task.
+        '''
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
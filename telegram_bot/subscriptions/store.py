@@ -0,0 +1,218 @@
+'''
+Represents daily weather subscriptions kept in Redis and scheduled by delivery time.
+'''
+import json
+import re
+import time
+
+import redis.asyncio as redis
+
+
+DAY = 86400
+
+# Takes subscriptions due by ARGV[1] (up to ARGV[2] of them) and leases them for ARGV[3] seconds
+# atomically, so every delivery is taken by one bot replica only and is taken again if it isn't
+# completed in time. The scheduled time of a leased subscription is kept in hash KEYS[3].
+# Returns pairs of subscription data and scheduled times.
+TAKE_DUE_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local lease = tonumber(ARGV[3])
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+local result = {}
+for index = 1, #due, 2 do
+    local member = due[index]
+    local data = redis.call('HGET', KEYS[2], member)
+    if data then
+        local scheduled_at = redis.call('HGET', KEYS[3], member) or due[index + 1]
+        redis.call('HSET', KEYS[3], member, scheduled_at)
+        redis.call('ZADD', KEYS[1], now + lease, member)
+        table.insert(result, data)
+        table.insert(result, scheduled_at)
+    else
+        redis.call('ZREM', KEYS[1], member)
+        redis.call('HDEL', KEYS[3], member)
+    end
+end
+return result
+'''
+
+# Completes deliveries of leased subscriptions (pairs of a member and a scheduled time in ARGV
+# from the third one): every subscription is moved to the first moment after ARGV[1] that is
+# a whole number of periods ARGV[2] after its scheduled time. Subscriptions replaced or removed
+# meanwhile aren't leased anymore and are left as they are.
+COMPLETE_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+for index = 3, #ARGV, 2 do
+    local member = ARGV[index]
+    local scheduled_at = tonumber(ARGV[index + 1])
+    if redis.call('HDEL', KEYS[2], member) == 1 then
+        local next_due_at = scheduled_at + period * (math.floor((now - scheduled_at) / period) + 1)
+        redis.call('ZADD', KEYS[1], 'XX', next_due_at, member)
+    end
+end
+return 0
+'''
+
+def parse_time_of_day(text: str) -> int | None:
+    '''
+    Parses a time of day like "7:30" or "07:30". Returns the number of minutes since midnight or
+    None if 'text' isn't a time of day.
+    '''
+    match = re.fullmatch(r'\s*([01]?\d|2[0-3])[:.]([0-5]\d)\s*', text)
+    if match is None:
+        return None
+    return int(match[1]) * 60 + int(match[2])
+
+def get_next_delivery_time(minutes: int, timezone: int, now: float | None = None) -> int:
+    '''
+    Returns UNIX time of the next moment after 'now' when local time in a time zone shifted from
+    UTC by 'timezone' seconds is 'minutes' since midnight.
+    '''
+    now = int(time.time() if now is None else now)
+    local_now = now + timezone
+    delivery_time = local_now - local_now % DAY + minutes * 60 - timezone
+    if delivery_time <= now:
+        delivery_time += DAY
+    return delivery_time
+
+class Subscription:
+    '''
+    Represents a subscription of chat 'chat_id' to weather in locality 'locality' every day at
+    'minutes' since midnight of local time in a time zone shifted by 'timezone' seconds. 'key'
+    identifies the locality (e.g. the weather cache key), so a chat has one subscription to
+    a locality and subscriptions are grouped by localities on delivery. 'city_id' is the city ID
+    of the locality if it's known.
+    '''
+    def __init__(
+            self,
+            chat_id: int,
+            key: str,
+            locality: str,
+            minutes: int,
+            timezone: int = 0,
+            city_id: int | None = None
+        ):
+        self.chat_id = chat_id
+        self.key = key
+        self.locality = locality
+        self.minutes = minutes
+        self.timezone = timezone
+        self.city_id = city_id
+
+    @property
+    def member(self) -> str:
+        return f'{self.chat_id}:{self.key}'
+
+    def dumps(self) -> str:
+        return json.dumps({
+            'chat_id': self.chat_id,
+            'key': self.key,
+            'locality': self.locality,
+            'minutes': self.minutes,
+            'timezone': self.timezone,
+            'city_id': self.city_id,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> 'Subscription':
+        return cls(**json.loads(raw))
+
+class SubscriptionStore:
+    '''
+    Represents subscriptions kept in Redis: a hash 'prefix:data' keeps subscriptions, a sorted set
+    'prefix:due' orders them by the next delivery time and a set 'prefix:chat:<chat ID>' keeps
+    subscriptions of a chat. Taken subscriptions are leased: a hash 'prefix:leases' keeps their
+    scheduled times until their deliveries are completed.
+    '''
+    def __init__(self, ds: redis.Redis, prefix: str = 'subscriptions'):
+        self.ds = ds
+        self.prefix = prefix
+        self._take_due = ds.register_script(TAKE_DUE_SCRIPT)
+        self._complete = ds.register_script(COMPLETE_SCRIPT)
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(map(str, parts)))
+
+    async def add(self, subscription: Subscription, now: float | None = None):
+        '''
+        Adds a subscription or replaces the subscription of the chat to the same locality.
+        '''
+        due_at = get_next_delivery_time(subscription.minutes, subscription.timezone, now)
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.hset(self.generate_key('data'), subscription.member, subscription.dumps())
+            pipe.zadd(self.generate_key('due'), {subscription.member: due_at})
+            pipe.hdel(self.generate_key('leases'), subscription.member)
+            pipe.sadd(self.generate_key('chat', subscription.chat_id), subscription.member)
+            await pipe.execute()
+
+    async def get_chat_subscriptions(self, chat_id: int) -> list[Subscription]:
+        members = await self.ds.smembers(self.generate_key('chat', chat_id))
+        if not members:
+            return []
+        raw_subscriptions = await self.ds.hmget(self.generate_key('data'), *members)
+        return [Subscription.loads(raw) for raw in raw_subscriptions if raw is not None]
+
+    async def remove_chat(self, chat_id: int) -> int:
+        '''
+        Removes all subscriptions of a chat. Returns their number.
+        '''
+        chat_key = self.generate_key('chat', chat_id)
+        members = await self.ds.smembers(chat_key)
+        if not members:
+            return 0
+        async with self.ds.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.generate_key('data'), *members)
+            pipe.zrem(self.generate_key('due'), *members)
+            pipe.hdel(self.generate_key('leases'), *members)
+            pipe.delete(chat_key)
+            await pipe.execute()
+        return len(members)
+
+    async def count(self) -> int:
+        return await self.ds.zcard(self.generate_key('due'))
+
+    async def take_due(
+            self,
+            limit: int,
+            now: float | None = None,
+            lease: int = 300
+        ) -> list[tuple[Subscription, int]]:
+        '''
+        Takes up to 'limit' subscriptions due by 'now' for 'lease' seconds: unless their
+        deliveries are completed by 'complete' in time, they're taken again. Returns pairs of
+        subscriptions and their scheduled times.
+        '''
+        now = int(time.time() if now is None else now)
+        result = await self._take_due(
+            keys=[
+                self.generate_key('due'),
+                self.generate_key('data'),
+                self.generate_key('leases'),
+            ],
+            args=[now, limit, lease]
+        )
+        return [
+            (Subscription.loads(result[index]), int(result[index + 1]))
+            for index in range(0, len(result), 2)
+        ]
+
+    async def complete(
+            self,
+            due: list[tuple[Subscription, int]],
+            now: float | None = None
+        ):
+        '''
+        Schedules the next deliveries of taken subscriptions 'due' (pairs of subscriptions and
+        their scheduled times).
+        '''
+        if not due:
+            return
+        now = int(time.time() if now is None else now)
+        args = [now, DAY]
+        for subscription, scheduled_at in due:
+            args.extend((subscription.member, scheduled_at))
+        await self._complete(
+            keys=[self.generate_key('due'), self.generate_key('leases')],
+            args=args
+        )
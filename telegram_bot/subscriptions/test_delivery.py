@@ -0,0 +1,127 @@
+'''
+Tests 'delivery' module.
+'''
+import asyncio
+
+from . import delivery
+from . import store
+
+
+class MemoryStore:
+    '''
+    Represents a subscription store kept in memory. Taken subscriptions are leased until their
+    deliveries are completed.
+    '''
+    def __init__(self, due: list[tuple[store.Subscription, int]]):
+        self.due = [(subscription, due_at, due_at) for subscription, due_at in due]
+        self.completed = []
+        self.removed_chat_ids = []
+
+    async def take_due(
+            self,
+            limit: int,
+            now: float,
+            lease: int = 300
+        ) -> list[tuple[store.Subscription, int]]:
+        taken = [item for item in self.due if item[2] <= now][:limit]
+        self.due = [item for item in self.due if item not in taken] + [
+            (subscription, due_at, now + lease) for subscription, due_at, _ in taken
+        ]
+        return [(subscription, due_at) for subscription, due_at, _ in taken]
+
+    async def complete(self, due: list[tuple[store.Subscription, int]], now: float):
+        members = {subscription.member for subscription, _ in due}
+        self.due = [item for item in self.due if item[0].member not in members]
+        self.completed.extend(sorted(subscription.chat_id for subscription, _ in due))
+
+    async def remove_chat(self, chat_id: int) -> int:
+        self.removed_chat_ids.append(chat_id)
+        self.due = [item for item in self.due if item[0].chat_id != chat_id]
+        return 1
+
+def test_delivery_groups_by_locality():
+    '''
+    Tests that every locality is fetched once however many subscribers it has.
+    '''
+    now = 1700000000
+    subscriptions = [
+        store.Subscription(chat_id, key, key, 0)
+        for chat_id, key in ((1, 'city:1'), (2, 'city:1'), (3, 'city:2'), (4, 'london'),
+                             (5, 'city:1'), (6, 'nowhere'))
+    ]
+    # The last subscription is late for too long
+    late_subscription = store.Subscription(7, 'city:1', 'city:1', 0)
+    memory_store = MemoryStore(
+        [(subscription, now - 10) for subscription in subscriptions]
+        + [(late_subscription, now - 7200)]
+    )
+    fetched_keys = []
+    sent = []
+
+    async def fetch(subscriptions: list[store.Subscription]) -> dict[str, str]:
+        fetched_keys.append(sorted(subscription.key for subscription in subscriptions))
+        return {
+            subscription.key: f'weather in {subscription.key}'
+            for subscription in subscriptions if subscription.key != 'nowhere'
+        }
+
+    async def send(subscription: store.Subscription, weather: str) -> bool:
+        sent.append((subscription.chat_id, weather))
+        # The bot is blocked in chat 3
+        return subscription.chat_id != 3
+
+    subscription_delivery = delivery.Delivery(
+        memory_store,
+        fetch,
+        send,
+        batch_size=4,
+        max_delay=3600
+    )
+    assert asyncio.run(subscription_delivery.run_once(now)) == 4
+    assert fetched_keys == [['city:1', 'city:2', 'london'], ['city:1', 'nowhere']]
+    assert sorted(sent) == [
+        (1, 'weather in city:1'),
+        (2, 'weather in city:1'),
+        (3, 'weather in city:2'),
+        (4, 'weather in london'),
+        (5, 'weather in city:1'),
+    ]
+    assert memory_store.removed_chat_ids == [3]
+    # The late subscription is skipped, the one without weather is left to be retried
+    assert sorted(memory_store.completed) == [1, 2, 4, 5, 7]
+    assert [item[0].chat_id for item in memory_store.due] == [6]
+    assert subscription_delivery.failed == 1
+
+def test_delivery_retries_failures():
+    '''
+    Tests that failed deliveries are retried after the retry delay.
+    '''
+    now = 1700000000
+    memory_store = MemoryStore([
+        (store.Subscription(chat_id, 'city:1', 'city:1', 0), now - 10) for chat_id in (1, 2)
+    ])
+    fetch_errors = [ConnectionError()]
+    sent = []
+
+    async def fetch(subscriptions: list[store.Subscription]) -> dict[str, str]:
+        if fetch_errors:
+            raise fetch_errors.pop()
+        return {subscription.key: 'weather' for subscription in subscriptions}
+
+    async def send(subscription: store.Subscription, weather: str) -> bool:
+        if subscription.chat_id == 2 and not sent:
+            sent.append(None)
+            raise TimeoutError()
+        return True
+
+    subscription_delivery = delivery.Delivery(memory_store, fetch, send, retry_delay=300)
+    assert asyncio.run(subscription_delivery.run_once(now)) == 0
+    assert asyncio.run(subscription_delivery.run_once(now + 60)) == 0
+
+    # After the retry delay the fetch succeeds, but sending to chat 2 fails once more
+    assert asyncio.run(subscription_delivery.run_once(now + 300)) == 1
+    assert memory_store.completed == [1]
+    assert asyncio.run(subscription_delivery.run_once(now + 600)) == 1
+    assert memory_store.completed == [1, 2]
+    assert memory_store.due == []
+    assert subscription_delivery.failed == 3
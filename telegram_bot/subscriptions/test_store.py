@@ -0,0 +1,33 @@
+'''
+Tests 'store' module.
+'''
+from . import store
+
+
+def test_parse_time_of_day():
+    '''
+    Tests parsing of times of day.
+    '''
+    assert store.parse_time_of_day('7:30') == 450
+    assert store.parse_time_of_day(' 23.05 ') == 1385
+    assert store.parse_time_of_day('00:00') == 0
+    for text in ('24:00', '7:60', '7', 'morning'):
+        assert store.parse_time_of_day(text) is None
+
+def test_get_next_delivery_time():
+    '''
+    Tests scheduling of deliveries in local time.
+    '''
+    midnight = 1700006400 # 2023-11-15 00:00 UTC
+    # Later today
+    assert store.get_next_delivery_time(8 * 60, 0, midnight + 3600) == midnight + 8 * 3600
+    # Tomorrow since it's already past 8:00
+    assert store.get_next_delivery_time(8 * 60, 0, midnight + 9 * 3600) == (
+        midnight + store.DAY + 8 * 3600
+    )
+    # 8:00 in UTC+3 is 5:00 UTC
+    assert store.get_next_delivery_time(8 * 60, 3 * 3600, midnight) == midnight + 5 * 3600
+    # 8:00 in UTC-5 is 13:00 UTC of the same day
+    assert store.get_next_delivery_time(8 * 60, -5 * 3600, midnight + 3600) == (
+        midnight + 13 * 3600
+    )
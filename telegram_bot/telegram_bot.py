@@ -1,25 +1,74 @@
+import asyncio
+import hashlib
+import itertools
 import logging
+import re
 import redis.asyncio as redis
 from aiogram import (
-    Bot,
     Dispatcher,
     executor,
     types,
 )
-from aiogram.contrib.fsm_storage.redis import RedisStorage2
 from aiogram.dispatcher import FSMContext
 from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
 )
+from aiogram.utils.exceptions import (
+    BadRequest,
+    ChatNotFound,
+    InvalidQueryID,
+    TelegramAPIError,
+    Unauthorized,
+)
 from aiohttp import ClientError
 
-from weather import openweather
-from exchangerates import exchangerates
-from images import giphy
+from weather import (
+    geoindex,
+    openweather,
+)
+from exchangerates import (
+    alerts,
+    batch,
+    exchangerates,
+    ratetable,
+)
+from chats import registry
+from fsm import storage as fsm_storage
+from inline import debounce
+from images import (
+    fileids,
+    giphy,
+    pool,
+)
+from metrics import (
+    middleware,
+    registry as metrics_registry,
+    server as metrics_server,
+    tracing,
+)
+from middlewares import (
+    backpressure,
+    membership,
+)
+from outbound import scheduler
+from polls import drafts
+from subscriptions import (
+    delivery,
+    store,
+)
+from webhook import server
+from upstream import (
+    breaker,
+    cache,
+    client,
+    ratelimit,
+    singleflight,
+)
 import keys
 import settings
 import messages
+import datastorage
 import states
 
 
@@ -34,13 +83,364 @@ logging.basicConfig(level=logging.INFO)
 #################################### Initialize bot and dispatcher #################################
 ####################################################################################################
 
-bot = Bot(token=keys.TELEGRAM_BOT_API_TOKEN)
-bot_ds = RedisStorage2(
+metrics = metrics_registry.Registry()
+bot = scheduler.ScheduledBot(token=keys.TELEGRAM_BOT_API_TOKEN)
+bot.scheduler = scheduler.SendScheduler(
+    bot.send_request,
+    rate=settings.SEND_RATE,
+    burst=settings.SEND_BURST,
+    chat_rate=settings.SEND_CHAT_RATE,
+    chat_burst=settings.SEND_CHAT_BURST,
+    group_chat_rate=settings.SEND_GROUP_CHAT_RATE,
+    group_chat_burst=settings.SEND_GROUP_CHAT_BURST,
+    attempts=settings.SEND_ATTEMPTS
+)
+data_storage = datastorage.DataStorage(
     settings.DATA_STORAGE_HOST,
     db=settings.DATA_STORAGE_BOT_DB,
-    prefix=settings.DATA_STORAGE_BOT_PREFIX
+    max_connections=settings.DATA_STORAGE_POOL_SIZE,
+    pool_timeout=settings.DATA_STORAGE_POOL_TIMEOUT,
+    health_check_interval=settings.DATA_STORAGE_HEALTH_CHECK_INTERVAL,
+    socket_timeout=settings.DATA_STORAGE_SOCKET_TIMEOUT
+)
+bot_ds = fsm_storage.CompactRedisStorage(
+    prefix=settings.DATA_STORAGE_BOT_PREFIX,
+    connection_pool=data_storage.pool,
+    schema=states.SCHEMA,
+    idle_ttl=settings.DATA_STORAGE_FSM_IDLE_TTL
 )
 dp = Dispatcher(bot, storage=bot_ds)
+backpressure_middleware = backpressure.BackpressureMiddleware(
+    concurrency=settings.HANDLERS_CONCURRENCY,
+    user_concurrency=settings.HANDLERS_USER_CONCURRENCY,
+    user_queue_size=settings.HANDLERS_USER_QUEUE_SIZE,
+    policies=settings.HANDLERS_OVERFLOW_POLICIES,
+    busy_text=messages.BUSY
+)
+dp.middleware.setup(backpressure_middleware)
+dp.middleware.setup(middleware.HandlerMetricsMiddleware(metrics))
+http_client = client.HttpClient(
+    limit=settings.HTTP_CONNECTIONS_LIMIT,
+    limit_per_host=settings.HTTP_CONNECTIONS_LIMIT_PER_HOST,
+    keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=settings.HTTP_DNS_CACHE_TTL,
+    timeout_total=settings.HTTP_TIMEOUT_TOTAL,
+    timeout_connect=settings.HTTP_TIMEOUT_CONNECT,
+    timeout_sock_read=settings.HTTP_TIMEOUT_SOCK_READ,
+    trace_configs=[tracing.create_trace_config(metrics)]
+)
+chat_registry = registry.ChatRegistry(
+    data_storage.redis,
+    prefix=settings.DATA_STORAGE_CHAT_LIST_PREFIX,
+    page_size=settings.DATA_STORAGE_CHAT_LIST_PAGE_SIZE
+)
+dp.middleware.setup(membership.MembershipMiddleware(chat_registry))
+poll_drafts = drafts.PollDrafts(
+    data_storage.redis,
+    prefix=settings.DATA_STORAGE_POLL_DRAFTS_PREFIX,
+    ttl=settings.POLL_DRAFT_TTL
+)
+weather_cache = cache.Cache(
+    data_storage.redis,
+    settings.WEATHER_CACHE_PREFIX,
+    lru_size=settings.WEATHER_CACHE_LRU_SIZE
+)
+city_index = geoindex.CityIndex(settings.WEATHER_CITY_INDEX_PATH)
+subscription_store = store.SubscriptionStore(
+    data_storage.redis,
+    prefix=settings.SUBSCRIPTIONS_PREFIX
+)
+
+def create_breaker(name: str, service_exception: type[Exception]) -> breaker.CircuitBreaker:
+    '''
+    Creates a circuit breaker of upstream service 'name'. 'service_exception' is raised by the
+    service module when the service has failed; the breaker raises it while it's open too.
+    '''
+    return breaker.CircuitBreaker(
+        name,
+        service_exception,
+        failure_exceptions=(service_exception, ClientError, asyncio.TimeoutError),
+        window_size=settings.BREAKER_WINDOW_SIZE,
+        min_calls=settings.BREAKER_MIN_CALLS,
+        failure_rate=settings.BREAKER_FAILURE_RATE,
+        slow_call_duration=settings.BREAKER_SLOW_CALL_DURATION,
+        open_timeout=settings.BREAKER_OPEN_TIMEOUT,
+        half_open_calls=settings.BREAKER_HALF_OPEN_CALLS,
+        attempts=settings.RETRY_ATTEMPTS,
+        base_delay=settings.RETRY_BASE_DELAY,
+        max_delay=settings.RETRY_MAX_DELAY,
+        deadline=settings.RETRY_DEADLINE
+    )
+
+weather_breaker = create_breaker('OpenWeather', openweather.ServiceUnavailable)
+currency_breaker = create_breaker('ExchangeRates', exchangerates.ServiceUnavailable)
+image_breaker = create_breaker('Giphy', giphy.ServiceUnavailable)
+
+def create_limiter(
+        name: str,
+        service_exception: type[Exception],
+        rate: int|float,
+        burst: int,
+        monthly_budget: int
+    ) -> ratelimit.RateLimiter:
+    '''
+    Creates a rate limiter of upstream service 'name' shared by all bot replicas.
+    'service_exception' is raised when the rate limit or the monthly budget is exceeded.
+    '''
+    return ratelimit.RateLimiter(
+        data_storage.redis,
+        name,
+        service_exception,
+        rate=rate,
+        burst=burst,
+        monthly_budget=monthly_budget,
+        max_wait=settings.RATE_LIMIT_MAX_WAIT,
+        prefix=settings.RATE_LIMIT_PREFIX
+    )
+
+weather_limiter = create_limiter(
+    'OpenWeather',
+    openweather.ServiceUnavailable,
+    settings.WEATHER_RATE_LIMIT,
+    settings.WEATHER_RATE_BURST,
+    settings.WEATHER_MONTHLY_BUDGET
+)
+currency_limiter = create_limiter(
+    'ExchangeRates',
+    exchangerates.ServiceUnavailable,
+    settings.EXCHANGE_RATES_RATE_LIMIT,
+    settings.EXCHANGE_RATES_RATE_BURST,
+    settings.EXCHANGE_RATES_MONTHLY_BUDGET
+)
+image_limiter = create_limiter(
+    'Giphy',
+    giphy.ServiceUnavailable,
+    settings.IMAGES_RATE_LIMIT,
+    settings.IMAGES_RATE_BURST,
+    settings.IMAGES_MONTHLY_BUDGET
+)
+weather_flight = singleflight.SingleFlight(
+    data_storage.redis,
+    settings.WEATHER_FLIGHT_PREFIX,
+    shared_exceptions=(
+        openweather.UnknownLocality,
+        openweather.ServiceUnavailable,
+        openweather.AccessDenied
+    ),
+    lock_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+    wait_timeout=settings.SINGLE_FLIGHT_WAIT_TIMEOUT,
+    result_ttl=settings.SINGLE_FLIGHT_RESULT_TTL,
+    poll_interval=settings.SINGLE_FLIGHT_POLL_INTERVAL
+)
+currency_flight = singleflight.SingleFlight(
+    data_storage.redis,
+    settings.EXCHANGE_RATES_FLIGHT_PREFIX,
+    shared_exceptions=(
+        exchangerates.ConversionError,
+        exchangerates.ServiceUnavailable,
+        exchangerates.AccessDenied
+    ),
+    lock_timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+    wait_timeout=settings.SINGLE_FLIGHT_WAIT_TIMEOUT,
+    result_ttl=settings.SINGLE_FLIGHT_RESULT_TTL,
+    poll_interval=settings.SINGLE_FLIGHT_POLL_INTERVAL
+)
+rate_table = ratetable.RateTable(
+    data_storage.redis,
+    settings.EXCHANGE_RATES_PREFIX,
+    settings.EXCHANGE_RATES_BASE,
+    keys.EXCHANGE_RATES_API_KEY,
+    refresh_interval=settings.EXCHANGE_RATES_REFRESH_INTERVAL,
+    reload_interval=settings.EXCHANGE_RATES_RELOAD_INTERVAL,
+    max_age=settings.EXCHANGE_RATES_MAX_AGE,
+    breaker=currency_breaker,
+    limiter=currency_limiter
+)
+file_ids = fileids.FileIdCache(data_storage.redis, settings.IMAGES_FILE_IDS_KEY)
+image_pool = pool.ImagePool(
+    keys.GIPHY_API_KEY,
+    settings.IMAGES_POOL_TAGS,
+    size=settings.IMAGES_POOL_SIZE,
+    concurrency=settings.IMAGES_POOL_CONCURRENCY,
+    retry_interval=settings.IMAGES_POOL_RETRY_INTERVAL,
+    file_ids=file_ids,
+    download_mode=settings.IMAGES_DOWNLOAD_MODE,
+    max_size=settings.IMAGES_MAX_SIZE,
+    spool_size=settings.IMAGES_SPOOL_SIZE,
+    chunk_size=settings.IMAGES_DOWNLOAD_CHUNK_SIZE,
+    breaker=image_breaker,
+    limiter=image_limiter
+)
+
+
+####################################################################################################
+############################################## Metrics #############################################
+####################################################################################################
+
+def register_metrics():
+    '''
+    Registers metrics collected from the state of shared components on each scrape.
+    '''
+    updates_stats = backpressure_middleware.stats
+    metrics.gauge(
+        'bot_updates_in_flight',
+        'Updates being processed.',
+        function=lambda: updates_stats()['in_flight']
+    )
+    metrics.gauge(
+        'bot_updates_queued',
+        'Updates waiting for their turn to be processed.',
+        function=lambda: updates_stats()['queued']
+    )
+    metrics.counter(
+        'bot_update_overflows_total',
+        'Updates that have exceeded the per-user limit by overflow policies.',
+        ('policy',),
+        function=lambda: {
+            (policy,): number for policy, number in backpressure_middleware.overflows.items()
+        }
+    )
+    metrics.gauge(
+        'bot_outbound_queued',
+        'Outbound requests waiting for the flood limits.',
+        function=bot.scheduler.qsize
+    )
+
+    breakers = (weather_breaker, currency_breaker, image_breaker)
+    metrics.gauge(
+        'upstream_breaker_open',
+        'Whether the circuit breaker of a service is open (1), half-open (0.5) or closed (0).',
+        ('service',),
+        function=lambda: {
+            (item.name,): {breaker.STATE_OPEN: 1, breaker.STATE_HALF_OPEN: 0.5}.get(item.state, 0)
+            for item in breakers
+        }
+    )
+    metrics.counter(
+        'upstream_breaker_opened_total',
+        'Times the circuit breaker of a service has opened.',
+        ('service',),
+        function=lambda: {(item.name,): item.opened_number for item in breakers}
+    )
+    metrics.counter(
+        'upstream_cache_requests_total',
+        'Lookups of the weather cache by results.',
+        ('cache', 'result'),
+        function=lambda: {
+            ('weather', result): number for result, number in weather_cache.stats().items()
+        }
+    )
+    metrics.counter(
+        'bot_subscriptions_delivered_total',
+        'Weather subscriptions delivered.',
+        function=lambda: subscription_delivery.delivered
+    )
+    metrics.counter(
+        'bot_subscriptions_failed_total',
+        'Weather subscription deliveries failed and left to be retried.',
+        function=lambda: subscription_delivery.failed
+    )
+    metrics.counter(
+        'bot_subscription_localities_fetched_total',
+        'Distinct localities fetched for delivered weather subscriptions.',
+        function=lambda: subscription_delivery.localities_fetched
+    )
+    metrics.counter(
+        'bot_rate_alerts_triggered_total',
+        'Rate alerts crossed by snapshots of rates.',
+        function=lambda: alert_monitor.triggered
+    )
+    metrics.counter(
+        'bot_rate_alerts_delivered_total',
+        'Rate alerts delivered.',
+        function=lambda: alert_monitor.delivered
+    )
+    metrics.counter(
+        'bot_rate_alerts_failed_total',
+        'Rate alert deliveries failed and left to be retried.',
+        function=lambda: alert_monitor.failed
+    )
+    metrics.counter(
+        'bot_inline_queries_superseded_total',
+        'Inline queries superseded by newer queries of the same users.',
+        function=lambda: inline_debouncer.superseded
+    )
+    metrics.gauge(
+        'upstream_image_pool_size',
+        'Ready-to-send images by tags.',
+        ('tag',),
+        function=lambda: {(tag,): image_pool.qsize(tag) for tag in image_pool.tags}
+    )
+    metrics.counter(
+        'redis_round_trips_total',
+        'Round-trips to the Redis data storage.',
+        function=lambda: data_storage.pool.round_trips
+    )
+    metrics.counter(
+        'redis_pool_wait_seconds_total',
+        'Time spent getting connections from the Redis connection pool.',
+        function=lambda: data_storage.pool.wait_time
+    )
+
+register_metrics()
+metrics_server_app = metrics_server.MetricsServer(
+    metrics,
+    host=settings.METRICS_HOST,
+    port=settings.METRICS_PORT
+)
+
+
+####################################################################################################
+########################################## Lifecycle hooks #########################################
+####################################################################################################
+
+async def on_startup(dp: Dispatcher):
+    '''
+    Prepares shared resources before the bot starts processing updates.
+    '''
+    await data_storage.start()
+    await http_client.start()
+    if settings.METRICS_ENABLED:
+        await metrics_server_app.start()
+
+    # Move group chats kept by the previous versions of the bot
+    legacy_chat_list_ds = redis.Redis(
+        host=settings.DATA_STORAGE_HOST,
+        db=settings.DATA_STORAGE_LEGACY_CHAT_LIST_DB
+    )
+    try:
+        await chat_registry.import_legacy_chats(legacy_chat_list_ds)
+    finally:
+        await legacy_chat_list_ds.close()
+
+    if settings.BOT_MODE == 'webhook':
+        await bot.set_webhook(
+            settings.WEBHOOK_HOST + settings.WEBHOOK_PATH,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=types.AllowedUpdates.all(),
+            secret_token=keys.WEBHOOK_SECRET_TOKEN or None
+        )
+    await bot.scheduler.start()
+    await rate_table.start(http_client.session)
+    await image_pool.start(http_client.session)
+    await subscription_delivery.start()
+    await alert_monitor.start()
+
+async def on_shutdown(dp: Dispatcher):
+    '''
+    Releases shared resources after the bot has stopped processing updates.
+    '''
+    await subscription_delivery.close()
+    await alert_monitor.close()
+    await rate_table.close()
+    await image_pool.close()
+    await bot.scheduler.close(timeout=settings.SEND_CLOSE_TIMEOUT)
+    await http_client.close()
+    await metrics_server_app.close()
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    await data_storage.close()
+    city_index.close()
 
 
 ####################################################################################################
@@ -61,13 +461,29 @@ async def cancel(message: types.Message, state: FSMContext):
     await state.finish()
     await message.answer(messages.MENU)
 
+@dp.message_handler(
+    lambda message: message.get_args(),
+    state='*',
+    commands=['weather', 'currencies']
+)
+async def one_shot_command(message: types.Message):
+    '''
+    Answers a command given with arguments like "/weather London" at once without a dialog. It's
+    registered before the dialog handlers, so the FSM storage isn't touched: filters of handlers
+    of particular states read the current state.
+    '''
+    if message.get_command(pure=True).lower() == 'weather':
+        await weather_start(message)
+    else:
+        await currencies_start(message)
+
 @dp.message_handler(commands=['start'])
 async def start(message: types.Message):
     '''
     Welcomes a user and outputs the menu.
     '''
-    await message.answer(messages.WELCOME)
-    await message.answer(messages.MENU)
+    # Queue both messages at once, so they're merged into one
+    await asyncio.gather(message.answer(messages.WELCOME), message.answer(messages.MENU))
 
 @dp.message_handler(commands=['help'])
 async def start(message: types.Message):
@@ -81,11 +497,116 @@ async def start(message: types.Message):
 ######################################### Weather handlers #########################################
 ####################################################################################################
 
+def get_weather_key(locality_name: str, city: geoindex.City | None = None) -> str:
+    '''
+    Returns the key of weather in a locality with name 'locality_name' resolved to 'city' in the
+    weather cache.
+    '''
+    if city is not None:
+        return get_city_weather_key(city.city_id)
+    return openweather.normalize_locality_name(locality_name)
+
+def get_city_weather_key(city_id: int) -> str:
+    return f'city:{city_id}'
+
+def format_weather(locality_name: str, locality_weather: openweather.WeatherDataType) -> str:
+    '''
+    Returns weather information 'locality_weather' in a locality as a message text.
+    '''
+    return messages.WEATHER_WEATHER.format(
+        locality_name=locality_name,
+        temp_value=locality_weather['temp']['value'],
+        temp_units=locality_weather['temp']['units'],
+        pressure_value=locality_weather['pressure']['value'],
+        pressure_units=locality_weather['pressure']['units'],
+        humidity_value=locality_weather['humidity']['value'],
+        humidity_units=locality_weather['humidity']['units']
+    )
+
+async def get_locality_weather(
+        locality_name: str,
+        city: geoindex.City | None = None
+    ) -> openweather.WeatherDataType:
+    '''
+    Returns weather information in a locality with name 'locality_name' using the weather cache.
+    If the locality has been resolved to 'city' by the city index, the weather is requested and
+    cached by the city ID, so all names of the city share one entry. Unknown localities are
+    cached for a short time too. Concurrent requests for the same locality are coalesced into
+    one. If the service is unavailable or its quota is exhausted, recently expired weather
+    information is returned.
+    '''
+    key = get_weather_key(locality_name, city)
+    if city is not None:
+        fetch = lambda: openweather.get_city_weather(
+            city.city_id,
+            keys.OPENWEATHER_API_KEY,
+            session=http_client.session
+        )
+    else:
+        fetch = lambda: openweather.get_locality_weather(
+            locality_name,
+            keys.OPENWEATHER_API_KEY,
+            session=http_client.session
+        )
+    return await weather_cache.get_or_fetch(
+        key,
+        lambda: weather_flight.do(
+            key,
+            lambda: weather_breaker.call(fetch, acquire=weather_limiter.acquire)
+        ),
+        ttl=settings.WEATHER_CACHE_TTL,
+        negative_exceptions=(openweather.UnknownLocality,),
+        negative_ttl=settings.WEATHER_CACHE_NEGATIVE_TTL,
+        stale_exceptions=(openweather.ServiceUnavailable, ClientError, asyncio.TimeoutError),
+        stale_ttl=settings.WEATHER_CACHE_STALE_TTL
+    )
+
+async def answer_weather(message: types.Message, locality_name: str):
+    '''
+    Answers 'message' with weather in a locality with name 'locality_name' without a dialog. If the
+    locality isn't found, similar names from the city index are suggested.
+    '''
+    city, _ = city_index.lookup(locality_name)
+    if city is not None:
+        locality_name = city.title
+    try:
+        locality_weather = await get_locality_weather(locality_name, city)
+    except openweather.UnknownLocality:
+        suggestions = await asyncio.to_thread(
+            city_index.suggest,
+            geoindex.parse_query(locality_name)[0],
+            limit=settings.WEATHER_SUGGESTIONS_NUMBER
+        )
+        if suggestions:
+            await message.answer(messages.WEATHER_UNKNOWN_LOCALITY_SUGGESTIONS.format(
+                locality_name=locality_name,
+                suggestions=', '.join(suggestion.title for suggestion in suggestions)
+            ))
+        else:
+            await message.answer(
+                messages.WEATHER_UNKNOWN_LOCALITY.format(locality_name=locality_name)
+            )
+    except (
+        openweather.AccessDenied,
+        openweather.ServiceUnavailable,
+        ClientError,
+        asyncio.TimeoutError
+    ):
+        await message.answer(messages.SERVICE_UNAVAILABLE)
+    else:
+        await message.answer(format_weather(locality_name, locality_weather))
+
 @dp.message_handler(commands=['weather'])
 async def weather_start(message: types.Message):
     '''
-    Starts a dialog about weather.
+    Outputs weather in a locality given as a command argument like "/weather London" without
+    a dialog, otherwise starts a dialog about weather.
     '''
+    locality_name = message.get_args()
+    if locality_name:
+        await answer_weather(message, locality_name)
+        return
+
     # Set state
     await states.WeatherStates.locality.set()
 
@@ -100,45 +621,379 @@ async def weather_locality(message: types.Message, state: FSMContext):
     # Save locality
     locality_name = message.text
     async with state.proxy() as data:
+        is_repeated = data.get('locality') == locality_name
         data['locality'] = locality_name
 
+    # Resolve the locality by the city index. A name unknown to the index that looks like a typo
+    # is answered with suggestions at once unless the user insists on it by sending it again
+    city, is_known = city_index.lookup(locality_name)
+    if city is None and not is_known and not is_repeated:
+        suggestions = await asyncio.to_thread(
+            city_index.suggest,
+            geoindex.parse_query(locality_name)[0],
+            limit=settings.WEATHER_SUGGESTIONS_NUMBER
+        )
+        if suggestions:
+            await message.answer(messages.WEATHER_DID_YOU_MEAN.format(
+                locality_name=locality_name,
+                suggestions=', '.join(suggestion.title for suggestion in suggestions)
+            ))
+            return
+    if city is not None:
+        locality_name = city.title
+
     # Get and output weather information
     try:
         # Get weather information
-        locality_weather = await openweather.get_locality_weather(
-            locality_name,
-            keys.OPENWEATHER_API_KEY
-        )
+        locality_weather = await get_locality_weather(locality_name, city)
 
-        # Send the weather information to the user
-        await message.answer(messages.WEATHER_WEATHER.format(
-            locality_name=locality_name,
-            temp_value=locality_weather['temp']['value'],
-            temp_units=locality_weather['temp']['units'],
-            pressure_value=locality_weather['pressure']['value'],
-            pressure_units=locality_weather['pressure']['units'],
-            humidity_value=locality_weather['humidity']['value'],
-            humidity_units=locality_weather['humidity']['units']
-        ))
-        await message.answer(messages.WEATHER_ASK_ANOTHER_LOCALITY)
+        # Send the weather information to the user (both messages are queued at once, so they're
+        # merged into one)
+        await asyncio.gather(
+            message.answer(format_weather(locality_name, locality_weather)),
+            message.answer(messages.WEATHER_ASK_ANOTHER_LOCALITY)
+        )
     except openweather.UnknownLocality:
         # Given locality hasn't found
         await message.answer(messages.WEATHER_BAD_LOCALITY.format(locality_name=locality_name))
-    except (openweather.AccessDenied, openweather.ServiceUnavailable, ClientError):
+    except (
+        openweather.AccessDenied,
+        openweather.ServiceUnavailable,
+        ClientError,
+        asyncio.TimeoutError
+    ):
         # Some error has occured
         await message.answer(messages.SERVICE_UNAVAILABLE)
         await state.finish()
 
 
+####################################################################################################
+################################### Weather subscription handlers ##################################
+####################################################################################################
+
+async def get_cities_weather(city_ids: list[int]) -> dict[int, openweather.WeatherDataType]:
+    '''
+    Returns weather information in cities by their IDs using the weather cache. Cities absent in
+    the cache are requested from the service in groups, so a request covers up to
+    'openweather.GROUP_MAX_SIZE' cities. Cities which weather hasn't been received are absent.
+    '''
+    cities_weather = {}
+    missing_city_ids = []
+    for city_id in city_ids:
+        hit, locality_weather = await weather_cache.get_fresh_value(get_city_weather_key(city_id))
+        if hit:
+            cities_weather[city_id] = locality_weather
+        else:
+            missing_city_ids.append(city_id)
+
+    for start in range(0, len(missing_city_ids), openweather.GROUP_MAX_SIZE):
+        group = missing_city_ids[start:start + openweather.GROUP_MAX_SIZE]
+        try:
+            group_weather = await weather_breaker.call(
+                lambda: openweather.get_cities_weather(
+                    group,
+                    keys.OPENWEATHER_API_KEY,
+                    session=http_client.session
+                ),
+                acquire=weather_limiter.acquire
+            )
+        except (
+            openweather.AccessDenied,
+            openweather.ServiceUnavailable,
+            ClientError,
+            asyncio.TimeoutError
+        ) as error:
+            logging.warning('Weather in %s cities has not been received: %r', len(group), error)
+            continue
+        for city_id, locality_weather in group_weather.items():
+            await weather_cache.set_value(
+                get_city_weather_key(city_id),
+                locality_weather,
+                ttl=settings.WEATHER_CACHE_TTL,
+                stale_ttl=settings.WEATHER_CACHE_STALE_TTL
+            )
+            cities_weather[city_id] = locality_weather
+    return cities_weather
+
+async def fetch_subscriptions_weather(
+        subscriptions: list[store.Subscription]
+    ) -> dict[str, openweather.WeatherDataType]:
+    '''
+    Returns weather information by locality keys of 'subscriptions' (one per locality). Cities
+    known by their IDs are requested in groups, other localities one by one.
+    '''
+    result = {}
+    city_subscriptions = {
+        subscription.city_id: subscription
+        for subscription in subscriptions if subscription.city_id is not None
+    }
+    cities_weather = await get_cities_weather(list(city_subscriptions))
+    for city_id, locality_weather in cities_weather.items():
+        result[city_subscriptions[city_id].key] = locality_weather
+
+    other_subscriptions = [
+        subscription for subscription in subscriptions if subscription.city_id is None
+    ]
+    localities_weather = await asyncio.gather(
+        *[get_locality_weather(subscription.locality) for subscription in other_subscriptions],
+        return_exceptions=True
+    )
+    for subscription, locality_weather in zip(other_subscriptions, localities_weather):
+        if isinstance(locality_weather, Exception):
+            logging.warning('Weather in %s has not been received: %r', subscription.locality,
+                            locality_weather)
+        else:
+            result[subscription.key] = locality_weather
+    return result
+
+async def send_subscription(
+        subscription: store.Subscription,
+        locality_weather: openweather.WeatherDataType
+    ) -> bool:
+    '''
+    Sends weather information to a subscribed chat with the bulk priority, so deliveries don't
+    delay answers to users. Returns False if the chat isn't available anymore.
+    '''
+    with scheduler.use_priority(scheduler.PRIORITY_BULK):
+        try:
+            await bot.send_message(
+                subscription.chat_id,
+                format_weather(subscription.locality, locality_weather)
+            )
+        except (Unauthorized, ChatNotFound):
+            return False
+    return True
+
+subscription_delivery = delivery.Delivery(
+    subscription_store,
+    fetch_subscriptions_weather,
+    send_subscription,
+    interval=settings.SUBSCRIPTIONS_INTERVAL,
+    batch_size=settings.SUBSCRIPTIONS_BATCH_SIZE,
+    max_delay=settings.SUBSCRIPTIONS_MAX_DELAY,
+    retry_delay=settings.SUBSCRIPTIONS_RETRY_DELAY
+)
+
+@dp.message_handler(commands=['subscribe'])
+async def subscribe_start(message: types.Message):
+    '''
+    Starts a dialog about a weather subscription.
+    '''
+    # Set state
+    await states.WeatherStates.subscription_locality.set()
+
+    # Ask locality name
+    await message.answer(messages.SUBSCRIBE_ASK_LOCALITY)
+
+@dp.message_handler(state=states.WeatherStates.subscription_locality)
+async def subscribe_locality(message: types.Message, state: FSMContext):
+    '''
+    Processes the locality of a subscription.
+    '''
+    # Check the locality by getting its weather which tells its time zone too
+    locality_name = message.text
+    city, _ = city_index.lookup(locality_name)
+    if city is not None:
+        locality_name = city.title
+    try:
+        locality_weather = await get_locality_weather(locality_name, city)
+    except openweather.UnknownLocality:
+        await message.answer(messages.WEATHER_BAD_LOCALITY.format(locality_name=locality_name))
+        return
+    except (
+        openweather.AccessDenied,
+        openweather.ServiceUnavailable,
+        ClientError,
+        asyncio.TimeoutError
+    ):
+        await message.answer(messages.SERVICE_UNAVAILABLE)
+        await state.finish()
+        return
+
+    # Save the locality
+    async with state.proxy() as data:
+        data['locality'] = locality_name
+        data['timezone'] = locality_weather.get('timezone', {}).get('value', 0)
+        if city is not None:
+            data['city_id'] = city.city_id
+        else:
+            data.pop('city_id', None)
+
+    # Go to the next state
+    await states.WeatherStates.subscription_time.set()
+
+    # Ask delivery time
+    await message.answer(messages.SUBSCRIBE_ASK_TIME.format(locality_name=locality_name))
+
+@dp.message_handler(state=states.WeatherStates.subscription_time)
+async def subscribe_time(message: types.Message, state: FSMContext):
+    '''
+    Processes the delivery time of a subscription and subscribes the chat.
+    '''
+    minutes = store.parse_time_of_day(message.text)
+    if minutes is None:
+        await message.answer(messages.SUBSCRIBE_BAD_TIME)
+        return
+
+    async with state.proxy() as data:
+        city_id = data.get('city_id')
+        if city_id is not None:
+            key = get_city_weather_key(city_id)
+        else:
+            key = get_weather_key(data['locality'])
+        subscription = store.Subscription(
+            message.chat.id,
+            key,
+            data['locality'],
+            minutes,
+            timezone=data.get('timezone', 0),
+            city_id=city_id
+        )
+    await state.finish()
+
+    # Subscribe the chat unless it has too many subscriptions (the subscription to the same
+    # locality is replaced)
+    subscriptions = await subscription_store.get_chat_subscriptions(message.chat.id)
+    if len(subscriptions) >= settings.SUBSCRIPTIONS_MAX_PER_CHAT and all(
+            item.key != subscription.key for item in subscriptions):
+        await message.answer(messages.SUBSCRIBE_TOO_MANY.format(
+            max_number=settings.SUBSCRIPTIONS_MAX_PER_CHAT
+        ))
+        return
+    await subscription_store.add(subscription)
+    await message.answer(messages.SUBSCRIBE_READY.format(
+        locality_name=subscription.locality,
+        time=f'{minutes // 60:02}:{minutes % 60:02}'
+    ))
+
+@dp.message_handler(commands=['unsubscribe'])
+async def unsubscribe(message: types.Message):
+    '''
+    Removes all weather subscriptions of the chat.
+    '''
+    if await subscription_store.remove_chat(message.chat.id):
+        await message.answer(messages.UNSUBSCRIBE_READY)
+    else:
+        await message.answer(messages.UNSUBSCRIBE_NONE)
+
+
 ####################################################################################################
 ####################################### Currencies handlers ########################################
 ####################################################################################################
 
+async def convert_currency(from_cur_code: str, to_cur_code: str, amount: int|float) -> float:
+    '''
+    Converts 'amount' from currency with code 'from_cur_code' to currency with code 'to_cur_code'
+    using the local rate table. Requests the rate of the pair from the service only if the table
+    is stale or missing; concurrent requests for the same pair are coalesced into one. If the
+    service is unavailable or its quota is exhausted, a stale table is used.
+    '''
+    result = rate_table.convert(from_cur_code, to_cur_code, amount)
+    if result is not None:
+        return result
+    try:
+        rate = await currency_flight.do(
+            f'{from_cur_code}:{to_cur_code}',
+            lambda: currency_breaker.call(
+                lambda: exchangerates.convert_currency(
+                    from_cur_code,
+                    to_cur_code,
+                    1,
+                    keys.EXCHANGE_RATES_API_KEY,
+                    session=http_client.session
+                ),
+                acquire=currency_limiter.acquire
+            )
+        )
+    except (exchangerates.ServiceUnavailable, ClientError, asyncio.TimeoutError):
+        result = rate_table.convert(from_cur_code, to_cur_code, amount, allow_stale=True)
+        if result is None:
+            raise
+        logging.warning('Stale exchange rates are used')
+        return result
+    return amount * rate
+
+async def get_rates_data(base_cur_code: str) -> exchangerates.RatesDataType:
+    '''
+    Returns rates to convert from currency with code 'base_cur_code': the local rate table if it's
+    fresh, otherwise all latest rates against the currency requested from the service at once.
+    If the service is unavailable or its quota is exhausted, a stale table is used.
+    '''
+    rates_data = rate_table.get_rates_data()
+    if rates_data is not None:
+        return rates_data
+    try:
+        return await currency_flight.do(
+            f'latest:{base_cur_code}',
+            lambda: currency_breaker.call(
+                lambda: exchangerates.get_latest_rates(
+                    base_cur_code,
+                    keys.EXCHANGE_RATES_API_KEY,
+                    session=http_client.session
+                ),
+                acquire=currency_limiter.acquire
+            )
+        )
+    except (exchangerates.ServiceUnavailable, ClientError, asyncio.TimeoutError):
+        rates_data = rate_table.get_rates_data(allow_stale=True)
+        if rates_data is None:
+            raise
+        logging.warning('Stale exchange rates are used')
+        return rates_data
+
+async def answer_batch_conversion(message: types.Message, request: batch.BatchRequest):
+    '''
+    Answers 'message' with all conversions of batch request 'request' made by one set of rates.
+    '''
+    currency_codes = [request.from_currency] + request.to_currencies
+    if not all(map(exchangerates.check_currency_code, currency_codes)):
+        await message.answer(messages.CURRENCIES_BAD_CURRENCY_CODE)
+        return
+    if request.size > settings.CURRENCIES_BATCH_MAX_SIZE:
+        await message.answer(messages.CURRENCIES_BATCH_TOO_LARGE.format(
+            max_size=settings.CURRENCIES_BATCH_MAX_SIZE
+        ))
+        return
+
+    try:
+        results = batch.convert(request, await get_rates_data(request.from_currency))
+    except exchangerates.ConversionError:
+        await message.answer(messages.CURRENCIES_CONVERSION_ERROR)
+        return
+    except (
+        exchangerates.AccessDenied,
+        exchangerates.ServiceUnavailable,
+        ClientError,
+        asyncio.TimeoutError
+    ):
+        await message.answer(messages.SERVICE_UNAVAILABLE)
+        return
+    await message.answer('\n'.join(
+        messages.CURRENCIES_OUTPUT.format(
+            amount=amount,
+            from_currency=request.from_currency,
+            result=result,
+            to_currency=to_currency
+        )
+        for amount, amount_results in zip(request.amounts, results)
+        for to_currency, result in zip(request.to_currencies, amount_results)
+    ))
+
 @dp.message_handler(commands=['currencies'])
 async def currencies_start(message: types.Message):
     '''
-    Starts currencies converter.
+    Converts currencies given as command arguments like "/currencies 100 USD EUR" without
+    a dialog, otherwise starts currencies converter.
     '''
+    arguments = message.get_args()
+    if arguments:
+        request = batch.parse_request(arguments)
+        if request is None:
+            await message.answer(messages.CURRENCIES_BAD_ARGUMENTS)
+        else:
+            await answer_batch_conversion(message, request)
+        return
+
     # Set initial state
     await states.CurrenciesStates.from_currency.set()
 
@@ -148,8 +1003,15 @@ async def currencies_start(message: types.Message):
 @dp.message_handler(state=states.CurrenciesStates.from_currency)
 async def currencies_from_currency(message: types.Message, state: FSMContext):
     '''
-    Processes 'from' currency.
+    Processes 'from' currency or a batch request like "100 USD -> EUR, GBP".
     '''
+    # Answer a batch request at once
+    request = batch.parse_request(message.text)
+    if request is not None:
+        await state.finish()
+        await answer_batch_conversion(message, request)
+        return
+
     # Save from currency
     from_currency = message.text
     if not exchangerates.check_currency_code(from_currency):
@@ -197,11 +1059,10 @@ async def currencies_amount(message: types.Message, state: FSMContext):
 
         # Convert currency and output
         try:
-            result = await exchangerates.convert_currency(
+            result = await convert_currency(
                 data['from_currency'],
                 data['to_currency'],
-                data['amount'],
-                keys.EXCHANGE_RATES_API_KEY
+                data['amount']
             )
             await message.answer(messages.CURRENCIES_OUTPUT.format(
                 amount=data['amount'],
@@ -211,29 +1072,318 @@ async def currencies_amount(message: types.Message, state: FSMContext):
             ))
         except exchangerates.ConversionError:
             await message.answer(messages.CURRENCIES_CONVERSION_ERROR)
-        except (exchangerates.AccessDenied, exchangerates.ServiceUnavailable, ClientError):
+        except (
+            exchangerates.AccessDenied,
+            exchangerates.ServiceUnavailable,
+            ClientError,
+            asyncio.TimeoutError
+        ):
             await message.answer(messages.SERVICE_UNAVAILABLE)
         finally:
             await state.finish()
 
+alert_store = alerts.AlertStore(data_storage.redis, prefix=settings.RATE_ALERTS_PREFIX)
+
+async def send_alert(alert: alerts.Alert, rate: float | None) -> bool:
+    '''
+    Notifies a chat of a triggered rate alert with the bulk priority. Returns False if the chat
+    isn't available anymore.
+    '''
+    with scheduler.use_priority(scheduler.PRIORITY_BULK):
+        try:
+            await bot.send_message(alert.chat_id, messages.ALERTS_TRIGGERED.format(
+                alert=alert,
+                rate=f'{rate:.4f}' if rate is not None else '?'
+            ))
+        except (Unauthorized, ChatNotFound):
+            return False
+    return True
+
+alert_monitor = alerts.AlertMonitor(
+    alert_store,
+    rate_table,
+    send_alert,
+    interval=settings.RATE_ALERTS_INTERVAL,
+    batch_size=settings.RATE_ALERTS_BATCH_SIZE,
+    retry_delay=settings.RATE_ALERTS_RETRY_DELAY
+)
+
+@dp.message_handler(commands=['alert'])
+async def alert_add(message: types.Message):
+    '''
+    Adds a rate alert like "/alert EUR/USD < 1.05".
+    '''
+    alert = alerts.parse_alert(message.chat.id, message.get_args() or '')
+    if alert is None:
+        await message.answer(messages.ALERTS_USAGE)
+        return
+    if not (exchangerates.check_currency_code(alert.from_currency)
+            and exchangerates.check_currency_code(alert.to_currency)):
+        await message.answer(messages.CURRENCIES_BAD_CURRENCY_CODE)
+        return
+
+    # An alert crossed by the current rate would be triggered at once
+    rate = alert_monitor.get_rate(alert.pair)
+    if rate is None and rate_table.get_rates_data(allow_stale=True) is not None:
+        await message.answer(messages.CURRENCIES_CONVERSION_ERROR)
+        return
+    if rate is not None and alert.is_crossed(rate):
+        await message.answer(messages.ALERTS_ALREADY_CROSSED.format(
+            pair=alert.pair,
+            rate=f'{rate:.4f}'
+        ))
+        return
+
+    if len(await alert_store.get_chat_alerts(message.chat.id)) >= settings.RATE_ALERTS_MAX_PER_CHAT:
+        await message.answer(messages.ALERTS_TOO_MANY.format(
+            max_number=settings.RATE_ALERTS_MAX_PER_CHAT
+        ))
+        return
+    await alert_store.add(alert)
+    await message.answer(messages.ALERTS_READY.format(alert=alert))
+
+@dp.message_handler(commands=['alerts'])
+async def alert_list(message: types.Message):
+    '''
+    Lists rate alerts of the chat.
+    '''
+    chat_alerts = await alert_store.get_chat_alerts(message.chat.id)
+    if not chat_alerts:
+        await message.answer(messages.ALERTS_NONE)
+        return
+    await message.answer(messages.ALERTS_LIST.format(
+        alerts='\n'.join(f'  {alert}' for alert in chat_alerts)
+    ))
+
+@dp.message_handler(commands=['clearalerts'])
+async def alert_clear(message: types.Message):
+    '''
+    Removes all rate alerts of the chat.
+    '''
+    if await alert_store.remove_chat(message.chat.id):
+        await message.answer(messages.ALERTS_CLEARED)
+    else:
+        await message.answer(messages.ALERTS_NONE)
+
+def is_batch_request(message: types.Message) -> bool:
+    '''
+    Checks if 'message' is a batch request with valid currency codes. Other text, even if it looks
+    like a request (e.g. "10 min to eat"), is left to the other handlers.
+    '''
+    request = batch.parse_request(message.text)
+    return request is not None and all(map(
+        exchangerates.check_currency_code,
+        [request.from_currency] + request.to_currencies
+    ))
+
+@dp.message_handler(is_batch_request)
+async def currencies_batch(message: types.Message):
+    '''
+    Converts currencies by a batch request like "100 USD -> EUR, GBP" sent without a command.
+    '''
+    await answer_batch_conversion(message, batch.parse_request(message.text))
+
+
+####################################################################################################
+####################################### Inline query handler #######################################
+####################################################################################################
+
+INLINE_WEATHER_RE = re.compile(r'\s*weather\s+(?P<locality>\S.*?)\s*', re.IGNORECASE)
+
+inline_debouncer = debounce.Debouncer(settings.INLINE_DEBOUNCE_DELAY)
+
+def make_inline_article(
+        title: str,
+        text: str,
+        description: str | None = None
+    ) -> types.InlineQueryResultArticle:
+    '''
+    Returns an inline query result sending message text 'text'. The ID of the result is derived
+    from the text, so equal results of different queries are the same for Telegram.
+    '''
+    return types.InlineQueryResultArticle(
+        id=hashlib.md5(text.encode()).hexdigest(),
+        title=title,
+        description=description,
+        input_message_content=types.InputTextMessageContent(text)
+    )
+
+async def get_inline_weather_results(locality_name: str) -> list[types.InlineQueryResult]:
+    '''
+    Returns weather in a locality with name 'locality_name' as inline query results.
+    '''
+    city, _ = city_index.lookup(locality_name)
+    if city is not None:
+        locality_name = city.title
+    try:
+        # A superseded query stops waiting for the weather, but the request itself may be shared
+        # with other users and is completed to fill the cache
+        locality_weather = await asyncio.shield(get_locality_weather(locality_name, city))
+    except openweather.UnknownLocality:
+        return []
+    return [make_inline_article(
+        messages.INLINE_WEATHER_TITLE.format(locality_name=locality_name),
+        format_weather(locality_name, locality_weather),
+        description=messages.INLINE_WEATHER_DESCRIPTION.format(
+            temp_value=locality_weather['temp']['value'],
+            temp_units=locality_weather['temp']['units'],
+            pressure_value=locality_weather['pressure']['value'],
+            pressure_units=locality_weather['pressure']['units'],
+            humidity_value=locality_weather['humidity']['value'],
+            humidity_units=locality_weather['humidity']['units']
+        )
+    )]
+
+async def get_inline_conversion_results(
+        request: batch.BatchRequest
+    ) -> list[types.InlineQueryResult]:
+    '''
+    Returns conversions of batch request 'request' as inline query results, one per conversion.
+    '''
+    currency_codes = [request.from_currency] + request.to_currencies
+    if (
+        not all(map(exchangerates.check_currency_code, currency_codes))
+        or request.size > settings.CURRENCIES_BATCH_MAX_SIZE
+    ):
+        return []
+    try:
+        results = batch.convert(
+            request,
+            await asyncio.shield(get_rates_data(request.from_currency))
+        )
+    except exchangerates.ConversionError:
+        return []
+    articles = []
+    for amount, amount_results in zip(request.amounts, results):
+        for to_currency, result in zip(request.to_currencies, amount_results):
+            text = messages.CURRENCIES_OUTPUT.format(
+                amount=amount,
+                from_currency=request.from_currency,
+                result=result,
+                to_currency=to_currency
+            )
+            articles.append(make_inline_article(text, text))
+    return articles
+
+async def get_inline_results(query: str) -> list[types.InlineQueryResult]:
+    '''
+    Returns results of inline query 'query': weather for "weather <locality>" or conversions for
+    a batch request like "100 USD EUR". Other queries have no results.
+    '''
+    match = INLINE_WEATHER_RE.fullmatch(query)
+    if match is not None:
+        return await get_inline_weather_results(match['locality'])
+    request = batch.parse_request(query)
+    if request is not None:
+        return await get_inline_conversion_results(request)
+    return []
+
+@dp.inline_handler()
+async def inline_query(inline_query: types.InlineQuery):
+    '''
+    Answers an inline query like "@bot 100 usd eur" or "@bot weather Paris". Queries come on every
+    keystroke, so a query is processed only after the user has stopped typing, and a newer query
+    cancels the user's previous one. Results don't depend on the user, so Telegram can cache them
+    for everyone.
+    '''
+    switch_pm_text = messages.INLINE_HINT
+    try:
+        is_latest, results = await inline_debouncer.run(
+            inline_query.from_user.id,
+            lambda: get_inline_results(inline_query.query)
+        )
+    except (
+        openweather.AccessDenied,
+        openweather.ServiceUnavailable,
+        exchangerates.AccessDenied,
+        exchangerates.ServiceUnavailable,
+        ClientError,
+        asyncio.TimeoutError
+    ):
+        is_latest, results = True, []
+        switch_pm_text = messages.INLINE_SERVICE_UNAVAILABLE
+    if not is_latest:
+        # The query has been superseded by a newer one, which is answered instead
+        return
+
+    try:
+        if results:
+            await inline_query.answer(
+                results,
+                cache_time=settings.INLINE_CACHE_TIME,
+                is_personal=False
+            )
+        else:
+            await inline_query.answer(
+                [],
+                cache_time=settings.INLINE_ERROR_CACHE_TIME,
+                is_personal=False,
+                switch_pm_text=switch_pm_text,
+                switch_pm_parameter='inline'
+            )
+    except InvalidQueryID:
+        # The query is too old, the user has probably gone
+        pass
+
 
 ####################################################################################################
 ####################################### Funny image handler ########################################
 ####################################################################################################
 
+async def send_image(message: types.Message, image_data: giphy.ImageDataType):
+    '''
+    Sends an image to the chat of 'message' by its known Telegram file ID or, in URL download
+    mode, by its URL. Otherwise uploads the image. Remembers the file ID returned by Telegram.
+    '''
+    # Try to send the image by its file ID
+    if image_data.get('file_id'):
+        try:
+            await message.answer_photo(image_data['file_id'])
+            return
+        except BadRequest:
+            # Telegram has rejected the file ID
+            await file_ids.delete(image_data['id'])
+
+    # Try to let Telegram fetch the image by its URL
+    image = image_data.get('image')
+    answer = None
+    if image is None and image_pool.download_mode == pool.DOWNLOAD_MODE_URL:
+        try:
+            answer = await message.answer_photo(image_data['url'])
+        except BadRequest:
+            # Telegram couldn't fetch the image, so it's uploaded as a spooled file
+            image = await image_pool.download_image(image_data['url'], pool.DOWNLOAD_MODE_SPOOL)
+    elif image is None:
+        image = await image_pool.download_image(image_data['url'])
+
+    # Upload the image
+    if answer is None:
+        try:
+            answer = await message.answer_photo(
+                image if isinstance(image, bytes) else types.InputFile(image)
+            )
+        finally:
+            if not isinstance(image, bytes):
+                image.close()
+    if answer.photo:
+        await file_ids.set(image_data['id'], answer.photo[-1].file_id)
+
 @dp.message_handler(commands=['funny'])
 async def funny_image(message: types.Message):
     '''
     Replies with a funny image
     '''
-    # Send notification (due to the long waiting period)
-    await message.answer(messages.WAIT_MOMENT)
-
-    # Get image and send to the chat
+    # Get a prefetched image and send to the chat
+    image_data = image_pool.get(settings.IMAGES_FUNNY_TAG)
     try:
-        image = await giphy.get_random_image_by_tag('funny animals', keys.GIPHY_API_KEY)
-        await message.answer_photo(image)
-    except (giphy.AccessDenied, giphy.ServiceUnavailable, ClientError):
+        if image_data is None:
+            # Send notification (due to the long waiting period)
+            await message.answer(messages.WAIT_MOMENT)
+
+            # Get an image from the service
+            image_data = await image_pool.fetch_image(settings.IMAGES_FUNNY_TAG)
+        await send_image(message, image_data)
+    except (giphy.AccessDenied, giphy.ServiceUnavailable, ClientError, asyncio.TimeoutError):
         await message.answer(messages.SERVICE_UNAVAILABLE)
 
 
@@ -241,40 +1391,114 @@ async def funny_image(message: types.Message):
 ########################################## Poll handlers ###########################################
 ####################################################################################################
 
-async def get_group_chats(host: str = 'localhost', db: str | int = 0) -> list[tuple[str, str]]:
+# Callback data of pagination buttons of the group chat list
+POLL_PAGE_CALLBACK_PREFIX = 'page:'
+POLL_PAGE_CALLBACK_DATA = POLL_PAGE_CALLBACK_PREFIX + '{offset}:{query}'
+
+async def build_group_chat_markup(
+        user_id: int,
+        query: str = '',
+        offset: int = 0
+    ) -> InlineKeyboardMarkup | None:
     '''
-    Retrieves bot's group chat list from a Redis data storage.
+    Returns a keyboard with a page of group chats of a user with titles starting with 'query' or
+    None if there are no such chats.
     '''
-    # Open connection to a data storage
-    group_chats_ds = redis.Redis(host=host, db=db)
+    group_chats, has_more = await chat_registry.get_user_chats(
+        user_id,
+        query=query,
+        offset=offset,
+        limit=settings.POLL_GROUP_CHATS_PAGE_SIZE
+    )
+    if not group_chats:
+        return None
 
-    # Retrieve 
-    group_chat_keys = await group_chats_ds.keys()
-    group_chats = []
-    for group_chat_key in group_chat_keys:
-        group_chats.append((
-            (await group_chats_ds.get(group_chat_key)).decode(),
-            group_chat_key.decode()
+    # Add a button for every chat
+    answer_markup = InlineKeyboardMarkup(row_width=1)
+    answer_markup.add(*[InlineKeyboardButton(group_chat[0], callback_data=group_chat[1])
+                        for group_chat in group_chats])
+
+    # Add pagination buttons (a query is kept in callback data to stay stateless)
+    page_buttons = []
+    if offset > 0:
+        page_buttons.append(InlineKeyboardButton(
+            messages.POLL_PREV_PAGE_BTN,
+            callback_data=POLL_PAGE_CALLBACK_DATA.format(
+                offset=max(offset - settings.POLL_GROUP_CHATS_PAGE_SIZE, 0),
+                query=query
+            )
         ))
+    if has_more:
+        page_buttons.append(InlineKeyboardButton(
+            messages.POLL_NEXT_PAGE_BTN,
+            callback_data=POLL_PAGE_CALLBACK_DATA.format(
+                offset=offset + settings.POLL_GROUP_CHATS_PAGE_SIZE,
+                query=query
+            )
+        ))
+    if page_buttons:
+        answer_markup.row(*page_buttons)
+    answer_markup.add(InlineKeyboardButton(messages.POLL_NO_DESIRED_CHAT_BTN, callback_data=0))
+    return answer_markup
 
-    # Close data storage connection
-    await group_chats_ds.close()
+async def check_group_chat_member(chat_id: str, user_id: int) -> bool:
+    '''
+    Adds a user to members of an unindexed group chat if Telegram reports the user there. Returns
+    False if the membership hasn't been checked because of a temporary error.
+    '''
+    try:
+        chat_member = await bot.get_chat_member(chat_id, user_id)
+    except (ChatNotFound, Unauthorized):
+        # The bot has been removed from the chat while it was away
+        await chat_registry.remove_chat(chat_id)
+        return True
+    except BadRequest as error:
+        logging.warning('Cannot check membership in chat %s: %r', chat_id, error)
+        return True
+    except (TelegramAPIError, asyncio.TimeoutError) as error:
+        logging.warning('Membership in chat %s has not been checked: %r', chat_id, error)
+        return False
+    if chat_member.is_chat_member():
+        await chat_registry.add_member(chat_id, user_id)
+    return True
+
+async def check_group_chats(user_id: int):
+    '''
+    Checks membership of a user in group chats whose members aren't reported to the bot (chats
+    where it isn't an administrator and chats imported from the previous versions of the bot).
+    Up to 'POLL_MEMBERSHIP_CHECKS' chats are checked per request, and the checks start over
+    'POLL_MEMBERSHIP_CHECK_INTERVAL' seconds after the last chat has been checked.
+    '''
+    chat_ids = await chat_registry.get_unchecked_chats(
+        user_id,
+        limit=settings.POLL_MEMBERSHIP_CHECKS
+    )
+    results = await asyncio.gather(
+        *[check_group_chat_member(chat_id, user_id) for chat_id in chat_ids]
+    )
 
-    return group_chats
+    # Chats are checked in order, so the next request goes on from the first failed check
+    checked = list(itertools.takewhile(bool, results))
+    if checked:
+        await chat_registry.set_checked_chat(
+            user_id,
+            chat_ids[len(checked) - 1],
+            ttl=settings.POLL_MEMBERSHIP_CHECK_INTERVAL
+        )
 
 @dp.message_handler(commands=['poll'])
 async def poll_start(message: types.Message):
     '''
     Starts polls creator.
     '''
-    # Get group chats
-    group_chats = await get_group_chats(
-        host=settings.DATA_STORAGE_HOST,
-        db=settings.DATA_STORAGE_CHAT_LIST_DB
-    )
+    # Find group chats of the user the bot doesn't know about yet
+    await check_group_chats(message.from_user.id)
 
-    # Check if there are any group chats where the bot is present
-    if not group_chats:
+    # Get a page of group chats of the user
+    answer_markup = await build_group_chat_markup(message.from_user.id)
+
+    # Check if there are any group chats where the bot and the user are present
+    if answer_markup is None:
         await message.answer(messages.POLL_NO_GROUP_CHATS)
         return
 
@@ -282,27 +1506,53 @@ async def poll_start(message: types.Message):
     await states.PollStates.group_chat.set()
 
     # Ask user to choose a chat group
-    answer_buttons = [InlineKeyboardButton(group_chat[0], callback_data=group_chat[1])
-                      for group_chat in group_chats]
-    answer_buttons.append(InlineKeyboardButton(messages.POLL_NO_DESIRED_CHAT_BTN, callback_data=0))
-    answer_markup = InlineKeyboardMarkup(row_width=1)
-    answer_markup.add(*answer_buttons)
     await message.answer(messages.POLL_ASK_GROUP_CHAT, reply_markup=answer_markup)
 
+@dp.message_handler(state=states.PollStates.group_chat)
+async def poll_search_group_chat(message: types.Message):
+    '''
+    Searches group chats of the user by a title prefix.
+    '''
+    query = message.text[:settings.POLL_SEARCH_QUERY_MAX_LENGTH]
+    answer_markup = await build_group_chat_markup(message.from_user.id, query=query)
+    if answer_markup is None:
+        await message.answer(messages.POLL_NO_FOUND_GROUP_CHATS.format(query=query))
+        return
+    await message.answer(messages.POLL_ASK_GROUP_CHAT, reply_markup=answer_markup)
+
+@dp.callback_query_handler(
+        lambda callback_query: callback_query.data.startswith(POLL_PAGE_CALLBACK_PREFIX),
+        state=states.PollStates.group_chat
+)
+async def poll_group_chat_page(callback_query: types.CallbackQuery):
+    '''
+    Shows another page of group chats.
+    '''
+    _, offset, query = callback_query.data.split(':', 2)
+    answer_markup = await build_group_chat_markup(
+        callback_query.from_user.id,
+        query=query,
+        offset=int(offset)
+    )
+    if answer_markup is not None:
+        await callback_query.message.edit_reply_markup(answer_markup)
+    await callback_query.answer()
+
 @dp.callback_query_handler(state=states.PollStates.group_chat)
 async def poll_group_chat(callback_query: types.CallbackQuery, state: FSMContext):
     '''
     Processes selected group chat.
     '''
     # Check selected group chat ID
-    if callback_query.data == '0' :
+    if callback_query.data == '0' or not await chat_registry.is_member(
+            callback_query.data,
+            callback_query.from_user.id):
         await callback_query.message.answer(messages.POLL_NO_DESIRED_CHAT)
         await state.finish()
         return
 
-    # Save selected group chat ID
-    async with state.proxy() as data:
-        data['group_chat_id'] = callback_query.data
+    # Start a draft of the poll to the selected group chat
+    await poll_drafts.start(callback_query.from_user.id, callback_query.data)
 
     # Go to the next state
     await states.PollStates.next()
@@ -311,13 +1561,12 @@ async def poll_group_chat(callback_query: types.CallbackQuery, state: FSMContext
     await callback_query.message.answer(messages.POLL_ASK_QUESTION)
 
 @dp.message_handler(state=states.PollStates.question)
-async def poll_question(message: types.Message, state: FSMContext):
+async def poll_question(message: types.Message):
     '''
     Processes poll question.
     '''
     # Save given poll question
-    async with state.proxy() as data:
-        data['question'] = message.text
+    await poll_drafts.set_question(message.from_user.id, message.text)
 
     # Go to the next state
     await states.PollStates.next()
@@ -326,18 +1575,15 @@ async def poll_question(message: types.Message, state: FSMContext):
     await message.answer(messages.POLL_ASK_ANSWER)
 
 @dp.message_handler(state=states.PollStates.answer)
-async def poll_answer(message: types.Message, state: FSMContext):
+async def poll_answer(message: types.Message):
     '''
     Processes poll answer.
     '''
-    # Save given poll answer
-    async with state.proxy() as data:
-        answers = data.get('answers', [])
-        answers.append(message.text)
-        data['answers'] = answers
+    # Append given poll answer to the draft
+    answers_number = await poll_drafts.add_answer(message.from_user.id, message.text)
 
     # Ask user to put a poll answer
-    if len(answers) < settings.POLL_ANSWERS_MIN_NUMBER:
+    if answers_number < settings.POLL_ANSWERS_MIN_NUMBER:
         await message.answer(messages.POLL_ASK_NEXT_ANSWER)
     else:
         answer_buttons = [InlineKeyboardButton('finish', callback_data='finish')]
@@ -356,19 +1602,26 @@ async def poll_group_chat(callback_query: types.CallbackQuery, state: FSMContext
     '''
     Creates a poll.
     '''
-    async with state.proxy() as data:
-        # Create a poll
-        await bot.send_poll(
-            data['group_chat_id'],
-            data['question'],
-            data['answers']
-        )
+    # Read the whole draft at once
+    draft = await poll_drafts.get(callback_query.from_user.id)
+    if draft is None:
+        await state.finish()
+        await callback_query.answer()
+        return
 
-        # Answer the user
-        await callback_query.message.answer(messages.POLL_READY)
+    # Create a poll
+    await bot.send_poll(
+        draft.group_chat_id,
+        draft.question,
+        draft.answers
+    )
 
-        # Finish state
-        await state.finish()
+    # Answer the user
+    await callback_query.message.answer(messages.POLL_READY)
+
+    # Finish state and forget the draft
+    await state.finish()
+    await poll_drafts.delete(callback_query.from_user.id)
 
 @dp.my_chat_member_handler()
 async def manage_group_chat_list(my_chat_member: types.ChatMemberUpdated):
@@ -379,23 +1632,50 @@ async def manage_group_chat_list(my_chat_member: types.ChatMemberUpdated):
     if my_chat_member.chat.type != 'group':
         return
 
-    # Open connection to a data storage for keeping the list of group chats
-    group_chats_ds = redis.Redis(
-        host=settings.DATA_STORAGE_HOST,
-        db=settings.DATA_STORAGE_CHAT_LIST_DB
-    )
-
     # Manage the list of group chats
-    if my_chat_member.new_chat_member.status == 'left':
-        #group_chats.pop(my_chat_member.chat.id, None)
-        await group_chats_ds.delete(str(my_chat_member.chat.id))
+    if my_chat_member.new_chat_member.status in ('left', 'kicked'):
+        await chat_registry.remove_chat(my_chat_member.chat.id)
     else:
-        #group_chats[my_chat_member.chat.id] = my_chat_member.chat.title
-        await group_chats_ds.set(str(my_chat_member.chat.id), my_chat_member.chat.title)
+        # Members are reported only to administrators, otherwise they're checked on demand
+        await chat_registry.add_chat(
+            my_chat_member.chat.id,
+            my_chat_member.chat.title,
+            indexed=my_chat_member.new_chat_member.status == 'administrator'
+        )
 
-    # Close connection to the data storage
-    await group_chats_ds.close()
+        # The user who has added the bot is a member of the chat
+        await chat_registry.add_member(my_chat_member.chat.id, my_chat_member.from_user.id)
+
+@dp.chat_member_handler()
+async def manage_group_chat_members(chat_member: types.ChatMemberUpdated):
+    '''
+    Manages the index of group chats by members.
+    '''
+    # Return if the chat isn't a group
+    if chat_member.chat.type != 'group':
+        return
+
+    # Manage the members of the group chat
+    if chat_member.new_chat_member.status in ('left', 'kicked'):
+        await chat_registry.remove_member(chat_member.chat.id, chat_member.new_chat_member.user.id)
+    else:
+        await chat_registry.add_member(chat_member.chat.id, chat_member.new_chat_member.user.id)
 
 
 if __name__ == '__main__':
-    executor.start_polling(dp)
+    if settings.BOT_MODE == 'webhook':
+        webhook_executor = executor.set_webhook(
+            dp,
+            settings.WEBHOOK_PATH,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+            web_app=server.create_app(settings.WEBHOOK_PATH, keys.WEBHOOK_SECRET_TOKEN)
+        )
+        webhook_executor.run_app(host=settings.WEBAPP_HOST, port=settings.WEBAPP_PORT)
+    else:
+        executor.start_polling(
+            dp,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+            allowed_updates=types.AllowedUpdates.all()
+        )
@@ -0,0 +1,64 @@
+'''
+Tests 'datastorage' module.
+'''
+import asyncio
+
+import redis.asyncio as redis
+
+from . import datastorage
+
+
+class MemoryConnection(redis.Connection):
+    '''
+    Represents a connection to a data storage answering every command with its name.
+    '''
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = []
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self, nowait: bool = False):
+        pass
+
+    async def can_read_destructive(self) -> bool:
+        return False
+
+    async def send_command(self, *args, **kwargs):
+        self.responses.append(args[0])
+
+    def pack_commands(self, commands: list) -> list:
+        return list(commands)
+
+    async def send_packed_command(self, commands: list, check_health: bool = True):
+        self.responses.extend(args[0] for args in commands)
+
+    async def read_response(self, **kwargs) -> str:
+        return self.responses.pop(0)
+
+def test_connection_pool_round_trips():
+    '''
+    Tests that a command and a pipeline are one round-trip each and connections decode responses.
+    '''
+    async def test():
+        data_storage = datastorage.DataStorage(max_connections=2, pool_timeout=1)
+        data_storage.pool.connection_class = MemoryConnection
+        assert data_storage.pool.round_trips == 0
+
+        assert await data_storage.redis.get('key') == 'GET'
+        async with data_storage.redis.pipeline(transaction=False) as pipe:
+            pipe.get('first')
+            pipe.get('second')
+            pipe.get('third')
+            assert await pipe.execute() == ['GET', 'GET', 'GET']
+        assert data_storage.pool.round_trips == 2
+        assert data_storage.pool.wait_time > 0
+
+        connection = await data_storage.pool.get_connection('GET')
+        assert connection.encoder.decode_responses
+        await data_storage.pool.release(connection)
+        assert data_storage.pool.round_trips == 3
+        await data_storage.close()
+
+    asyncio.run(test())
@@ -0,0 +1,217 @@
+'''
+Tests 'telegram_bot' module.
+'''
+import asyncio
+import importlib.util
+import os
+import pathlib
+
+from aiogram import (
+    Bot,
+    Dispatcher,
+    types,
+)
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.utils.exceptions import BadRequest
+
+
+def load_bot():
+    '''
+    Loads the bot module. It's loaded by its path: the name 'telegram_bot' is taken by the package
+    of the tests.
+    '''
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    spec = importlib.util.spec_from_file_location(
+        'bot_app',
+        pathlib.Path(__file__).with_name('telegram_bot.py')
+    )
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+app = load_bot()
+
+class FakeApi:
+    '''
+    Represents the Bot API answering sent photos and rejecting file IDs listed in
+    'rejected_file_ids'.
+    '''
+    def __init__(self, rejected_file_ids: tuple[str, ...] = ()):
+        self.rejected_file_ids = rejected_file_ids
+        self.requests = []
+
+    async def request(self, method: str, data: dict | None = None, files: dict | None = None):
+        self.requests.append((method, data.get('photo'), bool(files)))
+        if data.get('photo') in self.rejected_file_ids:
+            raise BadRequest('Wrong file identifier/http url specified')
+        return {
+            'message_id': len(self.requests),
+            'date': 0,
+            'chat': {'id': data['chat_id'], 'type': 'private'},
+            'photo': [{
+                'file_id': f'uploaded-{len(self.requests)}',
+                'file_unique_id': 'unique',
+                'width': 1,
+                'height': 1,
+            }],
+        }
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the file ID cache.
+    '''
+    def __init__(self):
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    async def hget(self, key: str, field: str) -> str | None:
+        return self.hashes.get(key, {}).get(field)
+
+    async def hset(self, key: str, field: str, value: str):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def hdel(self, key: str, field: str):
+        self.hashes.get(key, {}).pop(field, None)
+
+class CountingStorage(MemoryStorage):
+    '''
+    Represents an FSM storage kept in memory recording reads and writes of states and data.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def get_state(self, *args, **kwargs):
+        self.calls.append('get_state')
+        return await super().get_state(*args, **kwargs)
+
+    async def get_data(self, *args, **kwargs):
+        self.calls.append('get_data')
+        return await super().get_data(*args, **kwargs)
+
+    async def set_state(self, *args, **kwargs):
+        self.calls.append('set_state')
+        return await super().set_state(*args, **kwargs)
+
+    async def set_data(self, *args, **kwargs):
+        self.calls.append('set_data')
+        return await super().set_data(*args, **kwargs)
+
+    async def update_data(self, *args, **kwargs):
+        self.calls.append('update_data')
+        return await super().update_data(*args, **kwargs)
+
+def make_message_data(user_id: int, text: str) -> dict:
+    entities = []
+    if text.startswith('/'):
+        entities.append({'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])})
+    return {
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': 'Test'},
+        'text': text,
+        'entities': entities,
+    }
+
+def make_message(user_id: int, text: str) -> types.Message:
+    return types.Message.to_object(make_message_data(user_id, text))
+
+def test_send_image(monkeypatch):
+    '''
+    Tests sending images by known file IDs, remembering file IDs of uploaded images and uploading
+    images again when Telegram rejects their file IDs.
+    '''
+    fake_api = FakeApi(rejected_file_ids=('stale',))
+    ds = MemoryRedis()
+    downloads = []
+
+    async def download_image(image_url, download_mode=None):
+        downloads.append(image_url)
+        return b'image'
+
+    monkeypatch.setattr(app.bot, 'request', fake_api.request)
+    monkeypatch.setattr(app.file_ids, 'ds', ds)
+    monkeypatch.setattr(app.image_pool, 'download_mode', app.pool.DOWNLOAD_MODE_MEMORY)
+    monkeypatch.setattr(app.image_pool, 'download_image', download_image)
+    Bot.set_current(app.bot)
+    file_ids_key = app.file_ids.key
+
+    async def test():
+        message = make_message(10, '/funny')
+
+        # A known file ID is sent without uploading
+        await app.send_image(message, {'id': 'cat', 'url': 'url', 'file_id': 'known'})
+        assert fake_api.requests == [('sendPhoto', 'known', False)]
+        assert ds.hashes == {}
+
+        # The file ID of an uploaded image is remembered
+        await app.send_image(message, {'id': 'cat', 'url': 'url', 'image': b'image'})
+        assert fake_api.requests[1:] == [('sendPhoto', None, True)]
+        assert ds.hashes == {file_ids_key: {'cat': 'uploaded-2'}}
+        assert downloads == []
+
+        # A rejected file ID is forgotten and the image is downloaded and uploaded again
+        await app.file_ids.set('dog', 'stale')
+        await app.send_image(message, {'id': 'dog', 'url': 'dog-url', 'file_id': 'stale'})
+        assert fake_api.requests[2:] == [('sendPhoto', 'stale', False), ('sendPhoto', None, True)]
+        assert downloads == ['dog-url']
+        assert ds.hashes == {file_ids_key: {'cat': 'uploaded-2', 'dog': 'uploaded-4'}}
+
+    asyncio.run(test())
+
+def test_is_batch_request():
+    '''
+    Tests that only batch requests with valid currency codes are answered without a command.
+    '''
+    assert app.is_batch_request(make_message(10, '100 USD -> EUR, GBP'))
+    assert app.is_batch_request(make_message(10, '5 eur rub'))
+    assert not app.is_batch_request(make_message(10, '10 min to eat'))
+    assert not app.is_batch_request(make_message(10, 'Hello'))
+
+def test_one_shot_commands(monkeypatch):
+    '''
+    Tests that commands with arguments are answered without reading or writing the FSM storage,
+    also while another dialog is active.
+    '''
+    fsm_storage = CountingStorage()
+    answers = []
+
+    async def answer_weather(message, locality_name):
+        answers.append(('weather', locality_name))
+
+    async def answer_batch_conversion(message, request):
+        answers.append(('currencies', request.from_currency, request.to_currencies))
+
+    monkeypatch.setattr(app.bot, 'request', FakeApi().request)
+    monkeypatch.setattr(app.dp, 'storage', fsm_storage)
+    monkeypatch.setattr(app, 'answer_weather', answer_weather)
+    monkeypatch.setattr(app, 'answer_batch_conversion', answer_batch_conversion)
+    Bot.set_current(app.bot)
+    Dispatcher.set_current(app.dp)
+
+    async def process(update_id: int, text: str):
+        update = types.Update.to_object({
+            'update_id': update_id,
+            'message': make_message_data(10, text),
+        })
+        # Each update is processed in a task of its own like the executor does
+        await asyncio.create_task(app.dp.process_update(update))
+
+    async def test():
+        await process(1, '/weather Paris')
+        await process(2, '/currencies 100 USD EUR')
+        assert answers == [('weather', 'Paris'), ('currencies', 'USD', ['EUR'])]
+        assert fsm_storage.calls == []
+
+        # A command without arguments starts a dialog
+        await process(3, '/currencies')
+        assert await fsm_storage.get_state(chat=10, user=10) == 'CurrenciesStates:from_currency'
+
+        # The dialog is left as it is
+        fsm_storage.calls.clear()
+        await process(4, '/weather London')
+        assert answers[-1] == ('weather', 'London')
+        assert fsm_storage.calls == []
+        assert await fsm_storage.get_state(chat=10, user=10) == 'CurrenciesStates:from_currency'
+
+    asyncio.run(test())
@@ -0,0 +1,175 @@
+'''
+Represents a circuit breaker with jittered retries for idempotent upstream requests.
+'''
+import asyncio
+import collections
+import logging
+import random
+import time
+import typing
+
+import aiohttp
+
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    '''
+    Represents a circuit breaker of upstream service 'name'.
+    The breaker keeps outcomes of the last 'window_size' calls. A call fails if it raises one of
+    'failure_exceptions' or lasts longer than 'slow_call_duration' seconds. When at least
+    'min_calls' calls are known and the share of failed ones reaches 'failure_rate', the breaker
+    opens: calls fail fast with 'open_exception' for 'open_timeout' seconds. Then the breaker is
+    half-open and lets up to 'half_open_calls' probe calls through; it closes if they succeed and
+    opens again otherwise.
+    Failed calls are retried up to 'attempts' times in total with exponential backoff with full
+    jitter ('base_delay', 'max_delay'), and all attempts together are limited by 'deadline'
+    seconds. Exceptions other than 'failure_exceptions' (e.g. an unknown locality) mean the
+    service has answered, so they are neither retried nor counted as failures.
+    '''
+    def __init__(
+            self,
+            name: str,
+            open_exception: type[Exception],
+            failure_exceptions: tuple[type[BaseException], ...] = (
+                aiohttp.ClientError,
+                asyncio.TimeoutError
+            ),
+            window_size: int = 20,
+            min_calls: int = 5,
+            failure_rate: float = 0.5,
+            slow_call_duration: int|float = 5,
+            open_timeout: int|float = 30,
+            half_open_calls: int = 1,
+            attempts: int = 3,
+            base_delay: int|float = 0.2,
+            max_delay: int|float = 2,
+            deadline: int|float = 8
+        ):
+        self.name = name
+        self.open_exception = open_exception
+        self.failure_exceptions = failure_exceptions
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.state = STATE_CLOSED
+        self.opened_number = 0
+        self._outcomes: collections.deque[tuple[bool, float]] = collections.deque(
+            maxlen=window_size
+        )
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def stats(self) -> dict[str, str|int|float]:
+        '''
+        Returns the breaker state and statistics of recent calls for metrics.
+        '''
+        failures = sum(1 for success, _ in self._outcomes if not success)
+        latency = sum(duration for _, duration in self._outcomes)
+        return {
+            'state': self.state,
+            'calls': len(self._outcomes),
+            'failures': failures,
+            'average_latency': latency / len(self._outcomes) if self._outcomes else 0.0,
+            'opened_number': self.opened_number,
+        }
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning('Circuit breaker of %s: %s -> %s', self.name, self.state, state)
+            self.state = state
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+            self.opened_number += 1
+        self._probes = 0
+
+    def _acquire(self):
+        '''
+        Checks that a call is allowed. Raises 'open_exception' otherwise.
+        '''
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened_at < self.open_timeout:
+                raise self.open_exception(f'The {self.name} service is temporarily unavailable.')
+            self._set_state(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                raise self.open_exception(f'The {self.name} service is temporarily unavailable.')
+            self._probes += 1
+
+    def _release(self):
+        '''
+        Gives back the probe taken by a call that hasn't reached the service.
+        '''
+        if self.state == STATE_HALF_OPEN:
+            self._probes -= 1
+
+    def _record(self, success: bool, duration: float):
+        '''
+        Records an outcome of a call and switches the state if needed.
+        '''
+        success = success and duration <= self.slow_call_duration
+        if self.state == STATE_HALF_OPEN:
+            if not success:
+                self._set_state(STATE_OPEN)
+            elif self._probes >= self.half_open_calls:
+                self._outcomes.clear()
+                self._set_state(STATE_CLOSED)
+            return
+        self._outcomes.append((success, duration))
+        failures = sum(1 for outcome, _ in self._outcomes if not outcome)
+        if (self.state == STATE_CLOSED and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate):
+            self._outcomes.clear()
+            self._set_state(STATE_OPEN)
+
+    async def call(
+            self,
+            fetch: typing.Callable[[], typing.Awaitable[typing.Any]],
+            acquire: typing.Callable[[], typing.Awaitable[None]] | None = None
+        ) -> typing.Any:
+        '''
+        Returns the result of 'fetch()' retrying failed attempts while the breaker allows. Every
+        attempt awaits 'acquire()' first if it's given (e.g. 'ratelimit.RateLimiter.acquire'):
+        the wait for a permit counts against the deadline but not against the call duration, so
+        throttling alone never opens the breaker.
+        Can raise 'open_exception', exceptions of 'fetch()' and 'acquire()' and
+        'asyncio.TimeoutError'.
+        '''
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(1, self.attempts + 1):
+            self._acquire()
+            if acquire is not None:
+                try:
+                    await asyncio.wait_for(acquire(), timeout=max(deadline - time.monotonic(), 0))
+                except BaseException:
+                    self._release()
+                    raise
+            started_at = time.monotonic()
+            try:
+                result = await asyncio.wait_for(fetch(), timeout=max(deadline - started_at, 0))
+            except self.failure_exceptions as error:
+                self._record(False, time.monotonic() - started_at)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if attempt == self.attempts or time.monotonic() + delay >= deadline:
+                    raise
+                logger.info('Retrying %s request in %.2f s after %r', self.name, delay, error)
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release()
+                raise
+            except Exception:
+                self._record(True, time.monotonic() - started_at)
+                raise
+            else:
+                self._record(True, time.monotonic() - started_at)
+                return result
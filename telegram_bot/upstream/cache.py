@@ -0,0 +1,205 @@
+'''
+Represents a two-level cache for results of upstream requests: a small in-process LRU in front of
+a Redis data storage shared by all bot replicas.
+'''
+import collections
+import json
+import logging
+import time
+import typing
+
+import redis.asyncio as redis
+
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    '''
+    Represents an in-process least-recently-used cache with per-entry expiration time.
+    '''
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: collections.OrderedDict[str, tuple[float, typing.Any]] = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[bool, typing.Any]:
+        '''
+        Returns a pair of a hit flag and a value stored by 'key'.
+        '''
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: typing.Any, ttl: int|float):
+        '''
+        Stores 'value' by 'key' for 'ttl' seconds evicting the least recently used entry if the
+        cache is full.
+        '''
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        '''
+        Removes an entry stored by 'key' if any.
+        '''
+        self._entries.pop(key, None)
+
+class Cache:
+    '''
+    Represents a cache of upstream results. Values must be JSON serializable. Exceptions listed
+    in 'negative_exceptions' of 'get_or_fetch' are cached too and raised again on a hit. Errors of
+    the Redis data storage don't break requests: the cache just falls back to the upstream.
+    '''
+    def __init__(self, ds: redis.Redis | None, prefix: str, lru_size: int = 1024):
+        self.ds = ds
+        self.prefix = prefix
+        self.lru = LRUCache(lru_size)
+        self.counts: collections.Counter[str] = collections.Counter()
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Returns numbers of hits on each level, misses, stale and negative hits for metrics.
+        '''
+        return {
+            name: self.counts[name]
+            for name in ('lru_hits', 'ds_hits', 'misses', 'stale_hits', 'negative_hits')
+        }
+
+    def generate_key(self, key: str) -> str:
+        return f'{self.prefix}:{key}'
+
+    async def get(self, key: str) -> tuple[bool, dict]:
+        '''
+        Returns a pair of a hit flag and a raw cache entry stored by 'key'.
+        '''
+        hit, entry = self.lru.get(key)
+        if hit:
+            self.counts['lru_hits'] += 1
+        if hit or self.ds is None:
+            return hit, entry
+
+        # Get the entry along with its remaining lifetime in one round-trip
+        ds_key = self.generate_key(key)
+        try:
+            async with self.ds.pipeline(transaction=False) as pipe:
+                raw_entry, ttl_ms = await pipe.get(ds_key).pttl(ds_key).execute()
+        except redis.RedisError as error:
+            logger.warning('Cache data storage is unavailable: %s', error)
+            return False, None
+        if raw_entry is None:
+            return False, None
+        self.counts['ds_hits'] += 1
+        entry = json.loads(raw_entry)
+        if ttl_ms > 0:
+            self.lru.set(key, entry, ttl_ms / 1000)
+        return True, entry
+
+    async def set(self, key: str, entry: dict, ttl: int|float):
+        '''
+        Stores a raw cache 'entry' by 'key' for 'ttl' seconds.
+        '''
+        self.lru.set(key, entry, ttl)
+        if self.ds is None:
+            return
+        try:
+            await self.ds.set(self.generate_key(key), json.dumps(entry), px=int(ttl * 1000))
+        except redis.RedisError as error:
+            logger.warning('Cache data storage is unavailable: %s', error)
+
+    async def delete(self, key: str):
+        '''
+        Removes an entry stored by 'key' on both cache levels.
+        '''
+        self.lru.delete(key)
+        if self.ds is None:
+            return
+        try:
+            await self.ds.delete(self.generate_key(key))
+        except redis.RedisError as error:
+            logger.warning('Cache data storage is unavailable: %s', error)
+
+    async def get_fresh_value(self, key: str) -> tuple[bool, typing.Any]:
+        '''
+        Returns a pair of a hit flag and a value stored by 'key' by 'get_or_fetch' if it hasn't
+        expired yet.
+        '''
+        hit, entry = await self.get(key)
+        if hit and 'error' not in entry and entry.get('expires_at', float('inf')) > time.time():
+            return True, entry['value']
+        return False, None
+
+    async def set_value(
+            self,
+            key: str,
+            value: typing.Any,
+            ttl: int|float,
+            stale_ttl: int|float = 0
+        ):
+        '''
+        Stores 'value' by 'key' the same way as 'get_or_fetch' does.
+        '''
+        await self.set(key, {'value': value, 'expires_at': time.time() + ttl}, ttl + stale_ttl)
+
+    async def get_or_fetch(
+            self,
+            key: str,
+            fetch: typing.Callable[[], typing.Awaitable[typing.Any]],
+            ttl: int|float,
+            negative_exceptions: tuple[type[Exception], ...] = (),
+            negative_ttl: int|float = 0,
+            stale_exceptions: tuple[type[Exception], ...] = (),
+            stale_ttl: int|float = 0
+        ) -> typing.Any:
+        '''
+        Returns a value stored by 'key' or awaits 'fetch()' and stores its result for 'ttl'
+        seconds. Exceptions from 'negative_exceptions' raised by 'fetch()' are stored for
+        'negative_ttl' seconds. An expired value is kept for 'stale_ttl' seconds more and is
+        returned if 'fetch()' raises one of 'stale_exceptions' (e.g. the service is unavailable or
+        its quota is exhausted).
+        '''
+        hit, entry = await self.get(key)
+        stale_entry = None
+        if hit:
+            if 'error' not in entry:
+                if entry.get('expires_at', float('inf')) > time.time():
+                    return entry['value']
+                stale_entry = entry
+            else:
+                for exception in negative_exceptions:
+                    if exception.__name__ == entry['error']:
+                        self.counts['negative_hits'] += 1
+                        raise exception(entry['message'])
+
+        self.counts['misses'] += 1
+        try:
+            value = await fetch()
+        except negative_exceptions as error:
+            if negative_ttl > 0:
+                await self.set(
+                    key,
+                    {'error': type(error).__name__, 'message': str(error)},
+                    negative_ttl
+                )
+            raise
+        except stale_exceptions as error:
+            if stale_entry is None:
+                raise
+            logger.warning('A stale value of "%s" is used: %s', key, error)
+            self.counts['stale_hits'] += 1
+            return stale_entry['value']
+        await self.set_value(key, value, ttl, stale_ttl)
+        return value
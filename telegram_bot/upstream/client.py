@@ -0,0 +1,83 @@
+'''
+Represents a long-lived HTTP client shared by the upstream service modules.
+'''
+import aiohttp
+import contextlib
+
+
+@contextlib.asynccontextmanager
+async def session_scope(session: aiohttp.ClientSession | None):
+    '''
+    Yields given 'session' or, if it's absent, a temporary session that is closed on exit.
+    '''
+    if session is not None:
+        yield session
+    else:
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+class HttpClient:
+    '''
+    Represents a managed 'aiohttp.ClientSession' with a pooled connector. The session keeps
+    connections alive and caches DNS lookups, so upstream requests don't pay for a new TCP and TLS
+    handshake each time. Requests are traced by 'trace_configs' if given. The client has to be
+    started and closed within a running event loop.
+    '''
+    def __init__(
+            self,
+            limit: int = 100,
+            limit_per_host: int = 10,
+            keepalive_timeout: int|float = 30,
+            dns_cache_ttl: int = 300,
+            timeout_total: int|float|None = 10,
+            timeout_connect: int|float|None = 3,
+            timeout_sock_read: int|float|None = 5,
+            trace_configs: list[aiohttp.TraceConfig] | None = None
+        ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout_total,
+            connect=timeout_connect,
+            sock_read=timeout_sock_read
+        )
+        self.trace_configs = trace_configs
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        '''
+        Returns the shared session. Raises 'RuntimeError' if the client hasn't been started.
+        '''
+        if self._session is None or self._session.closed:
+            raise RuntimeError('The HTTP client has not been started.')
+        return self._session
+
+    async def start(self):
+        '''
+        Opens the shared session if it isn't open yet.
+        '''
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=self.trace_configs
+        )
+
+    async def close(self):
+        '''
+        Closes the shared session and all its connections.
+        '''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
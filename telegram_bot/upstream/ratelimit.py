@@ -0,0 +1,158 @@
+'''
+Represents a client-side rate limiter and quota budgeter for paid upstream APIs.
+'''
+import asyncio
+import datetime
+import logging
+import time
+import typing
+
+import redis.asyncio as redis
+
+
+logger = logging.getLogger(__name__)
+
+# Takes a token from a bucket and counts a request in a monthly budget atomically. Returns -1 if
+# the budget is exhausted, 0 if a token is taken or the number of milliseconds to wait otherwise.
+TAKE_TOKEN_SCRIPT = '''
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local budget = tonumber(ARGV[3])
+local budget_ttl = tonumber(ARGV[4])
+if budget > 0 and tonumber(redis.call('GET', KEYS[2]) or '0') >= budget then
+    return -1
+end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated_at, 0) * rate / 1000)
+local wait = 0
+if tokens < 1 then
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+else
+    tokens = tokens - 1
+    if budget > 0 then
+        redis.call('INCR', KEYS[2])
+        redis.call('EXPIRE', KEYS[2], budget_ttl)
+    end
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+'''
+
+class LimitExceeded(Exception):
+    '''
+    Represents a request rejected by a rate limiter before it has been sent. Exceptions raised by
+    limiters are derived from it and from their 'exceeded_exception'.
+    '''
+
+class RateLimiter:
+    '''
+    Represents a token bucket of upstream service 'name' shared by all bot replicas through data
+    storage 'ds': up to 'rate' requests per second with bursts of 'burst' requests, and up to
+    'monthly_budget' requests per calendar month (UTC; 0 means no budget). A request that doesn't
+    fit the rate waits in a queue up to 'max_wait' seconds. If it still doesn't fit or the budget
+    is exhausted, 'exceeded_exception' (mixed with 'LimitExceeded') is raised, so callers can
+    serve a stale value instead.
+    If the data storage is unavailable, a local bucket of the replica is used.
+    '''
+    def __init__(
+            self,
+            ds: redis.Redis | None,
+            name: str,
+            exceeded_exception: type[Exception],
+            rate: int|float = 1,
+            burst: int = 10,
+            monthly_budget: int = 0,
+            max_wait: int|float = 3,
+            prefix: str = 'rate_limit'
+        ):
+        self.ds = ds
+        self.name = name
+        if not issubclass(exceeded_exception, LimitExceeded):
+            exceeded_exception = type(
+                exceeded_exception.__name__,
+                (exceeded_exception, LimitExceeded),
+                {}
+            )
+        self.exceeded_exception = exceeded_exception
+        self.rate = rate
+        self.burst = burst
+        self.monthly_budget = monthly_budget
+        self.max_wait = max_wait
+        self.prefix = prefix
+        self._script = ds.register_script(TAKE_TOKEN_SCRIPT) if ds is not None else None
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._month = ''
+        self._month_used = 0
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix, self.name) + parts)
+
+    def _take_local_token(self, month: str) -> float:
+        '''
+        Takes a token from the local bucket. Returns the same values as 'TAKE_TOKEN_SCRIPT'
+        in seconds.
+        '''
+        if month != self._month:
+            self._month, self._month_used = month, 0
+        if self.monthly_budget and self._month_used >= self.monthly_budget:
+            return -1
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self._month_used += 1
+        return 0
+
+    async def _take_token(self) -> float:
+        '''
+        Takes a token. Returns -1 if the budget is exhausted, 0 if a token is taken or the number
+        of seconds to wait otherwise.
+        '''
+        month = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m')
+        if self._script is None:
+            return self._take_local_token(month)
+        try:
+            wait_ms = await self._script(
+                keys=[self.generate_key('bucket'), self.generate_key('budget', month)],
+                args=[self.rate, self.burst, self.monthly_budget, 32 * 24 * 3600]
+            )
+        except redis.RedisError as error:
+            logger.warning('Rate limiter data storage is unavailable: %s', error)
+            return self._take_local_token(month)
+        return -1 if int(wait_ms) < 0 else int(wait_ms) / 1000
+
+    async def acquire(self):
+        '''
+        Waits until a request to the service is allowed.
+        Can raise 'exceeded_exception'.
+        '''
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = await self._take_token()
+            if wait == 0:
+                return
+            if wait < 0:
+                raise self.exceeded_exception(
+                    f'The monthly budget of the {self.name} service is exhausted.'
+                )
+            if time.monotonic() + wait > deadline:
+                raise self.exceeded_exception(
+                    f'The rate limit of the {self.name} service is exceeded.'
+                )
+            await asyncio.sleep(wait)
+
+    async def call(self, fetch: typing.Callable[[], typing.Awaitable[typing.Any]]) -> typing.Any:
+        '''
+        Returns the result of 'fetch()' awaited as soon as the limiter allows.
+        Can raise 'exceeded_exception' and exceptions of 'fetch()'.
+        '''
+        await self.acquire()
+        return await fetch()
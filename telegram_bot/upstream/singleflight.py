@@ -0,0 +1,166 @@
+'''
+Represents coalescing of concurrent identical upstream requests (single-flight).
+'''
+import asyncio
+import json
+import logging
+import time
+import typing
+import uuid
+
+import redis.asyncio as redis
+
+
+logger = logging.getLogger(__name__)
+
+# Deletes lock KEYS[1] if it's still held by token ARGV[1]
+RELEASE_SCRIPT = '''
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+'''
+
+# The longest pause between polls of a result published by another replica
+POLL_MAX_INTERVAL = 1
+
+class SingleFlight:
+    '''
+    Represents a group of requests where concurrent callers with the same key await a single
+    in-flight request and share its result or exception.
+    Within a replica callers share an 'asyncio.Future'. Across replicas (if data storage 'ds' is
+    given) the caller that takes a lock in the data storage makes the request and publishes its
+    result; callers on other replicas poll for it starting every 'poll_interval' seconds and
+    backing off, so a waiter takes a connection from the pool only for a moment. They wait up to
+    'wait_timeout' seconds and make the request themselves if nothing has been published. Results
+    must be JSON serializable, and only exceptions listed in 'shared_exceptions' are passed to
+    other replicas. The lock expires after 'lock_timeout' seconds and a published result is kept
+    for 'result_ttl' seconds.
+    '''
+    def __init__(
+            self,
+            ds: redis.Redis | None,
+            prefix: str,
+            shared_exceptions: tuple[type[Exception], ...] = (),
+            lock_timeout: int|float = 15,
+            wait_timeout: int|float = 12,
+            result_ttl: int|float = 5,
+            poll_interval: int|float = 0.05
+        ):
+        self.ds = ds
+        self.prefix = prefix
+        self.shared_exceptions = shared_exceptions
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._release_script = ds.register_script(RELEASE_SCRIPT) if ds is not None else None
+        self._flights: dict[str, asyncio.Future] = {}
+
+    def generate_key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + parts)
+
+    async def do(self, key: str, fetch: typing.Callable[[], typing.Awaitable[typing.Any]]):
+        '''
+        Returns the result of 'fetch()' awaited once for all concurrent callers with 'key'.
+        '''
+        flight = self._flights.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await self._do_shared(key, fetch)
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(error)
+                # The exception is retrieved by the caller, so it mustn't be logged as lost
+                flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+    def _pack(self, result: typing.Any = None, error: Exception | None = None) -> str:
+        if error is None:
+            return json.dumps({'value': result})
+        return json.dumps({'error': type(error).__name__, 'message': str(error)})
+
+    def _unpack(self, raw_result: str) -> typing.Any:
+        result = json.loads(raw_result)
+        if 'error' not in result:
+            return result['value']
+        for exception in self.shared_exceptions:
+            if exception.__name__ == result['error']:
+                raise exception(result['message'])
+        raise RuntimeError(f'Unknown shared exception {result["error"]}.')
+
+    async def _do_shared(self, key: str, fetch: typing.Callable[[], typing.Awaitable[typing.Any]]):
+        '''
+        Coalesces requests with 'key' across replicas using the data storage.
+        '''
+        if self.ds is None:
+            return await fetch()
+
+        lock_key = self.generate_key('lock', key)
+        result_key = self.generate_key('result', key)
+        token = uuid.uuid4().hex
+        try:
+            locked = await self.ds.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000))
+        except redis.RedisError as error:
+            logger.warning('Single-flight data storage is unavailable: %s', error)
+            return await fetch()
+
+        # Another replica makes the request
+        if not locked:
+            try:
+                raw_result = await self._wait_result(result_key)
+            except (asyncio.TimeoutError, redis.RedisError):
+                return await fetch()
+            return self._unpack(raw_result)
+
+        # Make the request and share its result
+        try:
+            result = await fetch()
+        except self.shared_exceptions as error:
+            await self._publish(result_key, self._pack(error=error))
+            raise
+        else:
+            await self._publish(result_key, self._pack(result))
+            return result
+        finally:
+            await self._release(lock_key, token)
+
+    async def _wait_result(self, result_key: str) -> str:
+        '''
+        Waits for a result published by another replica.
+        Can raise exceptions 'asyncio.TimeoutError' and 'redis.RedisError'.
+        '''
+        deadline = time.monotonic() + self.wait_timeout
+        interval = self.poll_interval
+        raw_result = await self.ds.get(result_key)
+        while raw_result is None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(min(interval, timeout))
+            interval = min(interval * 2, POLL_MAX_INTERVAL)
+            raw_result = await self.ds.get(result_key)
+        return raw_result
+
+    async def _publish(self, result_key: str, raw_result: str):
+        try:
+            await self.ds.set(result_key, raw_result, px=int(self.result_ttl * 1000))
+        except redis.RedisError as error:
+            logger.warning('Single-flight data storage is unavailable: %s', error)
+
+    async def _release(self, lock_key: str, token: str):
+        try:
+            await self._release_script(keys=[lock_key], args=[token])
+        except redis.RedisError as error:
+            logger.warning('Single-flight data storage is unavailable: %s', error)
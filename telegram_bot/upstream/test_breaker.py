@@ -0,0 +1,134 @@
+'''
+Tests 'breaker' module.
+'''
+import asyncio
+import pytest
+
+from . import breaker
+from . import ratelimit
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+class UnknownLocality(Exception):
+    pass
+
+def create_breaker(**kwargs) -> breaker.CircuitBreaker:
+    options = {
+        'failure_exceptions': (ServiceUnavailable,),
+        'window_size': 4,
+        'min_calls': 2,
+        'failure_rate': 0.5,
+        'open_timeout': 0.05,
+        'attempts': 1,
+    }
+    options.update(kwargs)
+    return breaker.CircuitBreaker('Test', ServiceUnavailable, **options)
+
+def test_circuit_breaker_states():
+    '''
+    Tests opening, failing fast, probing and closing the breaker.
+    '''
+    calls = []
+
+    async def fail():
+        calls.append('fail')
+        raise ServiceUnavailable()
+
+    async def succeed():
+        calls.append('succeed')
+        return 1
+
+    async def run():
+        circuit_breaker = create_breaker()
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                await circuit_breaker.call(fail)
+        assert circuit_breaker.state == breaker.STATE_OPEN
+
+        # Fail fast without calling the service
+        with pytest.raises(ServiceUnavailable):
+            await circuit_breaker.call(succeed)
+        assert calls == ['fail', 'fail']
+
+        # A successful probe closes the breaker
+        await asyncio.sleep(0.06)
+        assert await circuit_breaker.call(succeed) == 1
+        assert circuit_breaker.state == breaker.STATE_CLOSED
+        assert circuit_breaker.stats()['opened_number'] == 1
+
+    asyncio.run(run())
+
+def test_circuit_breaker_retries():
+    '''
+    Tests retrying failed attempts and passing other exceptions through.
+    '''
+    calls = []
+
+    async def fail_once():
+        calls.append('fail_once')
+        if len(calls) == 1:
+            raise ServiceUnavailable()
+        return 1
+
+    async def unknown_locality():
+        calls.append('unknown_locality')
+        raise UnknownLocality()
+
+    async def run():
+        circuit_breaker = create_breaker(attempts=3, base_delay=0.001, min_calls=10)
+        assert await circuit_breaker.call(fail_once) == 1
+        with pytest.raises(UnknownLocality):
+            await circuit_breaker.call(unknown_locality)
+        assert circuit_breaker.stats()['failures'] == 1
+
+    asyncio.run(run())
+    assert calls == ['fail_once', 'fail_once', 'unknown_locality']
+
+def test_circuit_breaker_rate_limited_attempts():
+    '''
+    Tests that every attempt takes a token of a limiter and a rejected attempt isn't a failure.
+    '''
+    calls = []
+
+    async def fail():
+        calls.append('fail')
+        raise ServiceUnavailable()
+
+    async def run():
+        limiter = ratelimit.RateLimiter(
+            None, 'Test', ServiceUnavailable, rate=1000, burst=10, monthly_budget=2
+        )
+        circuit_breaker = create_breaker(attempts=3, base_delay=0.001, min_calls=10)
+        with pytest.raises(ratelimit.LimitExceeded):
+            await circuit_breaker.call(fail, acquire=limiter.acquire)
+        assert calls == ['fail', 'fail']
+        assert circuit_breaker.stats()['failures'] == 2
+
+        # The limiter rejects the attempt before it's sent, so there are no retries
+        with pytest.raises(ServiceUnavailable):
+            await circuit_breaker.call(fail, acquire=limiter.acquire)
+        assert calls == ['fail', 'fail']
+        assert circuit_breaker.stats()['calls'] == 2
+
+    asyncio.run(run())
+
+def test_circuit_breaker_throttled_calls():
+    '''
+    Tests that waiting for a permit of a limiter doesn't make a call slow.
+    '''
+    async def acquire():
+        await asyncio.sleep(0.05)
+
+    async def succeed():
+        return 1
+
+    async def run():
+        circuit_breaker = create_breaker(slow_call_duration=0.01)
+        for _ in range(4):
+            assert await circuit_breaker.call(succeed, acquire=acquire) == 1
+        assert circuit_breaker.stats()['failures'] == 0
+        assert circuit_breaker.state == breaker.STATE_CLOSED
+
+    asyncio.run(run())
@@ -0,0 +1,90 @@
+'''
+Tests 'cache' module.
+'''
+import asyncio
+import time
+import pytest
+
+from . import cache
+
+
+class NotFound(Exception):
+    pass
+
+def test_lru_cache_eviction_and_expiration():
+    '''
+    Tests evicting least recently used and expired entries.
+    '''
+    lru = cache.LRUCache(max_size=2)
+    lru.set('a', 1, 60)
+    lru.set('b', 2, 60)
+    assert lru.get('a') == (True, 1)
+    lru.set('c', 3, 60)
+    assert lru.get('b') == (False, None)
+    assert lru.get('a') == (True, 1)
+    assert len(lru) == 2
+
+    lru.set('d', 4, 0.01)
+    time.sleep(0.02)
+    assert lru.get('d') == (False, None)
+
+def test_cache_get_or_fetch():
+    '''
+    Tests caching of values and negative results without a data storage.
+    '''
+    calls = []
+
+    async def fetch_value():
+        calls.append('value')
+        return {'temp': 1}
+
+    async def fetch_error():
+        calls.append('error')
+        raise NotFound('not found')
+
+    async def run():
+        weather_cache = cache.Cache(None, 'test')
+        assert await weather_cache.get_or_fetch('a', fetch_value, ttl=60) == {'temp': 1}
+        assert await weather_cache.get_or_fetch('a', fetch_value, ttl=60) == {'temp': 1}
+        for _ in range(2):
+            with pytest.raises(NotFound):
+                await weather_cache.get_or_fetch(
+                    'b',
+                    fetch_error,
+                    ttl=60,
+                    negative_exceptions=(NotFound,),
+                    negative_ttl=60
+                )
+        await weather_cache.delete('a')
+        await weather_cache.get_or_fetch('a', fetch_value, ttl=60)
+
+    asyncio.run(run())
+    assert calls == ['value', 'error', 'value']
+
+def test_cache_stale_value():
+    '''
+    Tests returning an expired value when the upstream fails.
+    '''
+    results = [{'temp': 1}, NotFound('unavailable')]
+
+    async def fetch():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def run():
+        weather_cache = cache.Cache(None, 'test')
+        await weather_cache.get_or_fetch('a', fetch, ttl=0.01, stale_ttl=60)
+        await asyncio.sleep(0.02)
+        value = await weather_cache.get_or_fetch(
+            'a',
+            fetch,
+            ttl=0.01,
+            stale_exceptions=(NotFound,),
+            stale_ttl=60
+        )
+        assert value == {'temp': 1}
+
+    asyncio.run(run())
+    assert not results
@@ -0,0 +1,32 @@
+'''
+Tests 'client' module.
+'''
+import asyncio
+import pytest
+
+from . import client
+
+
+def test_http_client_lifecycle():
+    '''
+    Tests opening and closing the shared session.
+    '''
+    async def run():
+        http_client = client.HttpClient(limit_per_host=5, dns_cache_ttl=60, timeout_total=7)
+        with pytest.raises(RuntimeError):
+            http_client.session
+        await http_client.start()
+        session = http_client.session
+        assert session.connector.limit_per_host == 5
+        assert session.timeout.total == 7
+
+        # Starting again keeps the same session
+        await http_client.start()
+        assert http_client.session is session
+
+        await http_client.close()
+        assert session.closed
+        with pytest.raises(RuntimeError):
+            http_client.session
+
+    asyncio.run(run())
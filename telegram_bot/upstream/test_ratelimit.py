@@ -0,0 +1,63 @@
+'''
+Tests 'ratelimit' module.
+'''
+import asyncio
+import time
+import pytest
+
+from . import ratelimit
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+def test_rate_limiter_bucket():
+    '''
+    Tests bursts, waiting for a token and exceeding the rate limit with the local bucket.
+    '''
+    async def fetch():
+        return 1
+
+    async def run():
+        limiter = ratelimit.RateLimiter(
+            None, 'Test', ServiceUnavailable, rate=20, burst=2, max_wait=0.2
+        )
+
+        # A burst passes without waiting
+        started_at = time.monotonic()
+        assert await limiter.call(fetch) == 1
+        assert await limiter.call(fetch) == 1
+        assert time.monotonic() - started_at < 0.04
+
+        # The next request waits for a token
+        started_at = time.monotonic()
+        assert await limiter.call(fetch) == 1
+        assert time.monotonic() - started_at >= 0.04
+
+        # A request that would wait longer than allowed fails
+        limiter.max_wait = 0.01
+        with pytest.raises(ServiceUnavailable):
+            await limiter.call(fetch)
+
+    asyncio.run(run())
+
+def test_rate_limiter_monthly_budget():
+    '''
+    Tests that requests fail fast when the monthly budget is exhausted.
+    '''
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+
+    async def run():
+        limiter = ratelimit.RateLimiter(
+            None, 'Test', ServiceUnavailable, rate=1000, burst=10, monthly_budget=3
+        )
+        for _ in range(3):
+            await limiter.call(fetch)
+        with pytest.raises(ServiceUnavailable):
+            await limiter.call(fetch)
+        assert len(calls) == 3
+
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+'''
+Tests 'singleflight' module.
+'''
+import asyncio
+import pytest
+
+from . import singleflight
+
+
+def test_single_flight_coalescing():
+    '''
+    Tests sharing one request and its exception between concurrent callers.
+    '''
+    calls = []
+
+    async def fetch_value():
+        calls.append('value')
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def fetch_error():
+        calls.append('error')
+        await asyncio.sleep(0.01)
+        raise ValueError('bad')
+
+    async def run():
+        flight = singleflight.SingleFlight(None, 'test')
+        results = await asyncio.gather(*[flight.do('a', fetch_value) for _ in range(5)])
+        assert results == [42] * 5
+
+        results = await asyncio.gather(
+            *[flight.do('b', fetch_error) for _ in range(3)],
+            return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+
+        # Finished requests aren't shared with later callers
+        assert await flight.do('a', fetch_value) == 42
+
+    asyncio.run(run())
+    assert calls == ['value', 'error', 'value']
+
+class MemoryRedis:
+    '''
+    Represents a data storage kept in memory supporting the commands used by the single-flight.
+    Keys don't expire.
+    '''
+    def __init__(self):
+        self.data = {}
+
+    def register_script(self, script: str):
+        assert script == singleflight.RELEASE_SCRIPT
+
+        async def release(keys: list[str], args: list[str]) -> int:
+            if self.data.get(keys[0]) != args[0]:
+                return 0
+            del self.data[keys[0]]
+            return 1
+        return release
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, nx: bool = False, px: int | None = None) -> bool:
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+def test_single_flight_replicas():
+    '''
+    Tests sharing one request between replicas and releasing only the lock held by the replica.
+    '''
+    calls = []
+
+    async def fetch_value():
+        calls.append('value')
+        await asyncio.sleep(0.05)
+        return {'temp': 1}
+
+    async def run():
+        ds = MemoryRedis()
+        replicas = [
+            singleflight.SingleFlight(ds, 'test', poll_interval=0.01, wait_timeout=1)
+            for _ in range(3)
+        ]
+        results = await asyncio.gather(*[replica.do('a', fetch_value) for replica in replicas])
+        assert results == [{'temp': 1}] * 3
+        assert 'test:lock:a' not in ds.data
+
+        # A lock taken by another replica after this one has expired is kept
+        ds.data['test:lock:a'] = 'other'
+        await replicas[0]._release('test:lock:a', 'token')
+        assert ds.data['test:lock:a'] == 'other'
+
+    asyncio.run(run())
+    assert calls == ['value']
+
+def test_single_flight_result_packing():
+    '''
+    Tests passing results and shared exceptions between replicas.
+    '''
+    flight = singleflight.SingleFlight(None, 'test', shared_exceptions=(KeyError,))
+    assert flight._unpack(flight._pack({'temp': 1})) == {'temp': 1}
+    with pytest.raises(KeyError):
+        flight._unpack(flight._pack(error=KeyError('missing')))
+    with pytest.raises(RuntimeError):
+        flight._unpack(flight._pack(error=ValueError('unknown')))
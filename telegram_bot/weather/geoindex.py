@@ -0,0 +1,336 @@
+'''
+Represents a local index of cities of the OpenWeather city list used to resolve locality names to
+city IDs without requests to the service. The index is built once from the city list
+(http://bulk.openweathermap.org/sample/city.list.json.gz or, to resolve ambiguous names by
+population, current.city.list.json.gz), e.g.:
+
+    python -m weather.geoindex city.list.json.gz cities.idx
+
+An index file consists of a header, a table of fixed-size entries sorted by normalized city names
+and a block of strings. It's memory-mapped on the first lookup, so it takes no time to load, its
+pages are shared by all bot processes on a host and only the pages actually searched are read.
+'''
+import argparse
+import gzip
+import json
+import logging
+import mmap
+import os
+import struct
+import typing
+import unicodedata
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'OWCI'
+VERSION = 1
+
+# Magic, version, number of entries
+_HEADER = struct.Struct('<4sHI')
+# Key offset, name offset, key length, name length, city ID, population, latitude, longitude,
+# country code
+_ENTRY = struct.Struct('<IIHHIIff2s')
+
+def normalize_name(name: str) -> str:
+    '''
+    Returns city name 'name' in a case, whitespace and diacritics insensitive form, e.g. "Zürich"
+    and " zurich" are both "zurich".
+    '''
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return ' '.join(
+        ''.join(char for char in decomposed if not unicodedata.combining(char)).split()
+    )
+
+def parse_query(query: str) -> tuple[str, str | None]:
+    '''
+    Splits a locality query like "Moscow, RU" into a normalized city name and an upper case
+    country code (None if it's absent).
+    '''
+    name, separator, country = query.rpartition(',')
+    country = country.strip()
+    if separator and len(country) == 2 and country.isalpha():
+        return normalize_name(name), country.upper()
+    return normalize_name(query), None
+
+def _distance(first: str, second: str, max_distance: int) -> int:
+    '''
+    Returns the Levenshtein distance between 'first' and 'second' or 'max_distance' + 1 if it's
+    greater than 'max_distance'.
+    '''
+    previous = list(range(len(second) + 1))
+    for index, first_char in enumerate(first, 1):
+        current = [index]
+        for second_index, second_char in enumerate(second, 1):
+            current.append(min(
+                previous[second_index] + 1,
+                current[second_index - 1] + 1,
+                previous[second_index - 1] + (first_char != second_char),
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+class City:
+    '''
+    Represents a city of the OpenWeather city list.
+    '''
+    def __init__(
+            self,
+            city_id: int,
+            name: str,
+            country: str,
+            lat: float,
+            lon: float,
+            population: int = 0
+        ):
+        self.city_id = city_id
+        self.name = name
+        self.country = country
+        self.population = population
+        self.lat = lat
+        self.lon = lon
+
+    @property
+    def title(self) -> str:
+        '''
+        Returns the name of the city with its country code, e.g. "London, GB".
+        '''
+        return f'{self.name}, {self.country}' if self.country else self.name
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, City) and self.city_id == other.city_id
+
+    def __repr__(self) -> str:
+        return f'City({self.city_id}, {self.title!r})'
+
+class CityIndex:
+    '''
+    Represents an index of cities kept in file 'path' built by 'build'. The file is opened on the
+    first lookup; if it's absent, lookups find nothing, so localities are only resolved by the
+    service.
+    '''
+    def __init__(self, path: str):
+        self.path = path
+        self._file: typing.BinaryIO | None = None
+        self._map: mmap.mmap | None = None
+        self._count = 0
+        self._strings_offset = 0
+        self._is_missing = False
+
+    def _open(self) -> bool:
+        if self._map is not None:
+            return True
+        if self._is_missing:
+            return False
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            logger.warning('City index %s is absent, localities are resolved by the service.',
+                           self.path)
+            self._is_missing = True
+            return False
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a city index of version {VERSION}.')
+        self._strings_offset = _HEADER.size + self._count * _ENTRY.size
+        return True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self._count if self._open() else 0
+
+    def _key(self, position: int) -> bytes:
+        key_offset, _, key_length, *_ = _ENTRY.unpack_from(
+            self._map,
+            _HEADER.size + position * _ENTRY.size
+        )
+        start = self._strings_offset + key_offset
+        return self._map[start:start + key_length]
+
+    def _city(self, position: int) -> City:
+        _, name_offset, _, name_length, city_id, population, lat, lon, country = (
+            _ENTRY.unpack_from(self._map, _HEADER.size + position * _ENTRY.size)
+        )
+        start = self._strings_offset + name_offset
+        return City(
+            city_id,
+            self._map[start:start + name_length].decode(),
+            country.rstrip(b'\x00').decode(),
+            lat,
+            lon,
+            population
+        )
+
+    def _bisect(self, key: bytes) -> int:
+        '''
+        Returns the position of the first entry with a key not less than 'key'.
+        '''
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, name: str, country: str | None = None) -> list[City]:
+        '''
+        Returns cities with normalized name 'name', optionally only ones in country 'country'.
+        More populous cities go first.
+        '''
+        if not self._open():
+            return []
+        key = name.encode()
+        cities = []
+        position = self._bisect(key)
+        while position < self._count and self._key(position) == key:
+            city = self._city(position)
+            if country is None or city.country == country:
+                cities.append(city)
+            position += 1
+        return cities
+
+    def search_prefix(self, prefix: str, limit: int = 10) -> list[City]:
+        '''
+        Returns up to 'limit' cities which normalized names start with normalized 'prefix'.
+        '''
+        if not self._open() or not prefix:
+            return []
+        key = normalize_name(prefix).encode()
+        cities = {}
+        position = self._bisect(key)
+        while position < self._count and len(cities) < limit:
+            if not self._key(position).startswith(key):
+                break
+            # A city may match by several of its names
+            city = self._city(position)
+            cities.setdefault(city.city_id, city)
+            position += 1
+        return list(cities.values())
+
+    def suggest(self, name: str, limit: int = 3, max_distance: int = 2) -> list[City]:
+        '''
+        Returns up to 'limit' cities which normalized names differ from normalized 'name' by up to
+        'max_distance' edits, closest first. Only names starting with the same letter are
+        compared, so a lookup checks a small part of the index.
+        '''
+        if not self._open() or not name:
+            return []
+        first_char = name[0]
+        start = self._bisect(first_char.encode())
+        end = self._bisect(chr(ord(first_char) + 1).encode())
+        matches = []
+        previous_key = None
+        for position in range(start, end):
+            key = self._key(position)
+            if key == previous_key or abs(len(key) - len(name)) > max_distance:
+                continue
+            previous_key = key
+            distance = _distance(name, key.decode(), max_distance)
+            if distance <= max_distance:
+                matches.append((distance, position))
+        matches.sort()
+        cities = {}
+        for _, position in matches:
+            if len(cities) == limit:
+                break
+            # A city may match by several of its names
+            city = self._city(position)
+            cities.setdefault(city.city_id, city)
+        return list(cities.values())
+
+    def lookup(self, query: str) -> tuple[City | None, bool]:
+        '''
+        Resolves a locality query like "moscow" or "Moscow, RU" to a city. Of cities with the same
+        name the most populous one is chosen. Returns the city (None if the query is unknown or
+        ambiguous) and whether the name is present in the index.
+        '''
+        name, country = parse_query(query)
+        cities = self.find(name, country)
+        if not cities:
+            return None, bool(country) and bool(self.find(name))
+        if len(cities) > 1 and cities[0].population <= cities[1].population:
+            return None, True
+        return cities[0], True
+
+def build(cities: typing.Iterable[dict], path: str) -> int:
+    '''
+    Builds an index file 'path' of 'cities' in the format of the OpenWeather city list (dicts
+    with keys 'id', 'name', 'country', 'coord' and optionally 'langs' with names in other
+    languages and 'stat' with the population). Returns the number of index entries.
+    '''
+    entries = []
+    for city in cities:
+        if not city.get('name'):
+            continue
+        # A city is found by its name and by its names in other languages if they're given
+        names = [city['name']] + [
+            name
+            for langs in city.get('langs') or []
+            for language, name in langs.items()
+            if len(language) == 2 and isinstance(name, str)
+        ]
+        for key in dict.fromkeys(map(normalize_name, names)):
+            if not key:
+                continue
+            entries.append((
+                key.encode(),
+                -int((city.get('stat') or {}).get('population') or 0),
+                city['name'].encode(),
+                int(city['id']),
+                float(city.get('coord', {}).get('lat', 0)),
+                float(city.get('coord', {}).get('lon', 0)),
+                (city.get('country') or '').encode()[:2],
+            ))
+    entries.sort()
+
+    strings = bytearray()
+    offsets = {}
+    def add_string(value: bytes) -> int:
+        # The same strings (e.g. keys equal to names) are kept once
+        if value not in offsets:
+            offsets[value] = len(strings)
+            strings.extend(value)
+        return offsets[value]
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(entries)))
+        for key, negative_population, name, city_id, lat, lon, country in entries:
+            file.write(_ENTRY.pack(
+                add_string(key),
+                add_string(name),
+                len(key),
+                len(name),
+                city_id,
+                min(-negative_population, 0xffffffff),
+                lat,
+                lon,
+                country
+            ))
+        file.write(strings)
+    os.replace(temporary_path, path)
+    return len(entries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds a city index from the city list.')
+    parser.add_argument('city_list', help='city list file (JSON, optionally gzipped)')
+    parser.add_argument('index', help='index file to create')
+    args = parser.parse_args()
+    opener = gzip.open if args.city_list.endswith('.gz') else open
+    with opener(args.city_list, 'rt', encoding='utf-8') as city_list_file:
+        number = build(json.load(city_list_file), args.index)
+    print(f'{number} cities are indexed.')
@@ -3,8 +3,14 @@ Represents functions for work with the OpenWeather service.
 '''
 import aiohttp
 
+from upstream import client
+
 
 URL = 'https://api.openweathermap.org/data/2.5/weather'
+GROUP_URL = 'https://api.openweathermap.org/data/2.5/group'
+
+# The maximum number of cities requested at once from the group endpoint
+GROUP_MAX_SIZE = 20
 
 WeatherDataType = dict[str, dict[str, int|float|str]]
 
@@ -28,22 +34,121 @@ class AccessDenied(Exception):
     '''
     pass
 
-async def get_locality_weather(locality_name: str, api_key: str) -> WeatherDataType:
+def normalize_locality_name(locality_name: str) -> str:
+    '''
+    Returns 'locality_name' in a case and whitespace insensitive form suitable for cache keys.
+    '''
+    return ' '.join(locality_name.split()).casefold()
+
+async def get_locality_weather(
+        locality_name: str,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> WeatherDataType:
     '''
     Requests weather information from the OpenWeather service by name of locality 'locality_name'
     using service API_KEY 'api_key'. Returns a dictionary containing information about temperature,
-    pressure and humidity in the locality.
+    pressure and humidity in the locality. A shared 'session' is used if given, otherwise a
+    temporary one is opened.
     Can raise exceptions 'UnknownLocality', 'ServiceUnavailable', 'AccessDenied' and 
     'aiohttp.ClientError'.
     '''
-    # Set request parameters
+    return await _get_weather(
+        {'q': locality_name},
+        f'Locality with name "{locality_name}"',
+        api_key,
+        session
+    )
+
+async def get_city_weather(
+        city_id: int,
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> WeatherDataType:
+    '''
+    Requests weather information from the OpenWeather service by city ID 'city_id' of the
+    OpenWeather city list. Returns the same information as 'get_locality_weather'.
+    Can raise the same exceptions as 'get_locality_weather'.
+    '''
+    return await _get_weather({'id': city_id}, f'City with ID {city_id}', api_key, session)
+
+async def get_cities_weather(
+        city_ids: list[int],
+        api_key: str,
+        session: aiohttp.ClientSession | None = None
+    ) -> dict[int, WeatherDataType]:
+    '''
+    Requests weather information in up to 'GROUP_MAX_SIZE' cities by their IDs 'city_ids' at once
+    using the group endpoint of the OpenWeather service. Returns weather information in the same
+    form as 'get_locality_weather' by city IDs; unknown cities are absent.
+    Can raise exceptions 'ServiceUnavailable', 'AccessDenied' and 'aiohttp.ClientError'.
+    '''
     params = {
-        'q': locality_name,
+        'id': ','.join(map(str, city_ids[:GROUP_MAX_SIZE])),
         'appid': api_key
     }
 
     # Request and parse data
-    async with aiohttp.ClientSession() as session:
+    async with client.session_scope(session) as session:
+        async with session.get(GROUP_URL, params=params) as response:
+            # Get response data
+            try:
+                data = await response.json()
+            except:
+                raise ServiceUnavailable('Bad or absent JSON data in the response.')
+
+            # Parse the data
+            if response.status == 200:
+                try:
+                    return {int(item['id']): _parse_weather(item) for item in data['list']}
+                except (KeyError, TypeError, ValueError):
+                    raise ServiceUnavailable('Bad data has received from the service.')
+            elif response.status == 401:
+                raise AccessDenied(
+                    'Access to the OpenWeather service is denied with given API_KEY.'
+                )
+            else:
+                raise ServiceUnavailable(
+                    f'The OpenWeather service has returned code {response.status}'
+                )
+
+def _parse_weather(data: dict) -> WeatherDataType:
+    '''
+    Returns weather information from weather 'data' of the service. The time zone is the shift
+    from UTC in seconds; items of the group endpoint keep it in 'sys'.
+    '''
+    timezone = data.get('timezone')
+    if timezone is None:
+        timezone = data.get('sys', {}).get('timezone', 0)
+    return {
+        'temp': {
+            'value': data['main']['temp'],
+            'units': 'K',
+        },
+        'pressure': {
+            'value': data['main']['pressure'],
+            'units': 'hPa',
+        },
+        'humidity': {
+            'value': data['main']['humidity'],
+            'units': '%',
+        },
+        'timezone': {
+            'value': timezone,
+            'units': 's',
+        },
+    }
+
+async def _get_weather(
+        params: dict[str, str|int],
+        locality_description: str,
+        api_key: str,
+        session: aiohttp.ClientSession | None
+    ) -> WeatherDataType:
+    params = {**params, 'appid': api_key}
+
+    # Request and parse data
+    async with client.session_scope(session) as session:
         async with session.get(URL, params=params) as response:
             # Get response data
             try:
@@ -54,22 +159,8 @@ async def get_locality_weather(locality_name: str, api_key: str) -> WeatherDataT
             # Parse the data
             if response.status == 200:
                 try:
-                    weather_data = {
-                        'temp': {
-                            'value': data['main']['temp'],
-                            'units': 'K',
-                        },
-                        'pressure': {
-                            'value': data['main']['pressure'],
-                            'units': 'hPa',
-                        },
-                        'humidity': {
-                            'value': data['main']['humidity'],
-                            'units': '%',
-                        },
-                    }
-                    return weather_data
-                except KeyError:
+                    return _parse_weather(data)
+                except (KeyError, TypeError):
                     raise ServiceUnavailable('Bad data has received from the service.')
             elif response.status == 404:
                 try:
@@ -77,9 +168,7 @@ async def get_locality_weather(locality_name: str, api_key: str) -> WeatherDataT
                 except KeyError:
                     raise ServiceUnavailable('The OpenWeather service has returned code 404.')
                 if message == 'city not found':
-                    raise UnknownLocality(
-                        f'Locality with name "{locality_name}" has not been found.'
-                    )
+                    raise UnknownLocality(f'{locality_description} has not been found.')
                 else:
                     raise ServiceUnavailable(
                         f'The OpenWeather service has returned code 404: {message}'
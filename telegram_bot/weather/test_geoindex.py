@@ -0,0 +1,67 @@
+'''
+Tests 'geoindex' module.
+'''
+from . import geoindex
+
+
+CITIES = [
+    {'id': 1, 'name': 'London', 'country': 'GB', 'coord': {'lat': 51.5, 'lon': -0.1},
+     'stat': {'population': 7556900}},
+    {'id': 2, 'name': 'London', 'country': 'CA', 'coord': {'lat': 43.0, 'lon': -81.2},
+     'stat': {'population': 346765}},
+    {'id': 3, 'name': 'Londonderry', 'country': 'GB', 'coord': {'lat': 55.0, 'lon': -7.3}},
+    {'id': 4, 'name': 'Zürich', 'country': 'CH', 'coord': {'lat': 47.4, 'lon': 8.5}},
+    {'id': 5, 'name': 'Springfield', 'country': 'US', 'coord': {'lat': 39.8, 'lon': -89.6}},
+    {'id': 6, 'name': 'Springfield', 'country': 'US', 'coord': {'lat': 37.2, 'lon': -93.3}},
+    {'id': 7, 'name': 'Moscow', 'country': 'RU', 'coord': {'lat': 55.8, 'lon': 37.6},
+     'langs': [{'ru': 'Москва'}, {'de': 'Moskau'}, {'link': 'http://example.com'}]},
+]
+
+def create_index(tmp_path) -> geoindex.CityIndex:
+    path = str(tmp_path / 'cities.idx')
+    assert geoindex.build(CITIES, path) == len(CITIES) + 2
+    return geoindex.CityIndex(path)
+
+def test_lookup(tmp_path):
+    '''
+    Tests resolving locality queries to cities.
+    '''
+    city_index = create_index(tmp_path)
+    try:
+        # The most populous city of the same name is chosen unless the country is given
+        assert city_index.lookup(' london ') == (geoindex.City(1, '', '', 0, 0), True)
+        city, _ = city_index.lookup('London,ca')
+        assert (city.city_id, city.title) == (2, 'London, CA')
+        assert city_index.lookup('zurich')[0].name == 'Zürich'
+        # Cities of the same name without population are ambiguous
+        assert city_index.lookup('Springfield') == (None, True)
+        assert city_index.lookup('Moscow, US') == (None, True)
+        assert city_index.lookup('москва')[0].title == 'Moscow, RU'
+        assert city_index.lookup('Paris') == (None, False)
+    finally:
+        city_index.close()
+
+def test_search_prefix_and_suggest(tmp_path):
+    '''
+    Tests prefix and fuzzy matching.
+    '''
+    city_index = create_index(tmp_path)
+    try:
+        assert [city.city_id for city in city_index.search_prefix('Lond')] == [1, 2, 3]
+        assert [city.city_id for city in city_index.search_prefix('Lond', limit=1)] == [1]
+        assert city_index.search_prefix('Paris') == []
+        assert [city.city_id for city in city_index.search_prefix('Mos')] == [7]
+        assert [city.city_id for city in city_index.suggest('lodnon')] == [1]
+        assert [city.city_id for city in city_index.suggest('moskow')] == [7]
+        assert city_index.suggest('paris') == []
+    finally:
+        city_index.close()
+
+def test_missing_index(tmp_path):
+    '''
+    Tests that lookups in an absent index find nothing.
+    '''
+    city_index = geoindex.CityIndex(str(tmp_path / 'absent.idx'))
+    assert len(city_index) == 0
+    assert city_index.lookup('London') == (None, False)
+    assert city_index.suggest('London') == []
@@ -3,6 +3,7 @@ Tests 'openweather' module.
 '''
 import asyncio
 import pytest
+from aiohttp import web
 
 from . import openweather
 
@@ -54,3 +55,47 @@ def test_get_locality_weather_bad_url():
             openweather.get_locality_weather('Boston', TEST_API_KEY)
         )
     openweather.URL = url
+
+def test_normalize_locality_name():
+    '''
+    Tests normalization of locality names.
+    '''
+    assert openweather.normalize_locality_name('  New   York ') == 'new york'
+    assert openweather.normalize_locality_name('BOSTON\t') == 'boston'
+
+def test_get_cities_weather_timezone(monkeypatch):
+    '''
+    Tests that the time zone is taken from items of the group endpoint.
+    '''
+    async def group_handler(request):
+        return web.json_response({'cnt': 2, 'list': [
+            {
+                'id': 524901,
+                'main': {'temp': 280.15, 'pressure': 1010, 'humidity': 80},
+                'sys': {'country': 'RU', 'timezone': 10800},
+            },
+            {
+                'id': 2643743,
+                'main': {'temp': 285.15, 'pressure': 1000, 'humidity': 70},
+                'sys': {'country': 'GB', 'timezone': 0},
+            },
+        ]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/group', group_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        monkeypatch.setattr(openweather, 'GROUP_URL', f'http://127.0.0.1:{port}/group')
+        try:
+            return await openweather.get_cities_weather([524901, 2643743], TEST_API_KEY)
+        finally:
+            await runner.cleanup()
+
+    cities_weather = asyncio.run(run())
+    assert cities_weather[524901]['timezone'] == {'value': 10800, 'units': 's'}
+    assert cities_weather[2643743]['timezone']['value'] == 0
+    assert cities_weather[524901]['temp']['value'] == 280.15
@@ -0,0 +1,111 @@
+'''
+Represents a fake Telegram sending updates to the bot running in webhook mode. It's intended for
+local testing, e.g.:
+
+    python -m webhook.sender --url http://localhost:8080/webhook --secret-token TOKEN /weather Paris
+'''
+import argparse
+import asyncio
+import itertools
+import time
+
+import aiohttp
+
+from .server import SECRET_TOKEN_HEADER
+
+
+UpdateDataType = dict[str, int|dict]
+
+_update_ids = itertools.count(int(time.time()))
+
+def _make_user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'}
+
+def make_message_update(
+        user_id: int,
+        text: str,
+        chat_id: int | None = None,
+        chat_type: str = 'private'
+    ) -> UpdateDataType:
+    '''
+    Returns a fake update with a text message from a user with ID 'user_id'. The message is sent
+    to the private chat with the user unless 'chat_id' is given.
+    '''
+    message = {
+        'message_id': next(_update_ids),
+        'date': int(time.time()),
+        'chat': {'id': chat_id or user_id, 'type': chat_type},
+        'from': _make_user(user_id),
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [
+            {'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}
+        ]
+    return {'update_id': next(_update_ids), 'message': message}
+
+def make_callback_query_update(user_id: int, data: str) -> UpdateDataType:
+    '''
+    Returns a fake update with a callback query from a user with ID 'user_id' pressing an inline
+    button with callback data 'data' under a message in the private chat with the user.
+    '''
+    return {
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_update_ids)),
+            'from': _make_user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': next(_update_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': '',
+            },
+        },
+    }
+
+async def send_update(
+        url: str,
+        update: UpdateDataType,
+        secret_token: str | None = None,
+        session: aiohttp.ClientSession | None = None
+    ) -> int:
+    '''
+    Posts 'update' to the webhook by URL 'url' the same way Telegram does. Returns the response
+    status.
+    '''
+    headers = {SECRET_TOKEN_HEADER: secret_token} if secret_token else {}
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await send_update(url, update, secret_token, session)
+    async with session.post(url, json=update, headers=headers) as response:
+        await response.read()
+        return response.status
+
+async def main(args: argparse.Namespace):
+    async with aiohttp.ClientSession() as session:
+        for text in args.texts:
+            if text.startswith(args.callback_prefix):
+                update = make_callback_query_update(
+                    args.user_id,
+                    text[len(args.callback_prefix):]
+                )
+            else:
+                update = make_message_update(args.user_id, text)
+            status = await send_update(args.url, update, args.secret_token, session)
+            print(f'{text!r}: {status}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sends fake Telegram updates to the webhook.')
+    parser.add_argument('texts', nargs='+', help='message texts sent one by one')
+    parser.add_argument('--url', default='http://localhost:8080/webhook', help='webhook URL')
+    parser.add_argument('--secret-token', default=None, help='webhook secret token')
+    parser.add_argument('--user-id', type=int, default=1, help='ID of the fake user')
+    parser.add_argument(
+        '--callback-prefix',
+        default='callback:',
+        help='texts with this prefix are sent as callback queries'
+    )
+    asyncio.run(main(parser.parse_args()))
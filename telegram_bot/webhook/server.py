@@ -0,0 +1,49 @@
+'''
+Represents the web application receiving updates from Telegram in webhook mode.
+'''
+import hmac
+import typing
+
+from aiohttp import web
+
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+HEALTH_PATH = '/health'
+
+def secret_token_middleware(secret_token: str, webhook_path: str) -> typing.Callable:
+    '''
+    Returns a middleware rejecting requests to 'webhook_path' that don't carry 'secret_token' in
+    the header Telegram sends with every update.
+    '''
+    @web.middleware
+    async def middleware(request: web.Request, handler: typing.Callable) -> web.StreamResponse:
+        if request.path == webhook_path and not hmac.compare_digest(
+                request.headers.get(SECRET_TOKEN_HEADER, ''),
+                secret_token):
+            raise web.HTTPUnauthorized()
+        return await handler(request)
+
+    return middleware
+
+async def health(request: web.Request) -> web.Response:
+    '''
+    Answers health checks of a load balancer.
+    '''
+    return web.Response(text='ok')
+
+def create_app(
+        webhook_path: str,
+        secret_token: str | None = None,
+        client_max_size: int = 1048576
+    ) -> web.Application:
+    '''
+    Creates a web application for receiving updates by 'webhook_path'. If 'secret_token' is given,
+    only requests carrying it are accepted. The webhook handler itself is added by the aiogram
+    executor.
+    '''
+    middlewares = []
+    if secret_token:
+        middlewares.append(secret_token_middleware(secret_token, webhook_path))
+    app = web.Application(middlewares=middlewares, client_max_size=client_max_size)
+    app.router.add_get(HEALTH_PATH, health)
+    return app
@@ -0,0 +1,43 @@
+'''
+Tests 'server' and 'sender' modules.
+'''
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from . import (
+    sender,
+    server,
+)
+
+
+def test_secret_token_check():
+    '''
+    Tests rejecting webhook requests without the secret token.
+    '''
+    updates = []
+
+    async def webhook_handler(request):
+        updates.append(await request.json())
+        return web.Response(text='ok')
+
+    async def run():
+        app = server.create_app('/webhook', 'secret')
+        app.router.add_post('/webhook', webhook_handler)
+        async with TestServer(app) as test_server:
+            url = str(test_server.make_url('/webhook'))
+            update = sender.make_message_update(1, '/weather Paris')
+            assert await sender.send_update(url, update) == 401
+            assert await sender.send_update(url, update, 'wrong') == 401
+            assert await sender.send_update(url, update, 'secret') == 200
+
+            async with aiohttp.ClientSession() as session:
+                async with session.get(test_server.make_url(server.HEALTH_PATH)) as response:
+                    assert response.status == 200
+
+    asyncio.run(run())
+    assert len(updates) == 1
+    assert updates[0]['message']['text'] == '/weather Paris'
+    assert updates[0]['message']['entities'][0]['length'] == len('/weather')